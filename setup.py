@@ -10,7 +10,6 @@ setup(name='tap-eloqua',
       classifiers=['Programming Language :: Python :: 3 :: Only'],
       py_modules=['tap_eloqua'],
       install_requires=[
-          'backoff==2.2.1',
           'requests==2.34.2',
           'pendulum==3.2.0',
           'singer-python==6.8.0'
@@ -19,6 +18,9 @@ setup(name='tap-eloqua',
           'dev': [
               'ipdb',
               'pylint'
+          ],
+          'fast_json': [
+              'orjson'
           ]
       },
       entry_points='''
@@ -7,9 +7,29 @@ import argparse
 import singer
 from singer import metadata
 
-from tap_eloqua.client import EloquaClient
+from tap_eloqua import output
+from tap_eloqua.cleanup import garbage_collect
+from tap_eloqua.client import EloquaClient, DEFAULT_IDENTITY_CACHE_TTL
 from tap_eloqua.discover import discover
-from tap_eloqua.sync import sync
+from tap_eloqua.ratelimit import ENDPOINT_CLASSES
+from tap_eloqua.retry import (
+    RetryPolicy,
+    DEFAULT_MAX_TRIES,
+    DEFAULT_REQUEST_BUDGET,
+    DEFAULT_RUN_BUDGET
+)
+from tap_eloqua.sync import (
+    sync,
+    DEFAULT_ACTIVITY_EXPORT_TARGET_ROWS,
+    DEFAULT_EXPORT_PAGE_RETRIES
+)
+from tap_eloqua.transport import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_KEEPALIVE_IDLE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUTS,
+    DEFAULT_STALL_TIMEOUT
+)
 
 LOGGER = singer.get_logger()
 
@@ -21,12 +41,44 @@ REQUIRED_CONFIG_KEYS = [
     'redirect_uri'
 ]
 
-def do_discover(client):
+def do_discover(client, max_workers=1):
     LOGGER.info('Starting discover')
-    catalog = discover(client)
+    catalog = discover(client, max_workers=max_workers)
     json.dump(catalog.to_dict(), sys.stdout, indent=2)
     LOGGER.info('Finished discover')
 
+def get_flag(config, key):
+    # Boolean settings may arrive as JSON booleans or as strings
+    return config.get(key) in [True, 'true']
+
+def get_pool_size(config):
+    # One connection per export page in flight, plus polling and auth
+    if 'http_pool_size' in config:
+        return int(config['http_pool_size'])
+    exports = int(config.get('max_concurrent_exports', 1)) + \
+              int(config.get('max_concurrent_activity_exports', 1))
+    return max(DEFAULT_POOL_SIZE, exports * int(config.get('export_parallelism', 1)) + 2)
+
+def get_bookmarked_definition_uris(state):
+    uris = set()
+    for bookmark in state.get('bookmarks', {}).values():
+        if not isinstance(bookmark, dict):
+            continue
+        for export in [bookmark] + (bookmark.get('partitions') or []):
+            if export.get('sync_id') and export.get('definition_uri'):
+                uris.add(export['definition_uri'])
+    return uris
+
+def do_garbage_collect(client, state, max_workers):
+    LOGGER.info('Starting garbage collect')
+    # Definitions cached for reuse by the next sync, or behind an export a
+    # bookmark can still resume, are kept
+    keep_uris = {definition['uri']
+                 for definition in state.get('export_definitions', {}).values()}
+    keep_uris |= get_bookmarked_definition_uris(state)
+    garbage_collect(client, max_workers=max_workers, keep_uris=keep_uris)
+    LOGGER.info('Finished garbage collect')
+
 ##### TEMP
 
 from singer.catalog import Catalog
@@ -80,6 +132,11 @@ def parse_args(required_config_keys):
         action='store_true',
         help='Do schema discovery')
 
+    parser.add_argument(
+        '--garbage-collect',
+        action='store_true',
+        help='Delete leftover "Singer Sync" export definitions')
+
     args = parser.parse_args()
     if args.config:
         setattr(args, 'config_path', args.config)
@@ -107,21 +164,91 @@ def main():
     #parsed_args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
     parsed_args = parse_args(REQUIRED_CONFIG_KEYS)
 
-    with EloquaClient(parsed_args.config_path,
-                      parsed_args.config['client_id'],
-                      parsed_args.config['client_secret'],
-                      parsed_args.config['refresh_token'],
-                      parsed_args.config['redirect_uri'],
-                      parsed_args.config.get('user_agent')) as client:
+    client_args = [parsed_args.config_path,
+                   parsed_args.config['client_id'],
+                   parsed_args.config['client_secret'],
+                   parsed_args.config['refresh_token'],
+                   parsed_args.config['redirect_uri'],
+                   parsed_args.config.get('user_agent')]
+
+    # One policy per run, so every request draws on the same retry budget
+    retry_policy = RetryPolicy(
+        max_tries=int(parsed_args.config.get('retry_max_tries', DEFAULT_MAX_TRIES)),
+        request_budget=float(parsed_args.config.get('retry_request_budget_seconds',
+                                                    DEFAULT_REQUEST_BUDGET)),
+        run_budget=float(parsed_args.config.get('retry_run_budget_seconds',
+                                                DEFAULT_RUN_BUDGET)))
+
+    with EloquaClient(
+            *client_args,
+            max_requests_per_second=float(parsed_args.config.get('max_requests_per_second', 0)),
+            request_burst=parsed_args.config.get('request_burst') and \
+                          float(parsed_args.config['request_burst']),
+            max_concurrent_requests={
+                endpoint_class: int(parsed_args.config.get(
+                    'max_concurrent_{}_requests'.format(endpoint_class),
+                    0))
+                for endpoint_class in ENDPOINT_CLASSES
+            },
+            retry_policy=retry_policy,
+            connect_timeout=float(parsed_args.config.get('connect_timeout_seconds',
+                                                         DEFAULT_CONNECT_TIMEOUT)),
+            read_timeouts={
+                endpoint_class: float(parsed_args.config.get(
+                    '{}_read_timeout_seconds'.format(endpoint_class),
+                    DEFAULT_READ_TIMEOUTS[endpoint_class]))
+                for endpoint_class in ENDPOINT_CLASSES
+            },
+            stall_timeout=float(parsed_args.config.get('stream_stall_timeout_seconds',
+                                                       DEFAULT_STALL_TIMEOUT)),
+            token_renewal_margin=float(parsed_args.config.get('token_renewal_margin', 0)),
+            identity_cache_path=parsed_args.config.get('identity_cache_path'),
+            identity_cache_ttl=float(parsed_args.config.get('identity_cache_ttl_seconds',
+                                                            DEFAULT_IDENTITY_CACHE_TTL)),
+            pool_size=get_pool_size(parsed_args.config),
+            keepalive_idle=int(parsed_args.config.get('tcp_keepalive_seconds',
+                                                      DEFAULT_KEEPALIVE_IDLE))) as client:
 
         if parsed_args.discover:
-            do_discover(client)
+            do_discover(client, int(parsed_args.config.get('discovery_parallelism', 1)))
+        elif parsed_args.garbage_collect:
+            do_garbage_collect(client,
+                               parsed_args.state,
+                               int(parsed_args.config.get('garbage_collect_concurrency', 4)))
         elif parsed_args.catalog:
-            sync(client,
-                 parsed_args.catalog,
-                 parsed_args.state,
-                 parsed_args.config['start_date'],
-                 int(parsed_args.config.get('bulk_page_size', 5000)))
+            output.configure(
+                buffer_size=int(parsed_args.config.get('output_buffer_size',
+                                                       output.DEFAULT_BUFFER_SIZE)),
+                flush_interval=float(parsed_args.config.get('output_flush_interval',
+                                                            output.DEFAULT_FLUSH_INTERVAL)))
+            try:
+                sync(client,
+                     parsed_args.catalog,
+                     parsed_args.state,
+                     parsed_args.config['start_date'],
+                     int(parsed_args.config.get('bulk_page_size', 5000)),
+                     max_concurrent_exports=int(parsed_args.config.get('max_concurrent_exports', 1)),
+                     export_parallelism=int(parsed_args.config.get('export_parallelism', 1)),
+                     prefetch_pages=int(parsed_args.config.get('export_prefetch_pages', 0)),
+                     adaptive_page_size=get_flag(parsed_args.config, 'adaptive_page_size'),
+                     export_memory_budget=int(parsed_args.config.get('export_memory_budget_mb', 256)) * 1024 * 1024,
+                     stream_data=get_flag(parsed_args.config, 'stream_export_data'),
+                     data_format=parsed_args.config.get('export_data_format', 'json'),
+                     checkpoint_every_pages=int(parsed_args.config.get('checkpoint_every_pages', 1)),
+                     checkpoint_every_seconds=float(parsed_args.config.get('checkpoint_every_seconds', 0)),
+                     export_partitions=int(parsed_args.config.get('export_partitions', 1)),
+                     activity_export_target_rows=int(parsed_args.config.get(
+                         'activity_export_target_rows',
+                         DEFAULT_ACTIVITY_EXPORT_TARGET_ROWS)),
+                     max_concurrent_activity_exports=int(parsed_args.config.get(
+                         'max_concurrent_activity_exports',
+                         1)),
+                     reuse_export_definitions=get_flag(parsed_args.config, 'reuse_export_definitions'),
+                     cleanup_exports=get_flag(parsed_args.config, 'cleanup_exports'),
+                     export_page_retries=int(parsed_args.config.get('export_page_retries',
+                                                                    DEFAULT_EXPORT_PAGE_RETRIES)))
+            finally:
+                output.flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import re
+
+import pendulum
+import singer
+from requests.exceptions import HTTPError
+
+from tap_eloqua.pipeline import run_concurrently
+
+LOGGER = singer.get_logger()
+
+EXPORT_NAME_PREFIX = 'Singer Sync'
+LIST_PAGE_SIZE = 1000
+# The exports' dataRetentionDuration; younger definitions may still be in use
+EXPORT_RETENTION_DAYS = 3
+
+def delete_ignoring_missing(client, path, endpoint):
+    try:
+        client.delete(path, endpoint=endpoint)
+    except HTTPError as e:
+        if e.response.status_code not in [404, 410]:
+            raise
+
+def delete_export_definition(client, stream_name, uri):
+    LOGGER.info('{} - Deleting export definition {}'.format(stream_name, uri))
+    delete_ignoring_missing(client, '/api/bulk/2.0' + uri, 'export_delete_def')
+
+def delete_sync_data(client, stream_name, sync_id):
+    LOGGER.info('{} - Deleting staged data for export {}'.format(stream_name, sync_id))
+    delete_ignoring_missing(client,
+                            '/api/bulk/2.0/syncs/{}/data'.format(sync_id),
+                            'export_delete_data')
+
+def cleanup_export(client, stream_name, sync_id, definition_uri=None):
+    """
+    Deletes the staged data of a drained export and, when given, its export
+    definition, instead of leaving both for Eloqua's autoDeleteDuration.
+    """
+    delete_sync_data(client, stream_name, sync_id)
+    if definition_uri:
+        delete_export_definition(client, stream_name, definition_uri)
+
+def get_export_objects(client):
+    url_objs = ['accounts', 'contacts', 'activities']
+    data = client.get('/api/bulk/2.0/customObjects', endpoint='custom_objects')
+    for custom_obj in data['items']:
+        object_id = re.match(r'/customObjects/([0-9]+)', custom_obj['uri']).groups()[0]
+        url_objs.append('customObjects/' + object_id)
+    return url_objs
+
+def list_export_definitions(client, url_obj):
+    offset = 0
+    while True:
+        data = client.get(
+            '/api/bulk/2.0/{}/exports'.format(url_obj),
+            params={
+                'q': "name='{}*'".format(EXPORT_NAME_PREFIX),
+                'offset': offset,
+                'limit': LIST_PAGE_SIZE
+            },
+            endpoint='export_list_defs')
+        items = data.get('items', [])
+        for definition in items:
+            if definition.get('name', '').startswith(EXPORT_NAME_PREFIX):
+                yield definition
+        if not data.get('hasMore') or not items:
+            return
+        offset += len(items)
+
+def is_within_retention(definition, now):
+    # Definitions of unknown age are kept
+    try:
+        created_at = pendulum.parse(definition['createdAt'])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return created_at > now.subtract(days=EXPORT_RETENTION_DAYS)
+
+def garbage_collect(client, max_workers=1, keep_uris=()):
+    """
+    Deletes every "Singer Sync" export definition left on the instance, except
+    those in `keep_uris` and those created within EXPORT_RETENTION_DAYS, with
+    up to `max_workers` deletes at a time. Returns the number of definitions
+    deleted.
+    """
+    now = pendulum.now('UTC')
+    uris = []
+    for url_obj in get_export_objects(client):
+        uris += [definition['uri'] for definition in list_export_definitions(client, url_obj)
+                 if definition['uri'] not in keep_uris and
+                 not is_within_retention(definition, now)]
+
+    LOGGER.info('Deleting {} leftover export definitions'.format(len(uris)))
+    run_concurrently(lambda uri: delete_export_definition(client, 'garbage_collect', uri),
+                     uris,
+                     max(1, max_workers))
+    return len(uris)
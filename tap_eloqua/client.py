@@ -1,13 +1,115 @@
+import os
 import json
+import stat
+import hashlib
+import tempfile
+import threading
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
-import backoff
 import requests
-from requests.exceptions import ConnectionError
+import singer
+import urllib3
+from requests.exceptions import HTTPError
 from singer import metrics
 
-class Server5xxError(Exception):
-    pass
+from tap_eloqua.ratelimit import AUTH, RequestGovernor, get_endpoint_class
+from tap_eloqua.retry import (
+    RetryPolicy,
+    Server429Error,
+    Server5xxError,
+    is_idempotent,
+    parse_retry_after
+)
+from tap_eloqua.streaming import CsvItemStream, JsonItemStream
+from tap_eloqua.transport import (
+    PooledHTTPAdapter,
+    StallWatchdog,
+    StreamStalledError,
+    abort_response,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_KEEPALIVE_IDLE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUTS,
+    DEFAULT_STALL_TIMEOUT
+)
+
+LOGGER = singer.get_logger()
+
+STREAM_CHUNK_SIZE = 64 * 1024 # bytes
+MIN_RENEWAL_INTERVAL = 30 # seconds between background renewal attempts
+# Largest fraction of the token's lifetime that renewal may start early
+MAX_RENEWAL_MARGIN_FRACTION = 0.5
+DEFAULT_IDENTITY_CACHE_TTL = 24 * 60 * 60 # seconds
+# gzip and deflate, plus br and zstd when urllib3 can decode them
+ACCEPT_ENCODING = urllib3.util.make_headers(accept_encoding=True)['accept-encoding']
+
+# Response size tags added to http_request_timer metrics
+COMPRESSED_BYTES = 'compressed_bytes'
+UNCOMPRESSED_BYTES = 'uncompressed_bytes'
+
+def get_compressed_bytes(response, uncompressed_bytes):
+    # urllib3 counts the bytes read off the wire, before decompression
+    try:
+        return int(response.raw.tell())
+    except Exception: # pylint: disable=broad-except
+        return uncompressed_bytes
+
+def log_streamed_response_bytes(endpoint, response, uncompressed_bytes):
+    metrics.log(LOGGER, metrics.Point('counter',
+                                      'http_response_bytes',
+                                      uncompressed_bytes,
+                                      {metrics.Tag.endpoint: endpoint,
+                                       COMPRESSED_BYTES: get_compressed_bytes(response,
+                                                                              uncompressed_bytes),
+                                       UNCOMPRESSED_BYTES: uncompressed_bytes}))
+
+def write_json_atomically(path, data):
+    # The new file is written next to the old one and swapped in with
+    # os.replace, so a crash never leaves a truncated file behind.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tap-eloqua-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, indent=2)
+        # mkstemp creates the file readable only by its owner; keep the
+        # permissions of the file it replaces
+        if os.path.exists(path):
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+def write_refresh_token(config_path, refresh_token):
+    """
+    Saves a rotated refresh token to the config file, atomically.
+    """
+    with open(config_path) as file:
+        config = json.load(file)
+    config['refresh_token'] = refresh_token
+    write_json_atomically(config_path, config)
+
+def get_token_fingerprint(refresh_token):
+    return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+def read_identity_cache(cache_path, refresh_token):
+    """
+    Returns the identity cache at `cache_path`, or None if it is missing,
+    unreadable, or was written for a different refresh token, e.g. because
+    the config was replaced.
+    """
+    try:
+        with open(cache_path) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if cache.get('fingerprint') != get_token_fingerprint(refresh_token):
+        return None
+    return cache
+
+def get_host(url):
+    return urlparse(url).netloc
 
 class EloquaClient(object):
     def __init__(self,
@@ -16,7 +118,19 @@ class EloquaClient(object):
                  client_secret,
                  refresh_token,
                  redirect_uri,
-                 user_agent):
+                 user_agent,
+                 token_renewal_margin=0,
+                 identity_cache_path=None,
+                 identity_cache_ttl=DEFAULT_IDENTITY_CACHE_TTL,
+                 max_requests_per_second=0,
+                 request_burst=None,
+                 max_concurrent_requests=None,
+                 retry_policy=None,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeouts=None,
+                 keepalive_idle=DEFAULT_KEEPALIVE_IDLE,
+                 stall_timeout=DEFAULT_STALL_TIMEOUT):
         self.__config_path = config_path
         self.__client_id = client_id
         self.__client_secret = client_secret
@@ -25,41 +139,93 @@ class EloquaClient(object):
         self.__user_agent = user_agent
         self.__access_token = None
         self.__expires = None
+        self.__issued = None
         self.__session = requests.Session()
+        self.__adapter = PooledHTTPAdapter(pool_size, keepalive_idle)
+        self.__session.mount('https://', self.__adapter)
+        self.__session.mount('http://', self.__adapter)
+        self.__watchdog = StallWatchdog(stall_timeout)
+        self.__timeouts = {endpoint_class: (connect_timeout, read_timeout)
+                           for endpoint_class, read_timeout
+                           in dict(DEFAULT_READ_TIMEOUTS, **(read_timeouts or {})).items()}
         self.__base_url = None
+        self.__auth_lock = threading.Lock()
+        self.__token_renewal_margin = token_renewal_margin
+        self.__stop_renewal = threading.Event()
+        self.__renewal_thread = None
+        self.__identity = None
+        self.__identity_cached_at = None
+        self.__identity_cache_path = identity_cache_path
+        self.__identity_cache_ttl = identity_cache_ttl
+        self.__identity_cache_lock = threading.Lock()
+        self.__from_identity_cache = False
+        self.__governor = RequestGovernor(max_requests_per_second,
+                                          request_burst,
+                                          max_concurrent_requests)
+        self.__retry_policy = retry_policy or RetryPolicy()
 
     def __enter__(self):
+        if self.__identity_cache_path:
+            self.__load_identity_cache()
         self.get_access_token()
+        if self.__token_renewal_margin:
+            self.__renewal_thread = threading.Thread(target=self.__renew_access_token,
+                                                     daemon=True)
+            self.__renewal_thread.start()
         return self
 
     def __exit__(self, type, value, traceback):
+        if self.__renewal_thread is not None:
+            self.__stop_renewal.set()
+            self.__renewal_thread.join()
+        self.__watchdog.stop()
+        self.__adapter.stats.log()
         self.__session.close()
 
-    @backoff.on_exception(backoff.expo,
-                          Server5xxError,
-                          max_tries=5,
-                          factor=2)
-    def get_access_token(self):
-        if self.__access_token is not None and self.__expires > datetime.utcnow():
-            return
+    def __renew_access_token(self):
+        """
+        Refreshes the token `token_renewal_margin` seconds before it expires,
+        so requests do not wait on the token endpoint. If a renewal fails it
+        is retried, and requests still refresh an expired token themselves.
+        """
+        while True:
+            with self.__auth_lock:
+                expires = self.__expires
+                issued = self.__issued
+            now = datetime.utcnow()
+            # A token restored from the identity cache has no known issue time
+            lifetime = (expires - (issued or now)).total_seconds()
+            margin = min(self.__token_renewal_margin, MAX_RENEWAL_MARGIN_FRACTION * lifetime)
+            if margin < self.__token_renewal_margin:
+                LOGGER.warning('token_renewal_margin of {}s is too large for a token lasting {:.0f}s, '
+                               'renewing {:.0f}s before expiry instead'.format(
+                                   self.__token_renewal_margin,
+                                   lifetime,
+                                   margin))
+            wait = (expires - now).total_seconds() - margin
+            if self.__stop_renewal.wait(max(wait, MIN_RENEWAL_INTERVAL)):
+                return
+            try:
+                with self.__auth_lock:
+                    self.__refresh_access_token()
+            except Exception as exc: # pylint: disable=broad-except
+                LOGGER.warning('Background token renewal failed: {}'.format(exc))
 
-        headers = {}
-        if self.__user_agent:
-            headers['User-Agent'] = self.__user_agent
+    def __has_valid_token(self):
+        return self.__access_token is not None and self.__expires > datetime.utcnow()
 
-        response = self.__session.post(
-            'https://login.eloqua.com/auth/oauth2/token',
-            auth=(self.__client_id, self.__client_secret),
-            headers=headers,
-            data={
-                'grant_type': 'refresh_token',
-                'refresh_token': self.__refresh_token,
-                'redirect_uri': self.__redirect_uri,
-                'scope': 'full'
-            })
+    def get_access_token(self):
+        if self.__has_valid_token():
+            return
+        # The refresh token rotates on every refresh, so only one thread may
+        # refresh at a time; the others wait and then reuse its token.
+        with self.__auth_lock:
+            if self.__has_valid_token():
+                return
+            self.__refresh_access_token()
 
-        if response.status_code >= 500:
-            raise Server5xxError()
+    def __refresh_access_token(self):
+        response = self.__retry_policy.call(self.__post_token_request, idempotent=False)
 
         if response.status_code != 200:
             eloqua_response = response.json()
@@ -75,33 +241,148 @@ class EloquaClient(object):
         self.__refresh_token = data['refresh_token']
 
         ## refresh_token rotates on every reauth
-        with open(self.__config_path) as file:
-            config = json.load(file)
-        config['refresh_token'] = data['refresh_token']
-        with open(self.__config_path, 'w') as file:
-            json.dump(config, file, indent=2)
+        write_refresh_token(self.__config_path, data['refresh_token'])
 
         expires_seconds = data['expires_in'] - 10 # pad by 10 seconds
-        self.__expires = datetime.utcnow() + timedelta(seconds=expires_seconds)
+        self.__issued = datetime.utcnow()
+        self.__expires = self.__issued + timedelta(seconds=expires_seconds)
+        self.__save_identity_cache()
+
+    def __post_token_request(self):
+        headers = {}
+        if self.__user_agent:
+            headers['User-Agent'] = self.__user_agent
+
+        release = self.__governor.acquire(AUTH)
+        try:
+            response = self.__session.post(
+                'https://login.eloqua.com/auth/oauth2/token',
+                auth=(self.__client_id, self.__client_secret),
+                headers=headers,
+                timeout=self.__timeouts[AUTH],
+                data={
+                    'grant_type': 'refresh_token',
+                    'refresh_token': self.__refresh_token,
+                    'redirect_uri': self.__redirect_uri,
+                    'scope': 'full'
+                })
+        finally:
+            release()
+
+        if response.status_code >= 500:
+            raise Server5xxError(parse_retry_after(response.headers.get('Retry-After')))
+
+        if response.status_code == 429:
+            raise Server429Error(parse_retry_after(response.headers.get('Retry-After')))
+
+        return response
 
     def get_base_urls(self):
         data = self.request('GET',
                             url='https://login.eloqua.com/id',
                             endpoint='base_url')
+        self.__identity = data
+        self.__identity_cached_at = datetime.utcnow()
         self.__base_url = data['urls']['base']
+        self.__save_identity_cache()
+
+    def __load_identity_cache(self):
+        """
+        Restores the base URL and identity resolved by an earlier run, if they
+        are younger than `identity_cache_ttl` seconds, and its access token
+        if it has not expired, so short runs skip the /id lookup and the
+        token refresh.
+        """
+        cache = read_identity_cache(self.__identity_cache_path, self.__refresh_token)
+        if cache is None:
+            return
+        now = datetime.utcnow()
 
-    @backoff.on_exception(backoff.expo,
-                          (Server5xxError, ConnectionError),
-                          max_tries=5,
-                          factor=2)
-    def request(self, method, path=None, url=None, **kwargs):
+        cached_at = cache.get('cached_at') and datetime.fromisoformat(cache['cached_at'])
+        if cached_at and (now - cached_at).total_seconds() < self.__identity_cache_ttl:
+            self.__identity = cache['identity']
+            self.__identity_cached_at = cached_at
+            self.__base_url = cache['identity']['urls']['base']
+            self.__from_identity_cache = True
+
+        expires = cache.get('expires') and datetime.fromisoformat(cache['expires'])
+        if expires and expires > now:
+            self.__access_token = cache['access_token']
+            self.__expires = expires
+            self.__from_identity_cache = True
+
+    def __save_identity_cache(self):
+        if not self.__identity_cache_path:
+            return
+        with self.__identity_cache_lock:
+            write_json_atomically(self.__identity_cache_path, {
+                'fingerprint': get_token_fingerprint(self.__refresh_token),
+                'identity': self.__identity,
+                'cached_at': self.__identity_cached_at and self.__identity_cached_at.isoformat(),
+                'access_token': self.__access_token,
+                'expires': self.__expires and self.__expires.isoformat()
+            })
+
+    def __invalidate_identity_cache(self, access_token=True):
+        # Callers hold the auth lock
+        LOGGER.info('Cached Eloqua identity is stale, resolving it again')
+        self.__from_identity_cache = False
+        self.__identity = None
+        self.__identity_cached_at = None
+        self.__base_url = None
+        if access_token:
+            self.__access_token = None
+            self.__refresh_access_token()
+        self.__save_identity_cache()
+
+    def __recover_from_401(self, sent):
+        """
+        Returns whether a request that got a 401 with `sent` token and base
+        URL should be retried: when another thread has replaced them since,
+        or they came from the identity cache, which is then invalidated.
+        """
+        with self.__auth_lock:
+            if sent.get('access_token') != self.__access_token or \
+               sent.get('base_url') != self.__base_url:
+                return True
+            if not self.__from_identity_cache:
+                return False
+            self.__invalidate_identity_cache()
+            return True
+
+    def request(self, method, path=None, url=None, stream_with=None, **kwargs):
+        sent = {}
+        try:
+            return self.__retry_policy.call(self.__request,
+                                            method,
+                                            path,
+                                            url,
+                                            stream_with,
+                                            sent,
+                                            idempotent=is_idempotent(method),
+                                            **kwargs)
+        except HTTPError as e:
+            if e.response.status_code != 401 or not self.__recover_from_401(sent):
+                raise
+            return self.__retry_policy.call(self.__request,
+                                            method,
+                                            path,
+                                            url,
+                                            stream_with,
+                                            {},
+                                            idempotent=is_idempotent(method),
+                                            **kwargs)
+
+    def __request(self, method, path, url, stream_with, sent, **kwargs):
         self.get_access_token()
 
-        if not url and self.__base_url is None:
+        base_url = self.__base_url
+        if not url and base_url is None:
             self.get_base_urls()
+            base_url = self.__base_url
 
         if not url and path:
-            url = self.__base_url + path
+            url = base_url + path
 
         if 'endpoint' in kwargs:
             endpoint = kwargs['endpoint']
@@ -109,29 +390,144 @@ class EloquaClient(object):
         else:
             endpoint = None
 
+        access_token = self.__access_token
+        sent.update({'access_token': access_token, 'base_url': base_url})
+
         if 'headers' not in kwargs:
             kwargs['headers'] = {}
-        kwargs['headers']['Authorization'] = 'Bearer {}'.format(self.__access_token)
+        kwargs['headers']['Authorization'] = 'Bearer {}'.format(access_token)
 
         if self.__user_agent:
             kwargs['headers']['User-Agent'] = self.__user_agent
 
-        if method == 'POST':
+        if method in ['POST', 'PUT']:
             kwargs['headers']['Content-Type'] = 'application/json'
 
-        with metrics.http_request_timer(endpoint) as timer:
-            response = self.__session.request(method, url, **kwargs)
-            timer.tags[metrics.Tag.http_status_code] = response.status_code
+        kwargs['headers'].setdefault('Accept-Encoding', ACCEPT_ENCODING)
 
-        if response.status_code >= 500:
-            raise Server5xxError()
+        if stream_with is not None:
+            kwargs['stream'] = True
+
+        endpoint_class = get_endpoint_class(url)
+        kwargs.setdefault('timeout', self.__timeouts[endpoint_class])
+
+        # A streamed response holds its slot until the stream is closed
+        release = self.__governor.acquire(endpoint_class)
+        try:
+            with metrics.http_request_timer(endpoint) as timer:
+                response = self.__session.request(method, url, **kwargs)
+                timer.tags[metrics.Tag.http_status_code] = response.status_code
+                if stream_with is None:
+                    uncompressed_bytes = len(response.content or b'')
+                    timer.tags[COMPRESSED_BYTES] = get_compressed_bytes(response, uncompressed_bytes)
+                    timer.tags[UNCOMPRESSED_BYTES] = uncompressed_bytes
+
+            if response.status_code >= 500:
+                raise Server5xxError(parse_retry_after(response.headers.get('Retry-After')))
+
+            if response.status_code == 429:
+                raise Server429Error(parse_retry_after(response.headers.get('Retry-After')))
 
-        response.raise_for_status()
+            response.raise_for_status()
+        except:
+            release()
+            raise
+
+        if stream_with is None:
+            release()
+
+        if response.history and self.__from_identity_cache and self.__base_url and \
+           get_host(response.history[0].url) == get_host(self.__base_url) and \
+           get_host(response.url) != get_host(self.__base_url):
+            # The instance has moved away from the cached pod
+            with self.__auth_lock:
+                self.__invalidate_identity_cache(access_token=False)
+
+        if stream_with is not None:
+            return self.__stream_response(response, endpoint, stream_with, release)
+
+        if response.status_code == 204 or not response.content:
+            return None
 
         return response.json()
 
+    def __stream_response(self, response, endpoint, stream_with, release):
+        # The body is decompressed chunk by chunk as it is read; its sizes
+        # are only known, and logged, once the stream is closed.
+        uncompressed_bytes = [0]
+        closed = [False]
+        watch = self.__watchdog.watch(lambda: abort_response(response))
+
+        def chunks():
+            iterator = iter(response.iter_content(STREAM_CHUNK_SIZE))
+            try:
+                while True:
+                    watch.reading()
+                    chunk = next(iterator, None)
+                    watch.idle()
+                    if chunk is None:
+                        break
+                    uncompressed_bytes[0] += len(chunk)
+                    yield chunk
+            except Exception as exc:
+                if watch.stalled:
+                    raise StreamStalledError('{} response stalled'.format(endpoint)) from exc
+                raise
+            # An aborted body may also just end early
+            if watch.stalled:
+                raise StreamStalledError('{} response stalled'.format(endpoint))
+
+        def close():
+            if closed[0]:
+                return
+            closed[0] = True
+            self.__watchdog.unwatch(watch)
+            log_streamed_response_bytes(endpoint, response, uncompressed_bytes[0])
+            response.close()
+            release()
+
+        return stream_with(chunks(), close)
+
     def get(self, path, **kwargs):
         return self.request('GET', path=path, **kwargs)
 
     def post(self, path, **kwargs):
         return self.request('POST', path=path, **kwargs)
+
+    def stream(self, path, on_finish=None, **kwargs):
+        """
+        GETs a paged collection and returns a JsonItemStream that yields its
+        `items` as they are downloaded instead of loading the whole body.
+        """
+        return self.request(
+            'GET',
+            path=path,
+            stream_with=lambda chunks, close: JsonItemStream(chunks,
+                                                             close=close,
+                                                             on_finish=on_finish),
+            **kwargs)
+
+    def stream_csv(self, path, has_more, columns=None, on_finish=None, **kwargs):
+        """
+        GETs a bulk export data page as CSV and returns a CsvItemStream that
+        yields its rows as dicts as they are downloaded. `has_more` is called
+        with the number of rows read to decide the stream's hasMore.
+        """
+        if 'headers' not in kwargs:
+            kwargs['headers'] = {}
+        kwargs['headers']['Accept'] = 'text/csv'
+        return self.request(
+            'GET',
+            path=path,
+            stream_with=lambda chunks, close: CsvItemStream(chunks,
+                                                            has_more,
+                                                            columns=columns,
+                                                            close=close,
+                                                            on_finish=on_finish),
+            **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path=path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path=path, **kwargs)
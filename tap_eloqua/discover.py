@@ -5,6 +5,7 @@ from singer.catalog import Catalog, CatalogEntry, Schema
 
 from tap_eloqua.schema import get_schemas, get_pk
 from tap_eloqua.constants import STATIC_ENDPOINTS
+from tap_eloqua.pipeline import run_concurrently
 
 LOGGER = singer.get_logger()
 
@@ -47,16 +48,27 @@ def get_standard_metadata(metadata_map, key_properties, replication_method, repl
     return metadata_map
 
 
-def discover(client):
+def discover(client, max_workers=1):
     # get_schemas() makes API calls for bulk, activity, and custom-object streams,
     # so access for those is implicitly verified here. Only static streams need an
     # explicit probe since their schemas are loaded from local files.
-    schemas, field_metadata = get_schemas(client)
+    schemas, field_metadata = get_schemas(client, max_workers=max_workers)
     catalog = Catalog([])
 
+    # Probe the static streams up to max_workers at a time
+    static_streams = [stream_name for stream_name in schemas
+                      if stream_name in STATIC_STREAM_PROBE_PATHS]
+    accessible = dict(zip(
+        static_streams,
+        run_concurrently(lambda stream_name: check_stream_access(client,
+                                                                 STATIC_STREAM_PROBE_PATHS[stream_name],
+                                                                 stream_name),
+                         static_streams,
+                         max(1, max_workers))))
+
     for stream_name, schema_dict in schemas.items():
         if stream_name in STATIC_STREAM_PROBE_PATHS:
-            if not check_stream_access(client, STATIC_STREAM_PROBE_PATHS[stream_name], stream_name):
+            if not accessible[stream_name]:
                 LOGGER.warning(
                     "Stream '%s' will be excluded from the catalog due to insufficient permissions.",
                     stream_name,
@@ -0,0 +1,100 @@
+import sys
+import time
+import threading
+
+import singer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024 # 1 MB
+DEFAULT_FLUSH_INTERVAL = 1 # second
+
+def format_message(message):
+    if orjson is not None:
+        return orjson.dumps(message.asdict()) # pylint: disable=no-member
+    return singer.format_message(message).encode('utf-8')
+
+class MessageWriter(object):
+    """
+    Buffers serialized Singer messages and writes them to stdout in blocks.
+
+    The buffer is flushed once it holds `buffer_size` bytes or
+    `flush_interval` seconds after the last flush, and always right after a
+    STATE message, so a STATE message never reaches stdout ahead of the
+    records it covers. Messages are serialized with orjson when it is
+    installed. A `buffer_size` of 0 flushes every message.
+    """
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.__buffer = []
+        self.__buffered = 0
+        self.__last_flush = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __flush(self):
+        if self.__buffer:
+            data = b''.join(self.__buffer)
+            stdout = sys.stdout
+            binary_stdout = getattr(stdout, 'buffer', None)
+            if binary_stdout is not None:
+                stdout.flush()
+                binary_stdout.write(data)
+                binary_stdout.flush()
+            else:
+                stdout.write(data.decode('utf-8'))
+                stdout.flush()
+            self.__buffer = []
+            self.__buffered = 0
+        self.__last_flush = time.monotonic()
+
+    def __write(self, messages, force_flush=False):
+        with self.__lock:
+            for message in messages:
+                line = format_message(message) + b'\n'
+                self.__buffer.append(line)
+                self.__buffered += len(line)
+            if force_flush or \
+               self.__buffered >= self.buffer_size or \
+               time.monotonic() - self.__last_flush >= self.flush_interval:
+                self.__flush()
+
+    def flush(self):
+        with self.__lock:
+            self.__flush()
+
+    def write_records(self, stream_name, records):
+        self.__write(singer.RecordMessage(stream=stream_name, record=record)
+                     for record in records)
+
+    def write_record(self, stream_name, record):
+        self.write_records(stream_name, [record])
+
+    def write_schema(self, stream_name, schema, key_properties):
+        self.__write([singer.SchemaMessage(stream=stream_name,
+                                           schema=schema,
+                                           key_properties=key_properties)])
+
+    def write_state(self, value):
+        self.__write([singer.StateMessage(value=value)], force_flush=True)
+
+WRITER = MessageWriter()
+
+def configure(buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+    WRITER.buffer_size = buffer_size
+    WRITER.flush_interval = flush_interval
+
+def write_record(stream_name, record):
+    WRITER.write_record(stream_name, record)
+
+def write_schema(stream_name, schema, key_properties):
+    WRITER.write_schema(stream_name, schema, key_properties)
+
+def write_state(value):
+    WRITER.write_state(value)
+
+def flush():
+    WRITER.flush()
@@ -0,0 +1,57 @@
+import threading
+
+MAX_PAGE_SIZE = 50000 # Eloqua's limit for bulk export data pages
+MIN_PAGE_SIZE = 100
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024 # 256 MB
+DEFAULT_TARGET_PAGE_SECONDS = 30
+SMOOTHING = 0.5 # weight of the latest page in the running averages
+
+class PageSizer(object):
+    """
+    Picks the `limit` of each bulk export data page from the bytes and
+    latency observed for earlier pages of the same export.
+
+    Pages are sized so that the pages in flight at once (`pages_in_flight`,
+    downloaded, queued or being written) fit in `memory_budget` bytes, and a
+    single page takes about `target_page_seconds` to download, so wide
+    exports get small pages and narrow ones large pages. The size never
+    exceeds Eloqua's 50,000 row maximum, and grows at most 2x per page.
+    """
+    def __init__(self,
+                 initial_size,
+                 memory_budget=DEFAULT_MEMORY_BUDGET,
+                 pages_in_flight=1,
+                 target_page_seconds=DEFAULT_TARGET_PAGE_SECONDS):
+        self.__size = max(MIN_PAGE_SIZE, min(MAX_PAGE_SIZE, initial_size))
+        self.__memory_budget = memory_budget
+        self.__pages_in_flight = max(1, pages_in_flight)
+        self.__target_page_seconds = target_page_seconds
+        self.__bytes_per_row = None
+        self.__seconds_per_row = None
+        self.__lock = threading.Lock()
+
+    @property
+    def size(self):
+        with self.__lock:
+            return self.__size
+
+    def observe(self, rows, response_bytes, seconds):
+        if rows <= 0:
+            return
+        with self.__lock:
+            self.__bytes_per_row = self.__average(self.__bytes_per_row, response_bytes / rows)
+            self.__seconds_per_row = self.__average(self.__seconds_per_row, seconds / rows)
+
+            size = MAX_PAGE_SIZE
+            if self.__bytes_per_row:
+                size = min(size, self.__memory_budget / self.__pages_in_flight / self.__bytes_per_row)
+            if self.__seconds_per_row:
+                size = min(size, self.__target_page_seconds / self.__seconds_per_row)
+            size = min(size, self.__size * 2)
+            self.__size = int(max(MIN_PAGE_SIZE, size))
+
+    @staticmethod
+    def __average(previous, value):
+        if previous is None:
+            return value
+        return SMOOTHING * value + (1 - SMOOTHING) * previous
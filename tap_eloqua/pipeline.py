@@ -0,0 +1,75 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+PUT_TIMEOUT = 0.1 # seconds between checks for a stopped consumer
+
+def prefetch(iterable, maxsize):
+    """
+    Iterates over `iterable` on a background thread, buffering up to `maxsize`
+    items in a bounded queue ahead of the consumer.
+
+    Items are yielded in the order the iterable produces them. An exception
+    raised by the iterable is re-raised to the consumer after the items that
+    preceded it. If the consumer stops early, the background thread stops
+    at its next item and the iterable is closed.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    break
+            else:
+                put((False, None))
+        except Exception as exc: # pylint: disable=broad-except
+            put((False, exc))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            is_item, value = items.get()
+            if is_item:
+                yield value
+            elif value is None:
+                return
+            else:
+                raise value
+    finally:
+        stopped.set()
+        thread.join()
+
+def run_concurrently(func, items, max_workers):
+    """
+    Calls `func` on each of `items` from a pool of `max_workers` threads and
+    returns the results in item order.
+
+    The first exception raised is re-raised once the calls already running
+    have finished; calls that have not started yet are cancelled.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+    return [future.result() for future in futures]
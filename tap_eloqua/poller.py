@@ -0,0 +1,113 @@
+import time
+import threading
+from concurrent.futures import Future
+
+import singer
+
+LOGGER = singer.get_logger()
+
+class ExportPoller(object):
+    """Polls every outstanding bulk sync from one thread; `register`
+    returns a Future of the sync's final status."""
+    def __init__(self, client, next_interval, max_elapsed_time):
+        self.__client = client
+        self.__next_interval = next_interval
+        self.__max_elapsed_time = max_elapsed_time
+        self.__syncs = {}
+        self.__condition = threading.Condition()
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def __enter__(self):
+        self.__thread.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+        self.__thread.join()
+        for sync_id in list(self.__syncs):
+            self.__finish(sync_id).set_exception(
+                Exception('Export poller stopped before sync {} finished'.format(sync_id)))
+
+    def register(self, stream_name, sync_id):
+        future = Future()
+        now = time.monotonic()
+        with self.__condition:
+            self.__syncs[sync_id] = {
+                'stream_name': stream_name,
+                'future': future,
+                'interval': 0,
+                'started': now,
+                'next_poll': now
+            }
+            self.__condition.notify()
+        return future
+
+    def wait(self, stream_name, sync_id):
+        return self.register(stream_name, sync_id).result()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                due = self.__wait_for_due_syncs()
+                if due is None:
+                    return
+            for sync_id, entry in due:
+                self.__poll(sync_id, entry)
+
+    def __wait_for_due_syncs(self):
+        while not self.__stopped:
+            now = time.monotonic()
+            due = [(sync_id, entry)
+                   for sync_id, entry in self.__syncs.items()
+                   if entry['next_poll'] <= now]
+            if due:
+                return due
+            timeout = None
+            if self.__syncs:
+                timeout = min(entry['next_poll'] for entry in self.__syncs.values()) - now
+            self.__condition.wait(timeout)
+        return None
+
+    def __finish(self, sync_id):
+        with self.__condition:
+            return self.__syncs.pop(sync_id)['future']
+
+    def __poll(self, sync_id, entry):
+        stream_name = entry['stream_name']
+        try:
+            data = self.__client.get(
+                '/api/bulk/2.0/syncs/{}'.format(sync_id),
+                endpoint='export_sync_poll')
+        except Exception as exc: # pylint: disable=broad-except
+            self.__finish(sync_id).set_exception(exc)
+            return
+
+        status = data['status']
+        if status == 'success':
+            self.__finish(sync_id).set_result(data)
+            return
+        elif status not in ['pending', 'active']:
+            message = '{} - status: {}, exporting failed'.format(
+                    stream_name,
+                    status)
+            LOGGER.error(message)
+            self.__finish(sync_id).set_exception(Exception(message))
+            return
+        elif (time.monotonic() - entry['started']) > self.__max_elapsed_time:
+            message = '{} - export deadline exceeded ({} secs)'.format(
+                    stream_name,
+                    self.__max_elapsed_time)
+            LOGGER.error(message)
+            self.__finish(sync_id).set_exception(Exception(message))
+            return
+
+        entry['interval'] = self.__next_interval(entry['interval'])
+        LOGGER.info('{} - status: {}, polling again in {} seconds'.format(
+                    stream_name,
+                    status,
+                    entry['interval']))
+        with self.__condition:
+            entry['next_poll'] = time.monotonic() + entry['interval']
@@ -0,0 +1,82 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+# Endpoint classes, each with its own concurrency limit
+AUTH = 'auth'
+BULK_CONTROL = 'bulk_control'
+BULK_DATA = 'bulk_data'
+REST = 'rest'
+ENDPOINT_CLASSES = [AUTH, BULK_CONTROL, BULK_DATA, REST]
+
+def get_endpoint_class(url):
+    parsed = urlparse(url)
+    if parsed.netloc == 'login.eloqua.com':
+        return AUTH
+    if parsed.path.startswith('/api/bulk/'):
+        if re.search(r'/syncs/[0-9]+/data$', parsed.path):
+            return BULK_DATA
+        return BULK_CONTROL
+    return REST
+
+class TokenBucket(object):
+    """Allows `rate` acquisitions per second, in bursts of up to `burst`."""
+    def __init__(self, rate, burst=None):
+        self.__rate = float(rate)
+        self.__burst = float(burst or max(1, rate))
+        self.__tokens = self.__burst
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def reserve(self):
+        """Takes the next token and returns the seconds until it is due."""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.__burst,
+                                self.__tokens + (now - self.__updated) * self.__rate)
+            self.__updated = now
+            self.__tokens -= 1
+            return -self.__tokens / self.__rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+class RequestGovernor(object):
+    """Limits the request rate, and the requests in flight per endpoint
+    class; `acquire` returns a function that releases the slot."""
+    def __init__(self, max_requests_per_second=0, burst=None, max_concurrent_requests=None):
+        self.__bucket = TokenBucket(max_requests_per_second, burst) \
+                        if max_requests_per_second else None
+        self.__semaphores = {endpoint_class: threading.BoundedSemaphore(limit)
+                             for endpoint_class, limit in (max_concurrent_requests or {}).items()
+                             if limit}
+
+    def acquire(self, endpoint_class):
+        semaphore = self.__semaphores.get(endpoint_class)
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            if self.__bucket is not None:
+                self.__bucket.acquire()
+        except:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+
+        if semaphore is None:
+            return lambda: None
+
+        released = threading.Event()
+        lock = threading.Lock()
+
+        def release():
+            with lock:
+                if released.is_set():
+                    return
+                released.set()
+            semaphore.release()
+
+        return release
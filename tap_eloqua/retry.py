@@ -0,0 +1,113 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import singer
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+
+LOGGER = singer.get_logger()
+
+DEFAULT_MAX_TRIES = 5
+DEFAULT_BASE_DELAY = 2 # seconds, doubled on every retry
+DEFAULT_MAX_DELAY = 60 # seconds
+DEFAULT_REQUEST_BUDGET = 300 # seconds spent waiting to retry one request
+DEFAULT_RUN_BUDGET = 1800 # seconds spent waiting to retry over the whole run
+
+class Server5xxError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__()
+        self.retry_after = retry_after
+
+class Server429Error(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__('Eloqua rate limit exceeded (HTTP 429)')
+        self.retry_after = retry_after
+
+RETRYABLE_ERRORS = (Server5xxError, Server429Error, ConnectionError, Timeout)
+# Non-idempotent requests are only retried if they never reached the server
+NON_IDEMPOTENT_RETRYABLE_ERRORS = (Server5xxError, Server429Error, ConnectionError, ConnectTimeout)
+IDEMPOTENT_METHODS = ['GET', 'PUT', 'DELETE']
+
+def is_idempotent(method):
+    return method.upper() in IDEMPOTENT_METHODS
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header, or None if invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class RetryPolicy(object):
+    """Retries transient errors with Retry-After or full-jitter backoff,
+    within per-request and per-run wait budgets."""
+    def __init__(self,
+                 max_tries=DEFAULT_MAX_TRIES,
+                 base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY,
+                 request_budget=DEFAULT_REQUEST_BUDGET,
+                 run_budget=DEFAULT_RUN_BUDGET):
+        self.__max_tries = max_tries
+        self.__base_delay = base_delay
+        self.__max_delay = max_delay
+        self.__request_budget = request_budget
+        self.__run_budget = run_budget
+        self.__run_waited = 0.0
+        self.__lock = threading.Lock()
+
+    def get_delay(self, tries, error):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.__max_delay, self.__base_delay * 2 ** (tries - 1)))
+
+    def __reserve(self, delay):
+        with self.__lock:
+            if self.__run_waited + delay > self.__run_budget:
+                return False
+            self.__run_waited += delay
+            return True
+
+    def __next_delay(self, tries, waited, error):
+        # Returns None when the call should be given up
+        delay = self.get_delay(tries, error)
+        if tries >= self.__max_tries or \
+           waited + delay > self.__request_budget or \
+           not self.__reserve(delay):
+            return None
+        LOGGER.info('Retrying in {:.1f} seconds after {} (try {} of {})'.format(
+            delay,
+            type(error).__name__,
+            tries,
+            self.__max_tries))
+        return delay
+
+    @staticmethod
+    def __retryable_errors(idempotent):
+        return RETRYABLE_ERRORS if idempotent else NON_IDEMPOTENT_RETRYABLE_ERRORS
+
+    def call(self, func, *args, idempotent=True, **kwargs):
+        retryable_errors = self.__retryable_errors(idempotent)
+        tries = 0
+        waited = 0.0
+        while True:
+            tries += 1
+            try:
+                return func(*args, **kwargs)
+            except retryable_errors as error:
+                delay = self.__next_delay(tries, waited, error)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                waited += delay
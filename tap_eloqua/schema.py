@@ -1,6 +1,9 @@
 import re
 import os
 import json
+from functools import partial
+
+from tap_eloqua.pipeline import run_concurrently
 
 SCHEMAS = None
 FIELD_METADATA = None
@@ -278,36 +281,49 @@ def get_static_schemas():
             })
         FIELD_METADATA[stream_name] = metadata
 
-def get_schemas(client):
+def get_custom_obj_stream_name(custom_obj):
+    ## TODO: more normalization?
+    return (
+        custom_obj['name']
+        .strip()
+        .lower()
+        .replace(' ', '_')
+        .replace('-', '_')
+    )
+
+def get_schemas(client, max_workers=1):
+    """
+    Builds SCHEMAS and FIELD_METADATA from the instance's bulk fields, with
+    up to `max_workers` field requests in flight at once. Results are merged
+    in the same order as when requested one at a time, so the catalog does
+    not depend on which request finishes first.
+    """
     global SCHEMAS, FIELD_METADATA
 
     if SCHEMAS:
         return SCHEMAS, FIELD_METADATA
 
-    SCHEMAS = {}
-    FIELD_METADATA = {}
+    jobs = []
 
     for bulk_object in BUILT_IN_BULK_OBJECTS:
         system_fields = BULK_SYSTEM_FIELDS
         if bulk_object == 'contacts':
-            system_fields.update(CONTACT_ADDITIONAL_FIELDS)
-        
-        json_schema, metadata = get_bulk_obj_schema(client,
-                                                    bulk_object,
-                                                    bulk_object,
-                                                    system_fields)
-        SCHEMAS[bulk_object] = json_schema
-        FIELD_METADATA[bulk_object] = metadata
+            system_fields = {**BULK_SYSTEM_FIELDS, **CONTACT_ADDITIONAL_FIELDS}
+
+        jobs.append((bulk_object, partial(get_bulk_obj_schema,
+                                          client,
+                                          bulk_object,
+                                          bulk_object,
+                                          system_fields)))
 
     for activity_type in ACTIVITY_TYPES:
         stream_name = activity_type_to_stream(activity_type)
-        json_schema, metadata = get_bulk_obj_schema(client,
-                                                    stream_name,
-                                                    'activities',
-                                                    ACTIVITY_BASE_SYSTEM_FIELD,
-                                                    activity_type=activity_type)
-        SCHEMAS[stream_name] = json_schema
-        FIELD_METADATA[stream_name] = metadata
+        jobs.append((stream_name, partial(get_bulk_obj_schema,
+                                          client,
+                                          stream_name,
+                                          'activities',
+                                          ACTIVITY_BASE_SYSTEM_FIELD,
+                                          activity_type=activity_type)))
 
     ## TODO: pagination
     data = client.get('/api/bulk/2.0/customObjects')
@@ -316,27 +332,27 @@ def get_schemas(client):
         groups = re.match(r'/customObjects/([0-9]+)',
                           custom_obj['uri']).groups()
         object_id = groups[0]
-
-        ## TODO: more normalization?
-        stream_name = (
-            custom_obj['name']
-            .strip()
-            .lower()
-            .replace(' ', '_')
-            .replace('-', '_')
-        )
+        stream_name = get_custom_obj_stream_name(custom_obj)
 
         query_language_name = 'CustomObject[{}]'.format(object_id)
-        json_schema, metadata = get_bulk_schema(
-            client,
-            stream_name,
-            '/api/bulk/2.0/customObjects/{}/fields'.format(object_id),
-            BASE_SYSTEM_FIELD,
-            query_language_name=query_language_name,
-            object_id=object_id)
-
-        SCHEMAS[stream_name] = json_schema
-        FIELD_METADATA[stream_name] = metadata
+        jobs.append((stream_name, partial(get_bulk_schema,
+                                          client,
+                                          stream_name,
+                                          '/api/bulk/2.0/customObjects/{}/fields'.format(object_id),
+                                          BASE_SYSTEM_FIELD,
+                                          query_language_name=query_language_name,
+                                          object_id=object_id)))
+
+    results = run_concurrently(lambda job: job[1](), jobs, max(1, max_workers))
+
+    schemas = {}
+    field_metadata = {}
+    for (stream_name, _), (json_schema, metadata) in zip(jobs, results):
+        schemas[stream_name] = json_schema
+        field_metadata[stream_name] = metadata
+
+    SCHEMAS = schemas
+    FIELD_METADATA = field_metadata
 
     get_static_schemas()
 
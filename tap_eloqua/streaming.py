@@ -0,0 +1,217 @@
+import csv
+import codecs
+import json
+import time
+
+DECODER = json.JSONDecoder()
+WHITESPACE = ' \t\n\r'
+
+class JsonItemStream(object):
+    """Yields the `items` of a JSON response body as it downloads; the other
+    keys can be read with `get` once the items are consumed."""
+    def __init__(self, chunks, close=None, on_finish=None):
+        self.__read_stats = [0, 0.0]
+        self.__chunks = read_chunks(chunks, self.__read_stats)
+        self.__close = close
+        self.__on_finish = on_finish
+        self.__decoder = codecs.getincrementaldecoder('utf-8')()
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+        self.__fields = {}
+        self.__count = 0
+        self.__items = self.__parse()
+
+    def __iter__(self):
+        return self.__items
+
+    def get(self, key, default=None):
+        if key == 'items':
+            return self.__items
+        return self.__fields.get(key, default)
+
+    def __getitem__(self, key):
+        if key == 'items':
+            return self.__items
+        return self.__fields[key]
+
+    def load(self):
+        """Reads the rest of the body and returns it as a dict."""
+        items = list(self.__items)
+        data = dict(self.__fields)
+        data['items'] = items
+        return data
+
+    def close(self):
+        self.__items.close()
+        # Releases the response even if iteration never started
+        self.__release()
+
+    def __release(self):
+        if self.__close is not None:
+            close, self.__close = self.__close, None
+            close()
+
+    def __read(self):
+        if self.__eof:
+            return False
+        chunk = next(self.__chunks, None)
+        if chunk is None:
+            self.__eof = True
+            self.__buffer = self.__buffer[self.__pos:] + self.__decoder.decode(b'', final=True)
+        else:
+            self.__buffer = self.__buffer[self.__pos:] + self.__decoder.decode(chunk)
+        self.__pos = 0
+        return True
+
+    def __next_char(self):
+        while True:
+            while self.__pos < len(self.__buffer) and self.__buffer[self.__pos] in WHITESPACE:
+                self.__pos += 1
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__read():
+                raise ValueError('Unexpected end of JSON response')
+
+    def __expect(self, chars):
+        char = self.__next_char()
+        if char not in chars:
+            raise ValueError('Expected one of {!r} at {!r}'.format(
+                chars,
+                self.__buffer[self.__pos:self.__pos + 20]))
+        self.__pos += 1
+        return char
+
+    def __value(self):
+        self.__next_char()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.__buffer, self.__pos)
+                # A number at the end of the buffer may continue in the
+                # next chunk
+                if end < len(self.__buffer) or self.__eof:
+                    self.__pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.__eof:
+                    raise
+            self.__read()
+
+    def __parse(self):
+        try:
+            self.__expect('{')
+            if self.__next_char() == '}':
+                self.__pos += 1
+            else:
+                while True:
+                    key = self.__value()
+                    self.__expect(':')
+                    if key == 'items':
+                        self.__expect('[')
+                        if self.__next_char() == ']':
+                            self.__pos += 1
+                        else:
+                            while True:
+                                item = self.__value()
+                                self.__count += 1
+                                yield item
+                                if self.__expect(',]') == ']':
+                                    break
+                    else:
+                        self.__fields[key] = self.__value()
+                    if self.__expect(',}') == '}':
+                        break
+            if self.__on_finish is not None:
+                self.__on_finish(self.__count, *self.__read_stats)
+        finally:
+            self.__release()
+
+def read_chunks(chunks, stats):
+    """Yields `chunks`, adding their bytes and wait seconds to `stats`."""
+    chunks = iter(chunks)
+    while True:
+        start = time.monotonic()
+        chunk = next(chunks, None)
+        stats[1] += time.monotonic() - start
+        if chunk is None:
+            return
+        stats[0] += len(chunk)
+        yield chunk
+
+def iter_lines(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    partial = ''
+    for chunk in chunks:
+        text = partial + decoder.decode(chunk)
+        start = 0
+        end = text.find('\n')
+        while end >= 0:
+            yield text[start:end + 1]
+            start = end + 1
+            end = text.find('\n', start)
+        partial = text[start:]
+    partial += decoder.decode(b'', final=True)
+    if partial:
+        yield partial
+
+class CsvItemStream(object):
+    """Yields the rows of a CSV response body as dicts as it downloads;
+    `hasMore` comes from calling `has_more` with the row count."""
+    def __init__(self, chunks, has_more, columns=None, close=None, on_finish=None):
+        self.__chunks = chunks
+        self.__has_more = has_more
+        self.__columns = columns if columns is not None else {}
+        self.__close = close
+        self.__on_finish = on_finish
+        self.__fields = {}
+        self.__items = self.__parse()
+
+    def __iter__(self):
+        return self.__items
+
+    def get(self, key, default=None):
+        if key == 'items':
+            return self.__items
+        return self.__fields.get(key, default)
+
+    def __getitem__(self, key):
+        if key == 'items':
+            return self.__items
+        return self.__fields[key]
+
+    def load(self):
+        """Reads the rest of the body and returns it as a dict."""
+        items = list(self.__items)
+        data = dict(self.__fields)
+        data['items'] = items
+        return data
+
+    def close(self):
+        self.__items.close()
+        # Releases the response even if iteration never started
+        self.__release()
+
+    def __release(self):
+        if self.__close is not None:
+            close, self.__close = self.__close, None
+            close()
+
+    def __parse(self):
+        read_stats = [0, 0.0]
+        count = 0
+        try:
+            reader = csv.reader(iter_lines(read_chunks(self.__chunks, read_stats)))
+            header = next(reader, None)
+            if header is not None:
+                header = tuple(header)
+                columns = self.__columns.setdefault(header, header)
+                for row in reader:
+                    if not row:
+                        continue
+                    count += 1
+                    yield dict(zip(columns, row))
+            self.__fields['hasMore'] = self.__has_more(count)
+            if self.__on_finish is not None:
+                self.__on_finish(count, *read_stats)
+        finally:
+            self.__release()
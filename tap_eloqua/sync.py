@@ -1,12 +1,17 @@
 import re
+import json
 import time
+import hashlib
 import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import pendulum
 import singer
-from singer import metrics, metadata, Transformer, UNIX_SECONDS_INTEGER_DATETIME_PARSING
-from requests.exceptions import HTTPError
+from singer import metrics, metadata, UNIX_SECONDS_INTEGER_DATETIME_PARSING
+from requests.exceptions import ChunkedEncodingError, ConnectionError, HTTPError
 
 from tap_eloqua.schema import (
     BUILT_IN_BULK_OBJECTS,
@@ -14,7 +19,13 @@ from tap_eloqua.schema import (
     get_schemas,
     activity_type_to_stream
 )
+from tap_eloqua import output
+from tap_eloqua.cleanup import cleanup_export, delete_export_definition
 from tap_eloqua.constants import STATIC_ENDPOINTS
+from tap_eloqua.paging import PageSizer, DEFAULT_MEMORY_BUDGET
+from tap_eloqua.pipeline import prefetch, run_concurrently
+from tap_eloqua.poller import ExportPoller
+from tap_eloqua.transform import RecordTransformer
 
 LOGGER = singer.get_logger()
 
@@ -22,6 +33,22 @@ MIN_RETRY_INTERVAL = 2 # 2 seconds
 MAX_RETRY_INTERVAL = 300 # 5 minutes
 MAX_RETRY_ELAPSED_TIME = 21600 # 6 hours
 
+# Eloqua rejects activity exports of this many rows or more
+MAX_ACTIVITY_EXPORT_ROWS = 5000000
+DEFAULT_ACTIVITY_EXPORT_TARGET_ROWS = 4000000
+
+# Smallest time window a partitioned export is split into
+MIN_EXPORT_PARTITION_SECONDS = 86400 # 1 day
+
+# Times an export is resumed after reading its data fails mid-page
+DEFAULT_EXPORT_PAGE_RETRIES = 3
+
+# Serializes state changes and message output when streams sync concurrently
+OUTPUT_LOCK = threading.RLock()
+
+# Compiled RecordTransformer per stream, keyed by tap_stream_id
+RECORD_TRANSFORMERS = {}
+
 def next_sleep_interval(previous_sleep_interval):
     min_interval = previous_sleep_interval or MIN_RETRY_INTERVAL
     max_interval = previous_sleep_interval * 2 or MIN_RETRY_INTERVAL
@@ -43,43 +70,118 @@ def get_bulk_bookmark(state, stream):
     return bookmark
 
 def write_bookmark(state, stream, value):
-    if 'bookmarks' not in state:
-        state['bookmarks'] = {}
-    state['bookmarks'][stream] = value
-    singer.write_state(state)
-
-def write_bulk_bookmark(state, stream_name, sync_id, offset, max_updated_at):
-    if 'bookmarks' not in state:
-        state['bookmarks'] = {}
-    state['bookmarks'][stream_name] = {
-        'sync_id': sync_id,
-        'offset': offset,
-        'datetime': max_updated_at
-    }
-    singer.write_state(state)
+    with OUTPUT_LOCK:
+        if 'bookmarks' not in state:
+            state['bookmarks'] = {}
+        state['bookmarks'][stream] = value
+        output.write_state(state)
+
+def write_bulk_bookmark(state,
+                        stream_name,
+                        sync_id,
+                        offset,
+                        max_updated_at,
+                        partition=None,
+                        definition_uri=None):
+    """
+    `definition_uri` records the export definition of a new export, so that
+    garbage collection keeps it while the export can be resumed; later
+    bookmarks of the same export carry it over.
+    """
+    with OUTPUT_LOCK:
+        if 'bookmarks' not in state:
+            state['bookmarks'] = {}
+        if partition is None:
+            previous = state['bookmarks'].get(stream_name) or {}
+            bookmark = {
+                'sync_id': sync_id,
+                'offset': offset,
+                'datetime': max_updated_at
+            }
+            state['bookmarks'][stream_name] = bookmark
+        else:
+            # Partitioned exports keep a resumable sub-bookmark per time
+            # window; the stream datetime only advances to their low-water mark.
+            stream_bookmark = state['bookmarks'][stream_name]
+            bookmark = stream_bookmark['partitions'][partition]
+            previous = dict(bookmark)
+            bookmark.update({
+                'sync_id': sync_id,
+                'offset': offset,
+                'datetime': max_updated_at,
+                'done': sync_id is None
+            })
+            stream_bookmark['datetime'] = get_partitions_low_water_mark(stream_bookmark['partitions'])
+
+        if definition_uri is None and sync_id is not None and previous.get('sync_id') == sync_id:
+            definition_uri = previous.get('definition_uri')
+        if definition_uri:
+            bookmark['definition_uri'] = definition_uri
+        else:
+            bookmark.pop('definition_uri', None)
+        output.write_state(state)
+
+class CheckpointPolicy(object):
+    """A checkpoint is due every `every_pages` pages or `every_seconds`
+    seconds, whichever comes first; 0 disables either."""
+    def __init__(self, every_pages=1, every_seconds=0):
+        self.every_pages = every_pages
+        self.every_seconds = every_seconds
+        self.__pages = 0
+        self.__last_checkpoint = time.monotonic()
+
+    def due(self):
+        self.__pages += 1
+        if (self.every_pages and self.__pages >= self.every_pages) or \
+           (self.every_seconds and
+            time.monotonic() - self.__last_checkpoint >= self.every_seconds):
+            self.__pages = 0
+            self.__last_checkpoint = time.monotonic()
+            return True
+        return False
 
 def write_schema(catalog, stream_id):
     stream = catalog.get_stream(stream_id)
     schema = stream.schema.to_dict()
-    singer.write_schema(stream_id, schema, stream.key_properties)
+    with OUTPUT_LOCK:
+        output.write_schema(stream_id, schema, stream.key_properties)
 
-def persist_records(catalog, stream_id, records, activity_type=None):
+def get_record_transformer(catalog, stream_id):
     stream = catalog.get_stream(stream_id)
-    schema = stream.schema.to_dict()
-    stream_metadata = metadata.to_map(stream.metadata)
+    cached = RECORD_TRANSFORMERS.get(stream_id)
+    if cached is None or cached[0] is not stream:
+        transformer = RecordTransformer(
+            stream.schema.to_dict(),
+            metadata.to_map(stream.metadata),
+            integer_datetime_fmt=UNIX_SECONDS_INTEGER_DATETIME_PARSING)
+        cached = (stream, transformer)
+        RECORD_TRANSFORMERS[stream_id] = cached
+    return cached[1]
+
+def iter_transformed_records(catalog, stream_id, records, activity_type=None):
+    transformer = get_record_transformer(catalog, stream_id)
+    for record in records:
+        if activity_type is not None:
+            # NB: Synthesize CreatedAt here as a workaround to fix activity exports (PR #19)
+            record['CreatedAt'] = record['ActivityDate']
+        yield transformer.transform(record)
+
+def transform_records(catalog, stream_id, records, activity_type=None):
+    return list(iter_transformed_records(catalog, stream_id, records, activity_type=activity_type))
+
+def write_records(stream_id, records):
+    # Records may be parsed from a download as they are written, so the
+    # output lock is not held while waiting for the next one.
     with metrics.record_counter(stream_id) as counter:
         for record in records:
-            if activity_type is not None:
-                # NB: Synthesize CreatedAt here as a workaround to fix activity exports (PR #19)
-                record['CreatedAt'] = record['ActivityDate']
-            with Transformer(
-                integer_datetime_fmt=UNIX_SECONDS_INTEGER_DATETIME_PARSING) as transformer:
-                record = transformer.transform(record,
-                                               schema,
-                                               stream_metadata)
-            singer.write_record(stream_id, record)
+            with OUTPUT_LOCK:
+                output.write_record(stream_id, record)
             counter.increment()
 
+def persist_records(catalog, stream_id, records, activity_type=None):
+    write_records(stream_id,
+                  transform_records(catalog, stream_id, records, activity_type=activity_type))
+
 def transform_export_row(row):
     out = {}
     for field, value in row.items():
@@ -88,6 +190,242 @@ def transform_export_row(row):
         out[field] = value
     return out
 
+def fetch_export_page(client,
+                      stream_name,
+                      sync_id,
+                      offset,
+                      limit,
+                      page_sizer=None,
+                      stream_data=False,
+                      csv_columns=None,
+                      total_count=None):
+    LOGGER.info('{} - Paginating export results - offset: {}, limit: {}'.format(
+        stream_name,
+        offset,
+        limit))
+
+    path = '/api/bulk/2.0/syncs/{}/data'.format(sync_id)
+    params = {
+        'limit': limit,
+        'offset': offset
+    }
+
+    if stream_data or csv_columns is not None:
+        # Size the page once it is read, from the time spent on the network
+        on_finish = None
+        headers_seconds = [0.0]
+        if page_sizer is not None:
+            on_finish = lambda rows, response_bytes, read_seconds: page_sizer.observe(
+                rows,
+                response_bytes,
+                headers_seconds[0] + read_seconds)
+
+        start = time.monotonic()
+        if csv_columns is not None:
+            # CSV pages carry no hasMore; a short page, or reaching the
+            # record count from the sync logs, ends the export.
+            has_more = lambda rows: rows >= limit and \
+                (total_count is None or offset + rows < total_count)
+            data = client.stream_csv(path,
+                                     has_more,
+                                     columns=csv_columns,
+                                     params=params,
+                                     endpoint='export_data',
+                                     on_finish=on_finish)
+        else:
+            data = client.stream(path, params=params, endpoint='export_data', on_finish=on_finish)
+        headers_seconds[0] = time.monotonic() - start
+        return data
+
+    kwargs = {}
+    responses = []
+    if page_sizer is not None:
+        kwargs['hooks'] = {'response': lambda response, *args, **kw: responses.append(response)}
+
+    # Timed around the whole call: the response's `elapsed` stops at the
+    # headers, before the page has downloaded.
+    start = time.monotonic()
+    data = client.get(path, params=params, endpoint='export_data', **kwargs)
+    elapsed = time.monotonic() - start
+
+    if responses:
+        response = responses[-1]
+        page_sizer.observe(len(data.get('items') or []),
+                           len(response.content),
+                           elapsed)
+
+    return data
+
+def fetch_loaded_export_page(*args, **kwargs):
+    data = fetch_export_page(*args, **kwargs)
+    if kwargs.get('stream_data') or kwargs.get('csv_columns') is not None:
+        data = data.load()
+    return data
+
+def log_page_size(stream_name, limit):
+    metrics.log(LOGGER, metrics.Point('gauge',
+                                      'export_page_size',
+                                      limit,
+                                      {'stream': stream_name}))
+
+def get_export_pages(client,
+                     stream_name,
+                     sync_id,
+                     bulk_page_size,
+                     offset,
+                     export_parallelism=1,
+                     total_count=None,
+                     page_sizer=None,
+                     stream_data=False,
+                     load_streamed_pages=False,
+                     csv_columns=None):
+    """Yields (offset, limit, page) for each page of a staged sync, in
+    offset order, fetching up to export_parallelism pages at once."""
+    last_limit = None
+
+    def next_limit():
+        nonlocal last_limit
+        if page_sizer is None:
+            return bulk_page_size
+        limit = page_sizer.size
+        if limit != last_limit:
+            log_page_size(stream_name, limit)
+            last_limit = limit
+        return limit
+
+    if export_parallelism <= 1:
+        has_more = True
+        while has_more:
+            limit = next_limit()
+            fetch = fetch_loaded_export_page if load_streamed_pages else fetch_export_page
+            data = fetch(client,
+                         stream_name,
+                         sync_id,
+                         offset,
+                         limit,
+                         page_sizer=page_sizer,
+                         stream_data=stream_data,
+                         csv_columns=csv_columns,
+                         total_count=total_count)
+            yield offset, limit, data
+            has_more = data['hasMore']
+            offset += limit
+        return
+
+    with ThreadPoolExecutor(max_workers=export_parallelism) as executor:
+        pending = deque()
+        next_offset = offset
+
+        def fill():
+            nonlocal next_offset
+            while len(pending) < export_parallelism and \
+                  (not pending or total_count is None or next_offset < total_count):
+                limit = next_limit()
+                future = executor.submit(fetch_loaded_export_page,
+                                         client,
+                                         stream_name,
+                                         sync_id,
+                                         next_offset,
+                                         limit,
+                                         page_sizer=page_sizer,
+                                         stream_data=stream_data,
+                                         csv_columns=csv_columns,
+                                         total_count=total_count)
+                pending.append((next_offset, limit, future))
+                next_offset += limit
+
+        try:
+            fill()
+            while pending:
+                page_offset, limit, future = pending.popleft()
+                data = future.result()
+                yield page_offset, limit, data
+                if not data['hasMore']:
+                    break
+                fill()
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+def transform_export_page(catalog, stream_name, updated_at_field, page, activity_type=None, lazy=False):
+    """Returns (next_offset, records, get_page_info) for a page; with `lazy`,
+    records are transformed as they are iterated."""
+    page_offset, limit, data = page
+    max_page_updated_at = None
+
+    def rows():
+        nonlocal max_page_updated_at
+        for item in data.get('items') or []:
+            updated_at = item[updated_at_field]
+            if max_page_updated_at is None or updated_at > max_page_updated_at:
+                max_page_updated_at = updated_at
+            yield transform_export_row(item)
+
+    # Items may be streamed, so they are read in a single pass and hasMore
+    # is only looked at afterwards.
+    records = iter_transformed_records(catalog,
+                                       stream_name,
+                                       rows(),
+                                       activity_type=activity_type)
+    if not lazy:
+        records = list(records)
+
+    return page_offset + limit, records, lambda: (data['hasMore'], max_page_updated_at)
+
+def get_transformed_export_pages(client,
+                                 catalog,
+                                 stream_name,
+                                 sync_id,
+                                 updated_at_field,
+                                 bulk_page_size,
+                                 offset,
+                                 activity_type=None,
+                                 export_parallelism=1,
+                                 total_count=None,
+                                 prefetch_pages=0,
+                                 page_sizer=None,
+                                 stream_data=False,
+                                 data_format='json'):
+    """Yields transform_export_page's result for each page of a staged sync,
+    transforming pages streamed one at a time lazily."""
+    pages = get_export_pages(client,
+                             stream_name,
+                             sync_id,
+                             bulk_page_size,
+                             offset,
+                             export_parallelism=export_parallelism,
+                             total_count=total_count,
+                             page_sizer=page_sizer,
+                             stream_data=stream_data,
+                             load_streamed_pages=bool(prefetch_pages),
+                             csv_columns={} if data_format == 'csv' else None)
+
+    # With prefetch_pages, download and transform run in pipelined stages
+    if prefetch_pages:
+        pages = prefetch(pages, prefetch_pages)
+
+    lazy = (stream_data or data_format == 'csv') and \
+           not prefetch_pages and export_parallelism <= 1
+    transformed_pages = map(lambda page: transform_export_page(catalog,
+                                                               stream_name,
+                                                               updated_at_field,
+                                                               page,
+                                                               activity_type=activity_type,
+                                                               lazy=lazy),
+                            pages)
+
+    if prefetch_pages:
+        transformed_pages = prefetch(transformed_pages, prefetch_pages)
+
+    try:
+        yield from transformed_pages
+    finally:
+        # Stops the prefetch threads when the consumer gives up early
+        for stage in [transformed_pages, pages]:
+            close = getattr(stage, 'close', None)
+            if close:
+                close()
+
 def stream_export(client,
                   state,
                   catalog,
@@ -97,41 +435,85 @@ def stream_export(client,
                   bulk_page_size,
                   bookmark_datetime,
                   offset=0,
-                  activity_type=None):
+                  activity_type=None,
+                  export_parallelism=1,
+                  total_count=None,
+                  prefetch_pages=0,
+                  checkpoint_every_pages=1,
+                  checkpoint_every_seconds=0,
+                  partition=None,
+                  adaptive_page_size=False,
+                  export_memory_budget=DEFAULT_MEMORY_BUDGET,
+                  stream_data=False,
+                  data_format='json',
+                  export_page_retries=DEFAULT_EXPORT_PAGE_RETRIES):
     LOGGER.info('{} - Pulling export results - {}'.format(stream_name, sync_id))
 
     write_schema(catalog, stream_name)
 
-    has_more = True
-    max_updated_at = None
-    while has_more:
-        LOGGER.info('{} - Paginating export results - offset: {}, limit: {}'.format(
-            stream_name,
-            offset,
-            bulk_page_size))
+    write_bulk_bookmark(state, stream_name, sync_id, offset, bookmark_datetime, partition=partition)
 
-        write_bulk_bookmark(state, stream_name, sync_id, offset, bookmark_datetime)
+    page_sizer = None
+    if adaptive_page_size:
+        # Pages being downloaded, queued between prefetch stages or written
+        # all share the memory budget.
+        page_sizer = PageSizer(bulk_page_size,
+                               memory_budget=export_memory_budget,
+                               pages_in_flight=max(1, export_parallelism) + 2 * prefetch_pages + 1)
 
-        data = client.get(
-            '/api/bulk/2.0/syncs/{}/data'.format(sync_id),
-            params={
-                'limit': bulk_page_size,
-                'offset': offset
-            },
-            endpoint='export_data')
-        has_more = data['hasMore']
-        offset += bulk_page_size
-
-        if 'items' in data and data['items']:
-            records = map(transform_export_row, data['items'])
-            persist_records(catalog, stream_name, records, activity_type=activity_type)
-
-            max_page_updated_at = max(map(lambda x: x[updated_at_field], data['items']))
-            if max_updated_at is None or max_page_updated_at > max_updated_at:
-                max_updated_at = max_page_updated_at
+    checkpoint = CheckpointPolicy(checkpoint_every_pages, checkpoint_every_seconds)
+    max_updated_at = None
+    retries = 0
+    while True:
+        pages = get_transformed_export_pages(client,
+                                             catalog,
+                                             stream_name,
+                                             sync_id,
+                                             updated_at_field,
+                                             bulk_page_size,
+                                             offset,
+                                             activity_type=activity_type,
+                                             export_parallelism=export_parallelism,
+                                             total_count=total_count,
+                                             prefetch_pages=prefetch_pages,
+                                             page_sizer=page_sizer,
+                                             stream_data=stream_data,
+                                             data_format=data_format)
+        try:
+            for next_offset, records, get_page_info in pages:
+                write_records(stream_name, records)
+                has_more, max_page_updated_at = get_page_info()
+                # Only a page that has been written in full moves the offset
+                # a failed read resumes from
+                offset = next_offset
+                retries = 0
+
+                if max_page_updated_at is not None and \
+                   (max_updated_at is None or max_page_updated_at > max_updated_at):
+                    max_updated_at = max_page_updated_at
+
+                if has_more and checkpoint.due():
+                    write_bulk_bookmark(state,
+                                        stream_name,
+                                        sync_id,
+                                        next_offset,
+                                        bookmark_datetime,
+                                        partition=partition)
+            break
+        except (ConnectionError, ChunkedEncodingError) as exc:
+            # The export resumes at the first page that was not written in
+            # full; rows already written from it are written again.
+            pages.close()
+            retries += 1
+            if retries > export_page_retries:
+                raise
+            LOGGER.warning('{} - Reading export data failed ({}), retrying from offset {}'.format(
+                stream_name,
+                exc,
+                offset))
 
     final_datetime = max_updated_at or bookmark_datetime
-    write_bulk_bookmark(state, stream_name, None, None, final_datetime)
+    write_bulk_bookmark(state, stream_name, None, None, final_datetime, partition=partition)
 
     return final_datetime
 
@@ -145,41 +527,41 @@ class ActivityExportTooLarge(Exception):
     """
     pass
 
-def sync_bulk_obj(client, catalog, state, start_date, stream_name, bulk_page_size, activity_type=None, end_date=None):
-    LOGGER.info('{} - Starting export'.format(stream_name))
-
-    stream = catalog.get_stream(stream_name)
-    if activity_type:
-        updated_at_field_name = 'ActivityDate'
-        updated_at_field = 'CreatedAt'
-    else:
-        updated_at_field = 'UpdatedAt'
-        updated_at_field_name = updated_at_field
-
-    last_bookmark = get_bulk_bookmark(state, stream_name)
-    last_date_raw = last_bookmark.get('datetime', start_date)
-    last_date = pendulum.parse(last_date_raw).to_datetime_string()
-    last_sync_id = last_bookmark.get('sync_id')
-    last_offset = last_bookmark.get('offset')
-
-    if last_sync_id:
-        LOGGER.info('{} - Resuming previous export: {}'.format(stream_name, last_sync_id))
-        try:
-            last_date = stream_export(client,
-                                      state,
-                                      catalog,
-                                      stream_name,
-                                      last_sync_id,
-                                      updated_at_field_name,
-                                      bulk_page_size,
-                                      last_date,
-                                      offset=last_offset)
-        except HTTPError as e:
-            if e.response.status_code in [404, 410]:
-                LOGGER.info('{} - Previous export expired: {}'.format(stream_name, last_sync_id))
-            else:
-                raise
+def wait_for_sync(client, stream_name, sync_id, poller=None):
+    if poller is not None:
+        return poller.wait(stream_name, sync_id)
 
+    sleep = 0
+    start_time = time.time()
+    while True:
+        data = client.get(
+            '/api/bulk/2.0/syncs/{}'.format(sync_id),
+            endpoint='export_sync_poll')
+
+        status = data['status']
+        if status == 'success':
+            return data
+        elif status not in ['pending', 'active']:
+            message = '{} - status: {}, exporting failed'.format(
+                    stream_name,
+                    status)
+            LOGGER.error(message)
+            raise Exception(message)
+        elif (time.time() - start_time) > MAX_RETRY_ELAPSED_TIME:
+            message = '{} - export deadline exceeded ({} secs)'.format(
+                    stream_name,
+                    MAX_RETRY_ELAPSED_TIME)
+            LOGGER.error(message)
+            raise Exception(message)
+
+        sleep = next_sleep_interval(sleep)
+        LOGGER.info('{} - status: {}, sleeping for {} seconds'.format(
+                    stream_name,
+                    status,
+                    sleep))
+        time.sleep(sleep)
+
+def get_export_fields(stream, stream_name):
     fields = {}
     obj_meta = None
     for meta in stream.metadata:
@@ -197,8 +579,9 @@ def sync_bulk_obj(client, catalog, state, start_date, stream_name, bulk_page_siz
     else:
         LOGGER.info('{} - Syncing {} fields'.format(stream_name, num_fields))
 
-    language_obj = obj_meta['tap-eloqua.query-language-name']
+    return fields, obj_meta
 
+def get_export_filter(language_obj, updated_at_field, last_date, end_date=None, activity_type=None):
     _filter = "'{{" + language_obj + "." + updated_at_field + "}}' >= '" + last_date + "'"
 
     if end_date:
@@ -206,10 +589,60 @@ def sync_bulk_obj(client, catalog, state, start_date, stream_name, bulk_page_siz
 
     if activity_type is not None:
         _filter += " AND '{{Activity.Type}}' = '" + activity_type + "'"
-        # NB: We observed shuffled data when Activity.CreatedAt was specified twice in the query.
-        #     The key 'CreatedAt' is synthetic, so add it in after the export. (PR #19)
-        fields.pop('CreatedAt', None)
 
+    return _filter
+
+def get_export_definition_key(url_obj, fields, _filter):
+    # Dates are the only part of the filter that changes between runs
+    filter_shape = re.sub(r"'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}'", "'?'", _filter)
+    definition = json.dumps([url_obj, fields, filter_shape], sort_keys=True)
+    return hashlib.sha1(definition.encode('utf-8')).hexdigest()
+
+def save_export_definition(client, state, stream_name, url_obj, params):
+    """
+    Returns the uri of an export definition for `params`, reusing the one
+    cached in the state for the stream when its fields and filter shape are
+    unchanged. The reused definition is updated with PUT to pick up the new
+    filter dates. A cached definition that no longer matches is deleted and
+    replaced.
+    """
+    key = get_export_definition_key(url_obj, params['fields'], params['filter'])
+    with OUTPUT_LOCK:
+        cached = state.get('export_definitions', {}).get(stream_name)
+
+    if cached and cached['key'] == key:
+        try:
+            data = client.put(
+                '/api/bulk/2.0' + cached['uri'],
+                json=params,
+                endpoint='export_update_def')
+            LOGGER.info('{} - Reusing export definition {}'.format(stream_name, cached['uri']))
+            return data['uri']
+        except HTTPError as e:
+            if e.response.status_code not in [404, 410]:
+                raise
+            LOGGER.info('{} - Cached export definition expired: {}'.format(
+                stream_name,
+                cached['uri']))
+    elif cached:
+        delete_export_definition(client, stream_name, cached['uri'])
+
+    data = client.post(
+        '/api/bulk/2.0/{}/exports'.format(url_obj),
+        json=params,
+        endpoint='export_create_def')
+
+    with OUTPUT_LOCK:
+        if 'export_definitions' not in state:
+            state['export_definitions'] = {}
+        state['export_definitions'][stream_name] = {
+            'key': key,
+            'uri': data['uri']
+        }
+
+    return data['uri']
+
+def create_export_sync(client, stream_name, url_obj, fields, _filter, state=None):
     params = {
         'name': 'Singer Sync - ' + datetime.utcnow().isoformat(),
         'fields': fields,
@@ -219,69 +652,29 @@ def sync_bulk_obj(client, catalog, state, start_date, stream_name, bulk_page_siz
         'dataRetentionDuration': 'P3D' # 3 days in ISO-8601 duration notation this can be increased up to 14 days
     }
 
-    if activity_type:
-        url_obj = 'activities'
-    elif obj_meta['tap-eloqua.id']:
-        url_obj = 'customObjects/' + obj_meta['tap-eloqua.id']
+    if state is not None:
+        definition_uri = save_export_definition(client, state, stream_name, url_obj, params)
     else:
-        url_obj = stream_name
-
-    with metrics.job_timer('bulk_export'):
-        log_string = "{} - Creating bulk export from {}".format(stream_name,
-                                                                last_date)
-        if end_date:
-            log_string += " to {}".format(end_date.to_datetime_string())
-        LOGGER.info(log_string)
-
         data = client.post(
             '/api/bulk/2.0/{}/exports'.format(url_obj),
             json=params,
             endpoint='export_create_def')
+        definition_uri = data['uri']
 
-        data = client.post(
-            '/api/bulk/2.0/syncs',
-            json={
-                'syncedInstanceUri': data['uri']
-            },
-            endpoint='export_create_sync')
-
-        sync_id = re.match(r'/syncs/([0-9]+)', data['uri']).groups()[0]
+    data = client.post(
+        '/api/bulk/2.0/syncs',
+        json={
+            'syncedInstanceUri': definition_uri
+        },
+        endpoint='export_create_sync')
 
-        LOGGER.info('{} - Created export - {}'.format(stream_name, sync_id))
+    sync_id = re.match(r'/syncs/([0-9]+)', data['uri']).groups()[0]
 
-        write_bulk_bookmark(state, stream_name, sync_id, 0, last_date_raw)
-
-        sleep = 0
-        start_time = time.time()
-        while True:
-            data = client.get(
-                '/api/bulk/2.0/syncs/{}'.format(sync_id),
-                endpoint='export_sync_poll')
-
-            status = data['status']
-            if status == 'success':
-                break
-            elif status not in ['pending', 'active']:
-                message = '{} - status: {}, exporting failed'.format(
-                        stream_name,
-                        status)
-                LOGGER.error(message)
-                raise Exception(message)
-            elif (time.time() - start_time) > MAX_RETRY_ELAPSED_TIME:
-                message = '{} - export deadline exceeded ({} secs)'.format(
-                        stream_name,
-                        MAX_RETRY_ELAPSED_TIME)
-                LOGGER.error(message)
-                raise Exception(message)
+    LOGGER.info('{} - Created export - {}'.format(stream_name, sync_id))
 
-            sleep = next_sleep_interval(sleep)
-            LOGGER.info('{} - status: {}, sleeping for {} seconds'.format(
-                        stream_name,
-                        status,
-                        sleep))
-            time.sleep(sleep)
+    return sync_id, definition_uri
 
-    # Check record count
+def get_export_record_count(client, sync_id):
     data = client.get(
         '/api/bulk/2.0/syncs/{}/logs'.format(sync_id),
         endpoint='export_sync_poll')
@@ -292,7 +685,137 @@ def sync_bulk_obj(client, catalog, state, start_date, stream_name, bulk_page_siz
     if export_success_log:
         record_count = export_success_log["count"]
         LOGGER.info("Sync id {} contains {} records.".format(sync_id, record_count))
-        if activity_type and record_count >= 5000000:
+        return record_count
+    return None
+
+def sync_bulk_obj(client,
+                  catalog,
+                  state,
+                  start_date,
+                  stream_name,
+                  bulk_page_size,
+                  activity_type=None,
+                  end_date=None,
+                  poller=None,
+                  export_partitions=1,
+                  reuse_export_definitions=False,
+                  cleanup_exports=False,
+                  export_slots=None,
+                  **export_options):
+    LOGGER.info('{} - Starting export'.format(stream_name))
+
+    stream = catalog.get_stream(stream_name)
+    if activity_type:
+        updated_at_field_name = 'ActivityDate'
+        updated_at_field = 'CreatedAt'
+    else:
+        updated_at_field = 'UpdatedAt'
+        updated_at_field_name = updated_at_field
+
+    last_bookmark = get_bulk_bookmark(state, stream_name)
+    last_date_raw = last_bookmark.get('datetime', start_date)
+    last_date = pendulum.parse(last_date_raw).to_datetime_string()
+    last_sync_id = last_bookmark.get('sync_id')
+    last_offset = last_bookmark.get('offset')
+
+    if last_sync_id:
+        LOGGER.info('{} - Resuming previous export: {}'.format(stream_name, last_sync_id))
+        try:
+            last_date = stream_export(client,
+                                      state,
+                                      catalog,
+                                      stream_name,
+                                      last_sync_id,
+                                      updated_at_field_name,
+                                      bulk_page_size,
+                                      last_date,
+                                      offset=last_offset,
+                                      **export_options)
+            if cleanup_exports:
+                cleanup_export(client,
+                               stream_name,
+                               last_sync_id,
+                               None if reuse_export_definitions else last_bookmark.get('definition_uri'))
+        except HTTPError as e:
+            if e.response.status_code in [404, 410]:
+                LOGGER.info('{} - Previous export expired: {}'.format(stream_name, last_sync_id))
+            else:
+                raise
+
+    fields, obj_meta = get_export_fields(stream, stream_name)
+
+    language_obj = obj_meta['tap-eloqua.query-language-name']
+
+    if activity_type:
+        url_obj = 'activities'
+    elif obj_meta['tap-eloqua.id']:
+        url_obj = 'customObjects/' + obj_meta['tap-eloqua.id']
+    else:
+        url_obj = stream_name
+
+    if last_bookmark.get('partitions') or \
+       (export_partitions > 1 and stream_name in BUILT_IN_BULK_OBJECTS and
+        activity_type is None and end_date is None):
+        partitions = last_bookmark.get('partitions') or \
+            plan_export_partitions(last_date, export_partitions)
+        if len(partitions) > 1:
+            sync_partitioned_export(client,
+                                    catalog,
+                                    state,
+                                    stream_name,
+                                    bulk_page_size,
+                                    url_obj,
+                                    fields,
+                                    language_obj,
+                                    partitions,
+                                    poller=poller,
+                                    cleanup_exports=cleanup_exports,
+                                    export_slots=export_slots,
+                                    **export_options)
+            return
+
+    _filter = get_export_filter(language_obj,
+                                updated_at_field,
+                                last_date,
+                                end_date=end_date,
+                                activity_type=activity_type)
+
+    if activity_type is not None:
+        # NB: We observed shuffled data when Activity.CreatedAt was specified twice in the query.
+        #     The key 'CreatedAt' is synthetic, so add it in after the export. (PR #19)
+        fields.pop('CreatedAt', None)
+
+    with metrics.job_timer('bulk_export'):
+        log_string = "{} - Creating bulk export from {}".format(stream_name,
+                                                                last_date)
+        if end_date:
+            log_string += " to {}".format(end_date.to_datetime_string())
+        LOGGER.info(log_string)
+
+        # Concurrent time windows of one stream each need their own
+        # definition, so only single exports reuse the cached one.
+        sync_id, definition_uri = create_export_sync(
+            client,
+            stream_name,
+            url_obj,
+            fields,
+            _filter,
+            state=state if reuse_export_definitions else None)
+
+        write_bulk_bookmark(state, stream_name, sync_id, 0, last_date_raw,
+                            definition_uri=definition_uri)
+
+        wait_for_sync(client, stream_name, sync_id, poller=poller)
+
+    # Check record count
+    record_count = get_export_record_count(client, sync_id)
+    if activity_type and record_count is not None:
+        window_end = end_date or pendulum.now('UTC')
+        write_activity_stats(state,
+                             stream_name,
+                             record_count,
+                             (window_end - pendulum.parse(last_date)).in_seconds())
+        if record_count >= MAX_ACTIVITY_EXPORT_ROWS:
             raise ActivityExportTooLarge("Export too large, retrying with smaller window.")
 
     stream_export(client,
@@ -303,15 +826,204 @@ def sync_bulk_obj(client, catalog, state, start_date, stream_name, bulk_page_siz
                   updated_at_field_name,
                   bulk_page_size,
                   last_date,
-                  activity_type=activity_type)
+                  activity_type=activity_type,
+                  total_count=record_count,
+                  **export_options)
+
+    if cleanup_exports:
+        # A cached definition is reused by the next run, so keep it.
+        cleanup_export(client,
+                       stream_name,
+                       sync_id,
+                       None if reuse_export_definitions else definition_uri)
+
+def plan_export_partitions(last_date, export_partitions):
+    """
+    Splits [last_date, now) into up to export_partitions equal windows of at
+    least MIN_EXPORT_PARTITION_SECONDS each. The last window is left open so
+    it also picks up rows updated while the exports run.
+    """
+    start = pendulum.parse(last_date)
+    seconds = (pendulum.now('UTC') - start).in_seconds()
+    count = max(1, min(export_partitions, int(seconds // MIN_EXPORT_PARTITION_SECONDS)))
+    window = seconds / count
+
+    partitions = []
+    for index in range(count):
+        window_start = start.add(seconds=int(window * index))
+        window_end = start.add(seconds=int(window * (index + 1))) if index < count - 1 else None
+        partitions.append({
+            'start': window_start.to_datetime_string(),
+            'end': window_end.to_datetime_string() if window_end else None,
+            'sync_id': None,
+            'offset': None,
+            'datetime': None,
+            'done': False
+        })
+    return partitions
+
+def get_partitions_low_water_mark(partitions):
+    """
+    All rows updated before the start of the earliest unfinished window have
+    been emitted. Once every window is done, the stream bookmark is the
+    latest updated-at value any window saw.
+    """
+    for partition in partitions:
+        if not partition['done']:
+            return partition['start']
+    return max(partition['datetime'] for partition in partitions)
+
+def sync_partitioned_export(client,
+                            catalog,
+                            state,
+                            stream_name,
+                            bulk_page_size,
+                            url_obj,
+                            fields,
+                            language_obj,
+                            partitions,
+                            poller=None,
+                            cleanup_exports=False,
+                            export_slots=None,
+                            **export_options):
+    """
+    `export_slots` is the semaphore of exports shared with the other streams
+    of the batch, one of which the caller holds. Each window takes a slot.
+    """
+    LOGGER.info('{} - Exporting {} time windows concurrently'.format(
+        stream_name,
+        len(partitions)))
+
+    with OUTPUT_LOCK:
+        state['bookmarks'] = state.get('bookmarks', {})
+        state['bookmarks'][stream_name] = {
+            'datetime': get_partitions_low_water_mark(partitions),
+            'partitions': partitions
+        }
+        output.write_state(state)
+
+    def sync_partition(index, poller):
+        partition = partitions[index]
+        if partition['done']:
+            return
+
+        with slots:
+            sync_window(index, partition, poller)
+
+    def sync_window(index, partition, poller):
+        last_sync_id = partition['sync_id']
+        # Read before stream_export's last bookmark drops it from the window
+        last_definition_uri = partition.get('definition_uri')
+        if last_sync_id:
+            LOGGER.info('{} - Resuming window {} export: {}'.format(
+                stream_name, index, last_sync_id))
+            try:
+                stream_export(client,
+                              state,
+                              catalog,
+                              stream_name,
+                              last_sync_id,
+                              'UpdatedAt',
+                              bulk_page_size,
+                              partition['start'],
+                              offset=partition['offset'],
+                              partition=index,
+                              **export_options)
+                if cleanup_exports:
+                    cleanup_export(client, stream_name, last_sync_id, last_definition_uri)
+                return
+            except HTTPError as e:
+                if e.response.status_code not in [404, 410]:
+                    raise
+                LOGGER.info('{} - Previous window {} export expired: {}'.format(
+                    stream_name, index, last_sync_id))
+
+        end_date = pendulum.parse(partition['end']) if partition['end'] else None
+        _filter = get_export_filter(language_obj,
+                                    'UpdatedAt',
+                                    partition['start'],
+                                    end_date=end_date)
+
+        with metrics.job_timer('bulk_export'):
+            LOGGER.info('{} - Creating bulk export for window {} from {} to {}'.format(
+                stream_name,
+                index,
+                partition['start'],
+                partition['end'] or 'now'))
+
+            sync_id, definition_uri = create_export_sync(client,
+                                                         stream_name,
+                                                         url_obj,
+                                                         fields,
+                                                         _filter)
+
+            write_bulk_bookmark(state, stream_name, sync_id, 0, partition['start'],
+                                partition=index,
+                                definition_uri=definition_uri)
+
+            wait_for_sync(client, stream_name, sync_id, poller=poller)
+
+        record_count = get_export_record_count(client, sync_id)
+
+        stream_export(client,
+                      state,
+                      catalog,
+                      stream_name,
+                      sync_id,
+                      'UpdatedAt',
+                      bulk_page_size,
+                      partition['start'],
+                      total_count=record_count,
+                      partition=index,
+                      **export_options)
+
+        if cleanup_exports:
+            cleanup_export(client, stream_name, sync_id, definition_uri)
+
+    def run(poller):
+        run_concurrently(lambda index: sync_partition(index, poller),
+                         range(len(partitions)),
+                         len(partitions))
+
+    if export_slots is None:
+        slots = threading.BoundedSemaphore(len(partitions))
+    else:
+        # This thread only waits on its windows, so its slot goes to them
+        slots = export_slots
+        slots.release()
+    try:
+        if poller is not None:
+            run(poller)
+        else:
+            with ExportPoller(client, next_sleep_interval, MAX_RETRY_ELAPSED_TIME) as poller:
+                run(poller)
+    finally:
+        if export_slots is not None:
+            export_slots.acquire()
+
+    write_bulk_bookmark(state,
+                        stream_name,
+                        None,
+                        None,
+                        get_partitions_low_water_mark(partitions))
 
-def sync_static_endpoint(client, catalog, state, start_date, stream_id, path, updated_at_col):
+def sync_static_endpoint(client,
+                         catalog,
+                         state,
+                         start_date,
+                         stream_id,
+                         path,
+                         updated_at_col,
+                         checkpoint_every_pages=1,
+                         checkpoint_every_seconds=0):
     write_schema(catalog, stream_id)
 
     last_date_raw = get_bookmark(state, stream_id, start_date)
     last_date = pendulum.parse(last_date_raw).to_datetime_string()
     search = "{}>='{}'".format(updated_at_col, last_date)
 
+    checkpoint = CheckpointPolicy(checkpoint_every_pages, checkpoint_every_seconds)
+    pending_bookmark = None
     page = 1
     count = 1000
     while True:
@@ -332,13 +1044,18 @@ def sync_static_endpoint(client, catalog, state, start_date, stream_id, path, up
         persist_records(catalog, stream_id, records)
 
         if records:
-            max_updated_at = pendulum.from_timestamp(
+            pending_bookmark = pendulum.from_timestamp(
                 int(records[-1][updated_at_col])).to_iso8601_string()
-            write_bookmark(state, stream_id, max_updated_at)
+            if checkpoint.due():
+                write_bookmark(state, stream_id, pending_bookmark)
+                pending_bookmark = None
 
         if len(records) < count:
             break
 
+    if pending_bookmark is not None:
+        write_bookmark(state, stream_id, pending_bookmark)
+
 def get_selected_streams(catalog):
     selected_streams = set()
     for stream in catalog.streams:
@@ -348,9 +1065,20 @@ def get_selected_streams(catalog):
             selected_streams.add(stream.tap_stream_id)
     return list(selected_streams)
 
+def write_activity_stats(state, stream_name, count, seconds):
+    with OUTPUT_LOCK:
+        if 'activity_stats' not in state:
+            state['activity_stats'] = {}
+        state['activity_stats'][stream_name] = {
+            'count': count,
+            'seconds': seconds
+        }
+        output.write_state(state)
+
 def update_current_stream(state, stream_name):
-    state['current_stream'] = stream_name
-    singer.write_state(state)
+    with OUTPUT_LOCK:
+        state['current_stream'] = stream_name
+        output.write_state(state)
 
 def should_sync_stream(selected_streams, last_stream, stream_name):
     if last_stream == stream_name or last_stream is None:
@@ -360,6 +1088,20 @@ def should_sync_stream(selected_streams, last_stream, stream_name):
             return True, last_stream
     return False, last_stream
 
+def prune_export_definitions(client, state, selected_streams, cleanup_exports=False):
+    """
+    Drops the cached export definitions of streams that are no longer
+    selected. They are deleted with cleanup_exports, and left to
+    garbage collection otherwise.
+    """
+    definitions = state.get('export_definitions', {})
+    for stream_name in list(definitions):
+        if stream_name in selected_streams:
+            continue
+        definition = definitions.pop(stream_name)
+        if cleanup_exports:
+            delete_export_definition(client, stream_name, definition['uri'])
+
 def get_custom_obj_streams(catalog):
     custom_streams = set()
     for stream in catalog.streams:
@@ -375,18 +1117,24 @@ def sync_activity_stream(client,
                          catalog,
                          start_date,
                          bulk_page_size,
-                         activity_type):
-    finished = False
+                         activity_type,
+                         activity_export_target_rows=DEFAULT_ACTIVITY_EXPORT_TARGET_ROWS,
+                         **export_options):
     sync_start = pendulum.now('UTC')
-    end_date = sync_start
-    last_date = pendulum.parse(start_date)
-    while not finished:
-        try:
-            # Get latest bookmark to adjust time window from, if needed
-            last_date_raw = get_bulk_bookmark(state, stream_name).get('datetime', start_date)
-            last_date = pendulum.parse(last_date_raw)
+    end_date = None
+    while True:
+        # Get latest bookmark to adjust time window from, if needed
+        last_date_raw = get_bulk_bookmark(state, stream_name).get('datetime', start_date)
+        last_date = pendulum.parse(last_date_raw)
 
-            update_current_stream(state, stream_name)
+        if end_date is None:
+            end_date = plan_activity_window(state,
+                                            stream_name,
+                                            last_date,
+                                            sync_start,
+                                            activity_export_target_rows)
+
+        try:
             sync_bulk_obj(client,
                           catalog,
                           state,
@@ -394,81 +1142,224 @@ def sync_activity_stream(client,
                           stream_name,
                           bulk_page_size,
                           activity_type=activity_type,
-                          end_date=end_date)
-            if end_date >= sync_start:
-                finished = True
-            else:
-                # If not done, sync again to now()
-                end_date = sync_start
+                          end_date=end_date,
+                          **export_options)
         except ActivityExportTooLarge as ex:
-            LOGGER.warn(ex)
+            # The planner underestimated this window; halve it and retry.
+            LOGGER.warning(ex)
             end_date = last_date.add(seconds=(end_date - last_date).in_seconds() / 2)
             if end_date > sync_start:
                 end_date = sync_start
+            continue
+
+        if end_date >= sync_start:
+            return
+        # If not done, plan the next window up to now()
+        end_date = None
+
+def plan_activity_window(state, stream_name, last_date, sync_start, target_rows):
+    """
+    Picks the end of the next activity export window so that it is expected
+    to hold about `target_rows` rows, based on the activity density of the
+    last export recorded for the stream. Without a usable estimate the window
+    runs to `sync_start`.
+    """
+    stats = state.get('activity_stats', {}).get(stream_name)
+    if not stats or not stats['count'] or not stats['seconds'] or last_date >= sync_start:
+        return sync_start
+
+    density = stats['count'] / stats['seconds']
+    seconds = max(1, int(target_rows / density))
+    end_date = last_date.add(seconds=seconds)
+    if end_date >= sync_start:
+        return sync_start
+
+    LOGGER.info('{} - Planned export window from {} to {} (~{} rows expected)'.format(
+        stream_name,
+        last_date.to_datetime_string(),
+        end_date.to_datetime_string(),
+        int(seconds * density)))
+    return end_date
+
+def sync_bulk_streams(client,
+                      catalog,
+                      state,
+                      start_date,
+                      stream_names,
+                      bulk_page_size,
+                      max_concurrent_exports=1,
+                      **export_options):
+    # Shared by the streams and their export_partitions windows
+    export_slots = threading.BoundedSemaphore(max(1, max_concurrent_exports))
+
+    def sync_stream(stream_name, poller=None):
+        with export_slots:
+            sync_bulk_obj(client,
+                          catalog,
+                          state,
+                          start_date,
+                          stream_name,
+                          bulk_page_size,
+                          poller=poller,
+                          export_slots=export_slots,
+                          **export_options)
+
+    if max_concurrent_exports <= 1 or len(stream_names) <= 1:
+        for stream_name in stream_names:
+            update_current_stream(state, stream_name)
+            sync_stream(stream_name)
+        return
+
+    # Each stream in the batch resumes from its own sync_id/offset bookmark,
+    # so current_stream only needs to point at the start of the batch.
+    LOGGER.info('Syncing {} bulk streams with up to {} concurrent exports'.format(
+        len(stream_names),
+        max_concurrent_exports))
+    update_current_stream(state, stream_names[0])
+    with ExportPoller(client, next_sleep_interval, MAX_RETRY_ELAPSED_TIME) as poller:
+        run_concurrently(lambda stream_name: sync_stream(stream_name, poller=poller),
+                         stream_names,
+                         max_concurrent_exports)
+
+def sync_activity_streams(client,
+                          catalog,
+                          state,
+                          start_date,
+                          activity_streams,
+                          bulk_page_size,
+                          max_concurrent_activity_exports=1,
+                          **export_options):
+    def sync_stream(activity_stream, poller=None):
+        stream_name, activity_type = activity_stream
+        sync_activity_stream(client,
+                             stream_name,
+                             state,
+                             catalog,
+                             start_date,
+                             bulk_page_size,
+                             activity_type,
+                             poller=poller,
+                             **export_options)
+
+    if max_concurrent_activity_exports <= 1 or len(activity_streams) <= 1:
+        for activity_stream in activity_streams:
+            update_current_stream(state, activity_stream[0])
+            sync_stream(activity_stream)
+        return
+
+    # As with bulk streams, each activity stream resumes from its own
+    # bookmark, so current_stream only needs to point at the start of the batch.
+    LOGGER.info('Syncing {} activity streams with up to {} concurrent exports'.format(
+        len(activity_streams),
+        max_concurrent_activity_exports))
+    update_current_stream(state, activity_streams[0][0])
+    with ExportPoller(client, next_sleep_interval, MAX_RETRY_ELAPSED_TIME) as poller:
+        run_concurrently(lambda activity_stream: sync_stream(activity_stream, poller=poller),
+                         activity_streams,
+                         max_concurrent_activity_exports)
+
+def sync(client,
+         catalog,
+         state,
+         start_date,
+         bulk_page_size,
+         max_concurrent_exports=1,
+         checkpoint_every_pages=1,
+         checkpoint_every_seconds=0,
+         activity_export_target_rows=DEFAULT_ACTIVITY_EXPORT_TARGET_ROWS,
+         max_concurrent_activity_exports=1,
+         **export_options):
+    export_options['checkpoint_every_pages'] = checkpoint_every_pages
+    export_options['checkpoint_every_seconds'] = checkpoint_every_seconds
 
-def sync(client, catalog, state, start_date, bulk_page_size):
     selected_streams = get_selected_streams(catalog)
 
     if not selected_streams:
         return
 
+    prune_export_definitions(client,
+                             state,
+                             selected_streams,
+                             cleanup_exports=export_options.get('cleanup_exports', False))
+
     last_stream = state.get('current_stream')
 
+    bulk_streams = []
     for bulk_object in BUILT_IN_BULK_OBJECTS:
         should_stream, last_stream = should_sync_stream(selected_streams,
                                                         last_stream,
                                                         bulk_object)
         if should_stream:
-            update_current_stream(state, bulk_object)
-            sync_bulk_obj(client,
-                          catalog,
-                          state,
-                          start_date,
-                          bulk_object,
-                          bulk_page_size)
+            bulk_streams.append(bulk_object)
 
+    activity_streams = []
     for activity_type in ACTIVITY_TYPES:
         stream_name = activity_type_to_stream(activity_type)
         should_stream, last_stream = should_sync_stream(selected_streams,
                                                         last_stream,
                                                         stream_name)
         if should_stream:
-            sync_activity_stream(client,
-                                 stream_name,
-                                 state,
-                                 catalog,
-                                 start_date,
-                                 bulk_page_size,
-                                 activity_type)
+            activity_streams.append((stream_name, activity_type))
 
+    custom_streams = []
     for stream_name in get_custom_obj_streams(catalog):
         should_stream, last_stream = should_sync_stream(selected_streams,
                                                         last_stream,
                                                         stream_name)
         if should_stream:
-            update_current_stream(state, stream_name)
-            sync_bulk_obj(client,
-                          catalog,
-                          state,
-                          start_date,
-                          stream_name,
-                          bulk_page_size)
+            custom_streams.append(stream_name)
 
+    static_endpoints = []
     for static_endpoint in STATIC_ENDPOINTS:
-        stream_id = static_endpoint['stream_id']
         should_stream, last_stream = should_sync_stream(selected_streams,
                                                         last_stream,
-                                                        stream_id)
+                                                        static_endpoint['stream_id'])
         if should_stream:
-            update_current_stream(state, stream_id)
-            path = static_endpoint['path']
-            updated_at_col = static_endpoint['updated_at_col']
-            sync_static_endpoint(client,
-                                 catalog,
-                                 state,
-                                 start_date,
-                                 stream_id,
-                                 path,
-                                 updated_at_col)
+            static_endpoints.append(static_endpoint)
+
+    sync_bulk_streams(client,
+                      catalog,
+                      state,
+                      start_date,
+                      bulk_streams,
+                      bulk_page_size,
+                      max_concurrent_exports=max_concurrent_exports,
+                      **export_options)
+
+    sync_activity_streams(client,
+                          catalog,
+                          state,
+                          start_date,
+                          activity_streams,
+                          bulk_page_size,
+                          max_concurrent_activity_exports=max_concurrent_activity_exports,
+                          activity_export_target_rows=activity_export_target_rows,
+                          **export_options)
+
+    # Custom objects run as their own batch after the activity streams, the
+    # order current_stream resumes in
+    sync_bulk_streams(client,
+                      catalog,
+                      state,
+                      start_date,
+                      custom_streams,
+                      bulk_page_size,
+                      max_concurrent_exports=max_concurrent_exports,
+                      **export_options)
+
+    for static_endpoint in static_endpoints:
+        stream_id = static_endpoint['stream_id']
+        update_current_stream(state, stream_id)
+        path = static_endpoint['path']
+        updated_at_col = static_endpoint['updated_at_col']
+        sync_static_endpoint(client,
+                             catalog,
+                             state,
+                             start_date,
+                             stream_id,
+                             path,
+                             updated_at_col,
+                             checkpoint_every_pages=checkpoint_every_pages,
+                             checkpoint_every_seconds=checkpoint_every_seconds)
 
     update_current_stream(state, None)
@@ -0,0 +1,179 @@
+from singer import Transformer, NO_INTEGER_DATETIME_PARSING, UNIX_SECONDS_INTEGER_DATETIME_PARSING
+from singer.transform import (
+    string_to_datetime,
+    unix_seconds_to_datetime,
+    unix_milliseconds_to_datetime
+)
+
+FAILED = object()
+
+SIMPLE_TYPES = {'null', 'string', 'number', 'integer', 'boolean'}
+
+def convert_null(value):
+    if value is None or value == '':
+        return None
+    return FAILED
+
+def convert_string(value):
+    if value is None:
+        return FAILED
+    try:
+        return str(value)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+def convert_number(value):
+    if isinstance(value, str):
+        value = value.replace(',', '')
+    try:
+        return float(value)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+def convert_integer(value):
+    if isinstance(value, str):
+        value = value.replace(',', '')
+    try:
+        return int(value)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+def convert_boolean(value):
+    if isinstance(value, str) and value.lower() == 'false':
+        return False
+    try:
+        return bool(value)
+    except Exception: # pylint: disable=broad-except
+        return FAILED
+
+def datetime_converter(integer_datetime_fmt):
+    if integer_datetime_fmt == NO_INTEGER_DATETIME_PARSING:
+        parse_integer = None
+    elif integer_datetime_fmt == UNIX_SECONDS_INTEGER_DATETIME_PARSING:
+        parse_integer = unix_seconds_to_datetime
+    else:
+        parse_integer = unix_milliseconds_to_datetime
+
+    def convert_datetime(value):
+        if value is None or value == '':
+            return FAILED
+        if parse_integer is None:
+            value = string_to_datetime(value)
+        else:
+            try:
+                value = parse_integer(value)
+            except Exception: # pylint: disable=broad-except
+                value = string_to_datetime(value)
+        if value is None:
+            return FAILED
+        return value
+
+    return convert_datetime
+
+def get_types(schema):
+    types = schema['type']
+    if not isinstance(types, list):
+        types = [types]
+    # Matches singer.Transformer, which always tries 'null' last
+    return [typ for typ in types if typ != 'null'] + [typ for typ in types if typ == 'null']
+
+def is_simple_schema(schema):
+    if 'anyOf' in schema:
+        return False
+    if 'type' not in schema:
+        return True
+    return set(get_types(schema)) <= SIMPLE_TYPES and \
+        schema.get('format') != 'singer.decimal'
+
+def nested_converter(schema, field_name, integer_datetime_fmt):
+    def convert(value):
+        transformer = Transformer(integer_datetime_fmt=integer_datetime_fmt)
+        success, value = transformer.transform_recur(value, schema, [field_name])
+        if not success:
+            return FAILED
+        return value
+
+    return convert
+
+def compile_field(schema, field_name, integer_datetime_fmt):
+    if not is_simple_schema(schema):
+        return nested_converter(schema, field_name, integer_datetime_fmt)
+
+    if 'type' not in schema:
+        return lambda value: value
+
+    converters = []
+    for typ in get_types(schema):
+        if typ == 'null':
+            converters.append(convert_null)
+        elif typ == 'string' and schema.get('format') == 'date-time':
+            converters.append(datetime_converter(integer_datetime_fmt))
+        elif typ == 'string':
+            converters.append(convert_string)
+        elif typ == 'number':
+            converters.append(convert_number)
+        elif typ == 'integer':
+            converters.append(convert_integer)
+        else:
+            converters.append(convert_boolean)
+
+    if len(converters) == 1:
+        return converters[0]
+
+    def convert(value):
+        for converter in converters:
+            result = converter(value)
+            if result is not FAILED:
+                return result
+        return FAILED
+
+    return convert
+
+class RecordTransformer(object):
+    """Produces singer.Transformer's output from converters compiled once
+    per stream, falling back to singer.Transformer for anything else."""
+    def __init__(self, schema, stream_metadata, integer_datetime_fmt=NO_INTEGER_DATETIME_PARSING):
+        self.__schema = schema
+        self.__metadata = stream_metadata
+        self.__integer_datetime_fmt = integer_datetime_fmt
+        self.__converters = self.__compile()
+
+    def __compile(self):
+        properties = self.__schema.get('properties')
+        if self.__schema.get('type') not in ('object', ['object']) or \
+           properties is None or \
+           'patternProperties' in self.__schema or \
+           any(len(breadcrumb) > 2 for breadcrumb in self.__metadata):
+            return None
+
+        converters = {}
+        for field_name, field_schema in properties.items():
+            field_metadata = self.__metadata.get(('properties', field_name), {})
+            if field_metadata.get('inclusion') != 'automatic' and \
+               (field_metadata.get('selected') is False or
+                field_metadata.get('inclusion') == 'unsupported'):
+                continue
+            converters[field_name] = compile_field(field_schema,
+                                                  field_name,
+                                                  self.__integer_datetime_fmt)
+        return converters
+
+    def transform_with_singer(self, record):
+        with Transformer(integer_datetime_fmt=self.__integer_datetime_fmt) as transformer:
+            return transformer.transform(record, self.__schema, self.__metadata)
+
+    def transform(self, record):
+        if self.__converters is None:
+            return self.transform_with_singer(record)
+
+        converters = self.__converters
+        result = {}
+        for field_name, value in record.items():
+            converter = converters.get(field_name)
+            if converter is None:
+                continue
+            value = converter(value)
+            if value is FAILED:
+                return self.transform_with_singer(record)
+            result[field_name] = value
+        return result
@@ -0,0 +1,179 @@
+import socket
+import threading
+import time
+
+import singer
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+from singer import metrics
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from tap_eloqua.ratelimit import AUTH, BULK_CONTROL, BULK_DATA, REST
+
+LOGGER = singer.get_logger()
+
+DEFAULT_POOL_SIZE = 10 # connections per host
+DEFAULT_CONNECT_TIMEOUT = 10 # seconds
+# Seconds without receiving a byte before a request times out
+DEFAULT_READ_TIMEOUTS = {
+    AUTH: 30,
+    BULK_CONTROL: 120,
+    BULK_DATA: 300,
+    REST: 120
+}
+DEFAULT_KEEPALIVE_IDLE = 60 # seconds before the first keep-alive probe
+KEEPALIVE_INTERVAL = 10 # seconds between keep-alive probes
+KEEPALIVE_PROBES = 6
+DEFAULT_STALL_TIMEOUT = 60 # seconds to receive one streamed chunk
+STALL_CHECK_INTERVAL = 1 # seconds
+
+class StreamStalledError(ConnectionError):
+    pass
+
+def get_keepalive_socket_options(idle):
+    """Socket options enabling TCP keep-alive after `idle` seconds."""
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+    elif hasattr(socket, 'TCP_KEEPALIVE'): # macOS
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL))
+    if hasattr(socket, 'TCP_KEEPCNT'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_PROBES))
+    return options
+
+class PoolStats(object):
+    """Counts pool checkouts, new connections and time spent waiting."""
+    def __init__(self):
+        self.checkouts = 0
+        self.new_connections = 0
+        self.wait_seconds = 0.0
+        self.__lock = threading.Lock()
+
+    def add_checkout(self, wait_seconds):
+        with self.__lock:
+            self.checkouts += 1
+            self.wait_seconds += wait_seconds
+
+    def add_connection(self):
+        with self.__lock:
+            self.new_connections += 1
+
+    @property
+    def reuse_rate(self):
+        if not self.checkouts:
+            return 0.0
+        return max(0, self.checkouts - self.new_connections) / self.checkouts
+
+    def log(self):
+        with self.__lock:
+            metrics.log(LOGGER, metrics.Point('counter',
+                                              'http_pool_checkouts',
+                                              self.checkouts,
+                                              {'new_connections': self.new_connections,
+                                               'reuse_rate': round(self.reuse_rate, 3),
+                                               'wait_seconds': round(self.wait_seconds, 3)}))
+
+def instrument_pool_class(pool_class, stats):
+    class InstrumentedPool(pool_class):
+        def _get_conn(self, timeout=None):
+            start = time.monotonic()
+            conn = super()._get_conn(timeout=timeout)
+            stats.add_checkout(time.monotonic() - start)
+            return conn
+
+        def _new_conn(self):
+            stats.add_connection()
+            return super()._new_conn()
+
+    return InstrumentedPool
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """A blocking HTTPAdapter pool with TCP keep-alive and PoolStats."""
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, keepalive_idle=DEFAULT_KEEPALIVE_IDLE):
+        self.stats = PoolStats()
+        self.__keepalive_idle = keepalive_idle
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.__keepalive_idle:
+            pool_kwargs['socket_options'] = HTTPConnection.default_socket_options + \
+                get_keepalive_socket_options(self.__keepalive_idle)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': instrument_pool_class(HTTPConnectionPool, self.stats),
+            'https': instrument_pool_class(HTTPSConnectionPool, self.stats)
+        }
+
+def abort_response(response):
+    # Shutting the socket down wakes up the thread blocked reading from it
+    connection = getattr(response.raw, 'connection', None)
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        response.close()
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+class StreamWatch(object):
+    def __init__(self, abort):
+        self.stalled = False
+        self.__abort = abort
+        self.__read_started = None
+        self.__lock = threading.Lock()
+
+    def reading(self):
+        self.__read_started = time.monotonic()
+
+    def idle(self):
+        self.__read_started = None
+
+    def check(self, stall_timeout):
+        with self.__lock:
+            started = self.__read_started
+            if self.stalled or started is None or \
+               time.monotonic() - started < stall_timeout:
+                return
+            self.stalled = True
+        self.__abort()
+
+class StallWatchdog(object):
+    """Aborts streamed responses that take over `stall_timeout` seconds
+    to read one chunk."""
+    def __init__(self, stall_timeout=DEFAULT_STALL_TIMEOUT):
+        self.__stall_timeout = stall_timeout
+        self.__watches = set()
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def watch(self, abort):
+        watch = StreamWatch(abort)
+        if not self.__stall_timeout:
+            return watch
+        with self.__lock:
+            self.__watches.add(watch)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+        return watch
+
+    def unwatch(self, watch):
+        with self.__lock:
+            self.__watches.discard(watch)
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def __run(self):
+        while not self.__stopped.wait(min(STALL_CHECK_INTERVAL, self.__stall_timeout)):
+            with self.__lock:
+                watches = list(self.__watches)
+            for watch in watches:
+                watch.check(self.__stall_timeout)
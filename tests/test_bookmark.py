@@ -7,7 +7,7 @@ from tap_eloqua.sync import write_bookmark, write_bulk_bookmark, sync_static_end
 
 
 class BookmarkTest(unittest.TestCase):
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_write_bookmark_updates_state_and_emits(self, mock_write_state):
         state = {}
         write_bookmark(state, "visitors", "2024-01-01T00:00:00Z")
@@ -20,7 +20,7 @@ class BookmarkTest(unittest.TestCase):
         self.assertEqual(state["bookmarks"]["visitors"], "2024-01-01T00:00:00Z")
         mock_write_state.assert_called_once_with(state)
 
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_write_bulk_bookmark_updates_state_and_emits(self, mock_write_state):
         state = {}
         write_bulk_bookmark(
@@ -152,9 +152,9 @@ class SyncTest(EloquaBaseTest):
 
         self.assertIsInstance(selected, list)
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_with_selected_streams(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test sync with selected streams."""
         client = self._create_mock_client()
@@ -177,9 +177,9 @@ class SyncTest(EloquaBaseTest):
         visitor_calls = [c for c in calls if c[0][0] == "visitors"]
         self.assertGreater(len(visitor_calls), 0)
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_skips_unselected_streams(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync skips streams not marked as selected."""
         client = self._create_mock_client()
@@ -193,9 +193,9 @@ class SyncTest(EloquaBaseTest):
         accounts_calls = [c for c in mock_write_schema.call_args_list if c[0][0] == "accounts"]
         self.assertEqual(len(accounts_calls), 0)
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_writes_state_messages(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync writes state messages during execution."""
         client = self._create_mock_client()
@@ -207,9 +207,9 @@ class SyncTest(EloquaBaseTest):
         # Should have written state messages
         self.assertGreater(mock_write_state.call_count, 0)
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_returns_without_selected_streams(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync returns early if no streams are selected."""
         client = self._create_mock_client()
@@ -223,7 +223,7 @@ class SyncTest(EloquaBaseTest):
         mock_write_schema.assert_not_called()
         mock_write_record.assert_not_called()
 
-    @patch("tap_eloqua.sync.singer.write_record")
+    @patch("tap_eloqua.sync.output.write_record")
     def test_persist_records_writes_records(self, mock_write_record):
         """Test that persist_records writes records to stdout."""
         catalog = self._create_catalog_with_selected_streams(["visitors"])
@@ -255,7 +255,7 @@ class SyncTest(EloquaBaseTest):
             }
         ]
 
-        with patch("tap_eloqua.sync.singer.write_record") as mock_write:
+        with patch("tap_eloqua.sync.output.write_record") as mock_write:
             persist_records(catalog, "visitors", records)
 
             # Check that written record has transformed datetime
@@ -263,9 +263,9 @@ class SyncTest(EloquaBaseTest):
             # After transformation, should be ISO string format
             self.assertIsNotNone(written_record.get("V_LastVisitDateAndTime"))
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_respects_start_date(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync passes start_date to API calls."""
         client = self._create_mock_client()
@@ -284,9 +284,9 @@ class SyncTest(EloquaBaseTest):
         first_params = visitors_calls[0].kwargs["params"]
         self.assertIn("2024-06-01 00:00:00", first_params["search"])
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_handles_pagination(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync handles paginated responses correctly (multiple pages fetched)."""
         # Build a client that returns a full page (1000 records) then a short page
@@ -355,9 +355,9 @@ class SyncStateManagementTest(EloquaBaseTest):
         }
         return Catalog.from_dict(catalog_dict)
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_initializes_state_for_stream(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync initializes state structure for streams."""
         client = self._create_mock_client()
@@ -369,9 +369,9 @@ class SyncStateManagementTest(EloquaBaseTest):
         # write_state should have been called to track progress
         self.assertGreater(mock_write_state.call_count, 0)
 
-    @patch("tap_eloqua.sync.singer.write_schema")
-    @patch("tap_eloqua.sync.singer.write_record")
-    @patch("tap_eloqua.sync.singer.write_state")
+    @patch("tap_eloqua.sync.output.write_schema")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.output.write_state")
     def test_sync_resets_current_stream_on_completion(self, mock_write_state, mock_write_record, mock_write_schema):
         """Test that sync sets current_stream to None when done."""
         client = self._create_mock_client()
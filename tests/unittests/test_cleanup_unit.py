@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pendulum
+
+from requests.exceptions import HTTPError
+
+from tap_eloqua.cleanup import cleanup_export, garbage_collect
+
+
+class DummyResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TestCleanupUnit(unittest.TestCase):
+    def test_cleanup_export_deletes_data_and_definition(self):
+        client = MagicMock()
+
+        cleanup_export(client, "accounts", "99", "/accounts/exports/1")
+
+        self.assertEqual([call.args[0] for call in client.delete.call_args_list],
+                         ["/api/bulk/2.0/syncs/99/data", "/api/bulk/2.0/accounts/exports/1"])
+
+    def test_cleanup_export_ignores_missing_and_keeps_definition_without_uri(self):
+        client = MagicMock()
+        client.delete.side_effect = HTTPError(response=DummyResponse(404))
+
+        cleanup_export(client, "accounts", "99")
+
+        client.delete.assert_called_once_with("/api/bulk/2.0/syncs/99/data", endpoint="export_delete_data")
+
+    def test_cleanup_export_reraises_other_errors(self):
+        client = MagicMock()
+        client.delete.side_effect = HTTPError(response=DummyResponse(403))
+
+        with self.assertRaises(HTTPError):
+            cleanup_export(client, "accounts", "99")
+
+    @patch("tap_eloqua.cleanup.pendulum.now", return_value=pendulum.datetime(2024, 1, 10, tz="UTC"))
+    def test_garbage_collect_deletes_singer_definitions_across_objects(self, _mock_now):
+        client = MagicMock()
+        old = "2024-01-01T00:00:00.0000000Z"
+        listings = {
+            "/api/bulk/2.0/customObjects": [{"items": [{"uri": "/customObjects/7"}]}],
+            "/api/bulk/2.0/accounts/exports": [
+                {"items": [{"name": "Singer Sync - 1", "uri": "/accounts/exports/1", "createdAt": old}],
+                 "hasMore": True},
+                {"items": [{"name": "Singer Sync - 2", "uri": "/accounts/exports/2", "createdAt": old},
+                           {"name": "Other", "uri": "/accounts/exports/3", "createdAt": old}],
+                 "hasMore": False},
+            ],
+            "/api/bulk/2.0/contacts/exports": [{"items": [], "hasMore": False}],
+            "/api/bulk/2.0/activities/exports": [{"items": [
+                {"name": "Singer Sync - 4", "uri": "/activities/exports/4", "createdAt": old}]}],
+            "/api/bulk/2.0/customObjects/7/exports": [{"items": [
+                {"name": "Singer Sync - 5", "uri": "/customObjects/7/exports/5", "createdAt": old}]}],
+        }
+        client.get.side_effect = lambda path, **kwargs: listings[path].pop(0)
+
+        deleted = garbage_collect(client, max_workers=2, keep_uris={"/accounts/exports/2"})
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(sorted(call.args[0] for call in client.delete.call_args_list), [
+            "/api/bulk/2.0/accounts/exports/1",
+            "/api/bulk/2.0/activities/exports/4",
+            "/api/bulk/2.0/customObjects/7/exports/5",
+        ])
+
+    @patch("tap_eloqua.cleanup.pendulum.now", return_value=pendulum.datetime(2024, 1, 10, tz="UTC"))
+    def test_garbage_collect_keeps_definitions_within_data_retention(self, _mock_now):
+        client = MagicMock()
+        listings = {
+            "/api/bulk/2.0/customObjects": [{"items": []}],
+            "/api/bulk/2.0/accounts/exports": [{"items": [
+                {"name": "Singer Sync - 1", "uri": "/accounts/exports/1", "createdAt": "2024-01-06T23:00:00Z"},
+                {"name": "Singer Sync - 2", "uri": "/accounts/exports/2", "createdAt": "2024-01-08T00:00:00Z"},
+                {"name": "Singer Sync - 3", "uri": "/accounts/exports/3"},
+            ]}],
+            "/api/bulk/2.0/contacts/exports": [{"items": []}],
+            "/api/bulk/2.0/activities/exports": [{"items": []}],
+        }
+        client.get.side_effect = lambda path, **kwargs: listings[path].pop(0)
+
+        deleted = garbage_collect(client)
+
+        self.assertEqual(deleted, 1)
+        client.delete.assert_called_once_with("/api/bulk/2.0/accounts/exports/1", endpoint="export_delete_def")
+
+
+if __name__ == "__main__":
+    unittest.main()
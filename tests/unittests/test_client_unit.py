@@ -1,10 +1,26 @@
+import gzip
+import io
 import json
+import os
+import stat
 import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
-from tap_eloqua.client import EloquaClient, Server5xxError
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from tap_eloqua.client import (
+    EloquaClient,
+    Server5xxError,
+    get_token_fingerprint,
+    write_refresh_token
+)
 
 
 class TestClientUnit(unittest.TestCase):
@@ -77,6 +93,32 @@ class TestClientUnit(unittest.TestCase):
             with self.assertRaises(Server5xxError):
                 client.get_access_token()
 
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_get_access_token_retries_429_after_retry_after(self, mock_sleep):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as config_file:
+            json.dump({"refresh_token": "original"}, config_file)
+            config_path = config_file.name
+
+        client = self._build_client(config_path)
+        throttled = MagicMock()
+        throttled.status_code = 429
+        throttled.headers = {"Retry-After": "7"}
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {
+            "access_token": "new-access-token",
+            "refresh_token": "rotated-refresh-token",
+            "expires_in": 3600,
+        }
+        session = MagicMock()
+        session.post.side_effect = [throttled, response]
+
+        with patch.object(client, "_EloquaClient__session", session):
+            client.get_access_token()
+
+        self.assertEqual(client._EloquaClient__access_token, "new-access-token")
+        mock_sleep.assert_called_once_with(7.0)
+
     def test_get_access_token_raises_for_non_200(self):
         with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as config_file:
             json.dump({"refresh_token": "original"}, config_file)
@@ -284,5 +326,545 @@ class TestClientUnit(unittest.TestCase):
         self.assertEqual(mock_request.call_count, 2)
 
 
+    def test_put_and_delete_delegate_to_request(self):
+        client = self._build_client("unused.json")
+        with patch.object(client, "request", side_effect=[{"uri": "/accounts/exports/1"}, None]) as mock_request:
+            put_result = client.put("/foo", json={}, endpoint="e1")
+            delete_result = client.delete("/foo", endpoint="e2")
+
+        self.assertEqual(put_result, {"uri": "/accounts/exports/1"})
+        self.assertIsNone(delete_result)
+        self.assertEqual([call.args[0] for call in mock_request.call_args_list], ["PUT", "DELETE"])
+
+    def test_request_returns_none_for_empty_response(self):
+        client = self._build_client("unused.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        client._EloquaClient__access_token = "token-123"
+
+        response = MagicMock()
+        response.status_code = 204
+        response.content = b""
+        session = MagicMock()
+        session.request.return_value = response
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            payload = client.request("DELETE", path="/v1/resource", endpoint="test_endpoint")
+
+        self.assertIsNone(payload)
+        response.json.assert_not_called()
+
+
+    def test_stream_returns_items_as_they_download(self):
+        client = self._build_client("unused.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        client._EloquaClient__access_token = "token-123"
+
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_content.return_value = [b'{"hasMore": false, "items": [{"a"', b': 1}]}']
+        session = MagicMock()
+        session.request.return_value = response
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            data = client.stream("/v1/resource", params={"limit": 1}, endpoint="test_endpoint")
+            items = list(data)
+
+        self.assertEqual(items, [{"a": 1}])
+        self.assertFalse(data["hasMore"])
+        self.assertTrue(session.request.call_args.kwargs["stream"])
+        response.json.assert_not_called()
+        response.close.assert_called_once_with()
+
+
+    def test_stream_csv_requests_csv_and_returns_rows(self):
+        client = self._build_client("unused.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        client._EloquaClient__access_token = "token-123"
+
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_content.return_value = [b"Id,Name\n1,", b"a\n"]
+        session = MagicMock()
+        session.request.return_value = response
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            data = client.stream_csv("/v1/resource", lambda rows: False, endpoint="test_endpoint")
+            items = list(data)
+
+        self.assertEqual(items, [{"Id": "1", "Name": "a"}])
+        self.assertEqual(session.request.call_args.kwargs["headers"]["Accept"], "text/csv")
+        self.assertFalse(data["hasMore"])
+
+    def _gzip_response(self, body):
+        raw = urllib3.HTTPResponse(body=io.BytesIO(gzip.compress(body)),
+                                   headers={"content-encoding": "gzip"},
+                                   status=200,
+                                   preload_content=False,
+                                   decode_content=True)
+        return HTTPAdapter().build_response(requests.Request("GET", "https://api.eloqua.test").prepare(), raw)
+
+    def test_request_negotiates_compression_and_tags_response_sizes(self):
+        client = self._build_client("unused.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        client._EloquaClient__access_token = "token-123"
+        body = json.dumps({"items": [{"Name": "x" * 20}] * 100}).encode("utf-8")
+        session = MagicMock()
+        session.request.return_value = self._gzip_response(body)
+        timer = MagicMock()
+        timer.__enter__.return_value.tags = {}
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"), \
+             patch("tap_eloqua.client.metrics.http_request_timer", return_value=timer):
+            payload = client.request("GET", path="/v1/resource", endpoint="test_endpoint")
+
+        tags = timer.__enter__.return_value.tags
+        self.assertEqual(len(payload["items"]), 100)
+        accept_encoding = session.request.call_args.kwargs["headers"]["Accept-Encoding"]
+        self.assertEqual(accept_encoding, urllib3.util.make_headers(accept_encoding=True)["accept-encoding"])
+        self.assertIn("gzip", accept_encoding)
+        self.assertEqual(tags["uncompressed_bytes"], len(body))
+        self.assertEqual(tags["compressed_bytes"], len(gzip.compress(body)))
+        self.assertLess(tags["compressed_bytes"], tags["uncompressed_bytes"])
+
+    def test_stream_logs_response_sizes_when_closed(self):
+        client = self._build_client("unused.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        client._EloquaClient__access_token = "token-123"
+        body = json.dumps({"hasMore": False, "items": [{"Name": "x" * 20}] * 100}).encode("utf-8")
+        session = MagicMock()
+        session.request.return_value = self._gzip_response(body)
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"), \
+             patch("tap_eloqua.client.metrics.log") as mock_log:
+            self.assertEqual(len(list(client.stream("/v1/resource", endpoint="export_data"))), 100)
+
+        point = mock_log.call_args.args[1]
+        self.assertEqual(point.metric, "http_response_bytes")
+        self.assertEqual(point.tags["endpoint"], "export_data")
+        self.assertEqual(point.tags["uncompressed_bytes"], len(body))
+        self.assertEqual(point.tags["compressed_bytes"], len(gzip.compress(body)))
+
+
+    def test_get_access_token_refreshes_once_for_concurrent_callers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.json")
+            with open(config_path, "w") as config_file:
+                json.dump({"refresh_token": "original"}, config_file)
+
+            client = self._build_client(config_path)
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {
+                "access_token": "new-access-token",
+                "refresh_token": "rotated-refresh-token",
+                "expires_in": 3600,
+            }
+
+            def post(*args, **kwargs):
+                time.sleep(0.05)
+                return response
+
+            session = MagicMock()
+            session.post.side_effect = post
+
+            with patch.object(client, "_EloquaClient__session", session):
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    list(executor.map(lambda _: client.get_access_token(), range(8)))
+
+            session.post.assert_called_once()
+            self.assertEqual(os.listdir(directory), ["config.json"])
+
+    @patch("tap_eloqua.client.MIN_RENEWAL_INTERVAL", 0.01)
+    def test_background_renewal_refreshes_before_expiry_until_exit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.json")
+            with open(config_path, "w") as config_file:
+                json.dump({"refresh_token": "original"}, config_file)
+
+            client = EloquaClient(config_path, "client-id", "client-secret", "refresh-token",
+                                  "https://localhost/callback", "tap-eloqua-tests",
+                                  token_renewal_margin=60)
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {
+                "access_token": "new-access-token",
+                "refresh_token": "rotated-refresh-token",
+                "expires_in": 10.1, # 0.1s after the 10s padding
+            }
+            failure = MagicMock()
+            failure.status_code = 400
+            failure.json.return_value = {"error": "invalid_grant"}
+            session = MagicMock()
+            session.post.side_effect = [
+                response,
+                failure,
+                response,
+            ] + [response] * 1000
+
+            with patch.object(client, "_EloquaClient__session", session), \
+                 self.assertLogs(level="WARNING") as logs:
+                with client:
+                    deadline = time.monotonic() + 5
+                    while session.post.call_count < 3 and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                    thread = client._EloquaClient__renewal_thread
+                calls = session.post.call_count
+
+            self.assertGreaterEqual(calls, 3)
+            self.assertTrue(any("Background token renewal failed" in line for line in logs.output))
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(client._EloquaClient__access_token, "new-access-token")
+            session.close.assert_called_once()
+
+    @patch("tap_eloqua.client.MIN_RENEWAL_INTERVAL", 0.01)
+    def test_background_renewal_caps_margin_to_half_the_token_lifetime(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.json")
+            with open(config_path, "w") as config_file:
+                json.dump({"refresh_token": "original"}, config_file)
+
+            client = EloquaClient(config_path, "client-id", "client-secret", "refresh-token",
+                                  "https://localhost/callback", "tap-eloqua-tests",
+                                  token_renewal_margin=3595)
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {
+                "access_token": "new-access-token",
+                "refresh_token": "rotated-refresh-token",
+                "expires_in": 3600,
+            }
+            session = MagicMock()
+            session.post.return_value = response
+
+            with patch.object(client, "_EloquaClient__session", session):
+                with client:
+                    time.sleep(0.2)
+
+            session.post.assert_called_once()
+
+    def test_background_renewal_is_disabled_by_default(self):
+        client = self._build_client("config.json")
+        with patch.object(client, "_EloquaClient__session", MagicMock()), \
+             patch.object(client, "get_access_token"):
+            with client:
+                self.assertIsNone(client._EloquaClient__renewal_thread)
+
+    def _identity_response(self, status_code, body, url, history=()):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode("utf-8")
+        response.url = url
+        response.history = list(history)
+        return response
+
+    def _write_identity_cache(self, directory, cached_at, expires, refresh_token="refresh-token"):
+        cache_path = os.path.join(directory, "identity.json")
+        with open(cache_path, "w") as cache_file:
+            json.dump({
+                "fingerprint": get_token_fingerprint(refresh_token),
+                "identity": {"urls": {"base": "https://old-pod.eloqua.test"}},
+                "cached_at": cached_at.isoformat(),
+                "access_token": "cached-token",
+                "expires": expires.isoformat(),
+            }, cache_file)
+        return cache_path
+
+    def _identity_client(self, directory, cache_path):
+        config_path = os.path.join(directory, "config.json")
+        with open(config_path, "w") as config_file:
+            json.dump({"refresh_token": "refresh-token"}, config_file)
+        return EloquaClient(config_path, "client-id", "client-secret", "refresh-token",
+                            "https://localhost/callback", "tap-eloqua-tests",
+                            identity_cache_path=cache_path,
+                            identity_cache_ttl=3600)
+
+    def test_identity_cache_skips_token_refresh_and_base_url_lookup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            now = datetime.utcnow()
+            cache_path = self._write_identity_cache(directory,
+                                                    cached_at=now - timedelta(minutes=5),
+                                                    expires=now + timedelta(hours=1))
+            client = self._identity_client(directory, cache_path)
+            session = MagicMock()
+            session.request.return_value = self._identity_response(
+                200, {"ok": True}, "https://old-pod.eloqua.test/api/thing")
+
+            with patch.object(client, "_EloquaClient__session", session):
+                with client:
+                    payload = client.get("/api/thing")
+
+        self.assertEqual(payload, {"ok": True})
+        session.post.assert_not_called()
+        session.request.assert_called_once()
+        self.assertEqual(session.request.call_args[0][1], "https://old-pod.eloqua.test/api/thing")
+        self.assertEqual(session.request.call_args[1]["headers"]["Authorization"], "Bearer cached-token")
+
+    def test_identity_cache_is_ignored_when_missing_or_unreadable(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "identity.json")
+            for contents in [None, "{not json"]:
+                if contents is not None:
+                    with open(cache_path, "w") as cache_file:
+                        cache_file.write(contents)
+                client = self._identity_client(directory, cache_path)
+                with patch.object(client, "get_access_token"):
+                    client.__enter__()
+                self.assertIsNone(client._EloquaClient__base_url)
+                self.assertIsNone(client._EloquaClient__access_token)
+
+    def test_identity_cache_is_ignored_when_expired_or_for_another_token(self):
+        with tempfile.TemporaryDirectory() as directory:
+            now = datetime.utcnow()
+            cache_path = self._write_identity_cache(directory,
+                                                    cached_at=now - timedelta(hours=2),
+                                                    expires=now - timedelta(minutes=1))
+            client = self._identity_client(directory, cache_path)
+            with patch.object(client, "get_access_token"):
+                client.__enter__()
+            self.assertIsNone(client._EloquaClient__base_url)
+            self.assertIsNone(client._EloquaClient__access_token)
+
+            cache_path = self._write_identity_cache(directory,
+                                                    cached_at=now,
+                                                    expires=now + timedelta(hours=1),
+                                                    refresh_token="someone-elses-token")
+            client = self._identity_client(directory, cache_path)
+            with patch.object(client, "get_access_token"):
+                client.__enter__()
+            self.assertIsNone(client._EloquaClient__base_url)
+            self.assertIsNone(client._EloquaClient__access_token)
+
+    def test_identity_cache_is_resolved_again_after_401(self):
+        with tempfile.TemporaryDirectory() as directory:
+            now = datetime.utcnow()
+            cache_path = self._write_identity_cache(directory,
+                                                    cached_at=now,
+                                                    expires=now + timedelta(hours=1))
+            client = self._identity_client(directory, cache_path)
+
+            token_response = MagicMock()
+            token_response.status_code = 200
+            token_response.json.return_value = {
+                "access_token": "new-token",
+                "refresh_token": "rotated-token",
+                "expires_in": 3600,
+            }
+            session = MagicMock()
+            session.post.return_value = token_response
+            session.request.side_effect = [
+                self._identity_response(401, {}, "https://old-pod.eloqua.test/api/thing"),
+                self._identity_response(200, {"urls": {"base": "https://new-pod.eloqua.test"}},
+                                        "https://login.eloqua.com/id"),
+                self._identity_response(200, {"ok": True}, "https://new-pod.eloqua.test/api/thing"),
+            ]
+
+            with patch.object(client, "_EloquaClient__session", session):
+                with client:
+                    payload = client.get("/api/thing")
+
+            with open(cache_path) as cache_file:
+                cache = json.load(cache_file)
+
+        self.assertEqual(payload, {"ok": True})
+        session.post.assert_called_once()
+        self.assertEqual(session.request.call_args[0][1], "https://new-pod.eloqua.test/api/thing")
+        self.assertEqual(session.request.call_args[1]["headers"]["Authorization"], "Bearer new-token")
+        self.assertEqual(cache["identity"], {"urls": {"base": "https://new-pod.eloqua.test"}})
+        self.assertEqual(cache["access_token"], "new-token")
+        self.assertEqual(cache["fingerprint"], get_token_fingerprint("rotated-token"))
+
+    def test_concurrent_401s_on_a_cached_token_are_all_retried(self):
+        with tempfile.TemporaryDirectory() as directory:
+            now = datetime.utcnow()
+            cache_path = self._write_identity_cache(directory,
+                                                    cached_at=now,
+                                                    expires=now + timedelta(hours=1))
+            client = self._identity_client(directory, cache_path)
+
+            token_response = MagicMock()
+            token_response.status_code = 200
+            token_response.json.return_value = {
+                "access_token": "new-token",
+                "refresh_token": "rotated-token",
+                "expires_in": 3600,
+            }
+            session = MagicMock()
+            session.post.return_value = token_response
+            threads = 4
+            # Every thread sends its request with the cached token before any 401 comes back
+            sent_with_cached_token = threading.Barrier(threads)
+
+            def send(method, url, **kwargs):
+                if url == "https://login.eloqua.com/id":
+                    return self._identity_response(200, {"urls": {"base": "https://new-pod.eloqua.test"}}, url)
+                if kwargs["headers"]["Authorization"] == "Bearer cached-token":
+                    sent_with_cached_token.wait(timeout=5)
+                    return self._identity_response(401, {}, url)
+                return self._identity_response(200, {"ok": True}, url)
+
+            session.request.side_effect = send
+
+            with patch.object(client, "_EloquaClient__session", session):
+                with client:
+                    with ThreadPoolExecutor(max_workers=threads) as executor:
+                        payloads = list(executor.map(lambda _: client.get("/api/thing"), range(threads)))
+
+        self.assertEqual(payloads, [{"ok": True}] * threads)
+        session.post.assert_called_once()
+
+    def test_401_with_a_current_uncached_token_is_raised(self):
+        client = self._build_client("config.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        client._EloquaClient__access_token = "token-123"
+        client._EloquaClient__expires = datetime.utcnow() + timedelta(hours=1)
+        session = MagicMock()
+        session.request.return_value = self._identity_response(401, {}, "https://api.eloqua.test/api/thing")
+
+        with patch.object(client, "_EloquaClient__session", session):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.get("/api/thing")
+
+        session.request.assert_called_once()
+
+    def test_identity_cache_is_invalidated_by_redirect_from_cached_host(self):
+        with tempfile.TemporaryDirectory() as directory:
+            now = datetime.utcnow()
+            cache_path = self._write_identity_cache(directory,
+                                                    cached_at=now,
+                                                    expires=now + timedelta(hours=1))
+            client = self._identity_client(directory, cache_path)
+            redirect = self._identity_response(301, {}, "https://old-pod.eloqua.test/api/thing")
+            session = MagicMock()
+            session.request.return_value = self._identity_response(
+                200, {"ok": True}, "https://new-pod.eloqua.test/api/thing", history=[redirect])
+
+            with patch.object(client, "_EloquaClient__session", session):
+                with client:
+                    payload = client.get("/api/thing")
+                    base_url = client._EloquaClient__base_url
+                    access_token = client._EloquaClient__access_token
+
+        self.assertEqual(payload, {"ok": True})
+        self.assertIsNone(base_url)
+        self.assertEqual(access_token, "cached-token")
+
+    def test_streamed_response_holds_its_concurrency_slot_until_closed(self):
+        client = EloquaClient("config.json", "client-id", "client-secret", "refresh-token",
+                              "https://localhost/callback", "tap-eloqua-tests",
+                              max_concurrent_requests={"bulk_data": 1})
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_content.return_value = [b'{"hasMore": false, "items": [{"Id": "1"}]}']
+        session = MagicMock()
+        session.request.return_value = response
+        second_request_sent = threading.Event()
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            data = client.stream("/api/bulk/2.0/syncs/1/data", endpoint="export_data")
+            thread = threading.Thread(target=lambda: (client.get("/api/bulk/2.0/syncs/1/data"),
+                                                      second_request_sent.set()))
+            thread.start()
+            self.assertFalse(second_request_sent.wait(0.05))
+            data.close()
+            self.assertTrue(second_request_sent.wait(5))
+            thread.join()
+
+        response.close.assert_called_once_with()
+
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_request_retries_429_after_retry_after(self, mock_sleep):
+        client = self._build_client("config.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        throttled = self._identity_response(429, {}, "https://api.eloqua.test/api/thing")
+        throttled.headers["Retry-After"] = "3"
+        session = MagicMock()
+        session.request.side_effect = [
+            throttled,
+            self._identity_response(200, {"ok": True}, "https://api.eloqua.test/api/thing"),
+        ]
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            payload = client.get("/api/thing")
+
+        self.assertEqual(payload, {"ok": True})
+        mock_sleep.assert_called_once_with(3.0)
+
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_request_does_not_retry_post_after_read_timeout(self, mock_sleep):
+        client = self._build_client("config.json")
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        session = MagicMock()
+        session.request.side_effect = requests.exceptions.ReadTimeout()
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                client.post("/api/bulk/2.0/syncs", json={})
+            self.assertEqual(session.request.call_count, 1)
+
+            session.request.side_effect = [
+                requests.exceptions.ReadTimeout(),
+                self._identity_response(200, {"ok": True}, "https://api.eloqua.test/api/thing"),
+            ]
+            self.assertEqual(client.get("/api/thing"), {"ok": True})
+
+    def test_request_uses_timeouts_of_its_endpoint_class(self):
+        client = EloquaClient("config.json", "client-id", "client-secret", "refresh-token",
+                              "https://localhost/callback", "tap-eloqua-tests",
+                              connect_timeout=5,
+                              read_timeouts={"bulk_data": 90})
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        session = MagicMock()
+        session.request.return_value = self._identity_response(
+            200, {"ok": True}, "https://api.eloqua.test/api/thing")
+
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            client.get("/api/bulk/2.0/syncs/1/data")
+            client.get("/api/REST/2.0/assets/emails")
+            client.get("/api/REST/2.0/assets/emails", timeout=1)
+
+        self.assertEqual([call[1]["timeout"] for call in session.request.call_args_list],
+                         [(5, 90), (5, 120), 1])
+
+    def test_write_refresh_token_replaces_config_atomically(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.json")
+            with open(config_path, "w") as config_file:
+                json.dump({"refresh_token": "original", "client_id": "id"}, config_file)
+
+            with patch("tap_eloqua.client.os.replace", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    write_refresh_token(config_path, "rotated")
+
+            self.assertEqual(os.listdir(directory), ["config.json"])
+            with open(config_path) as config_file:
+                self.assertEqual(json.load(config_file)["refresh_token"], "original")
+
+            write_refresh_token(config_path, "rotated")
+
+            with open(config_path) as config_file:
+                self.assertEqual(json.load(config_file), {"refresh_token": "rotated", "client_id": "id"})
+
+    def test_write_refresh_token_keeps_the_config_file_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.json")
+            with open(config_path, "w") as config_file:
+                json.dump({"refresh_token": "original"}, config_file)
+            os.chmod(config_path, 0o640)
+
+            write_refresh_token(config_path, "rotated")
+
+            self.assertEqual(stat.S_IMODE(os.stat(config_path).st_mode), 0o640)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,8 @@
 """Unit tests for tap_eloqua discover module and check_stream_access helper."""
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 from requests.exceptions import HTTPError
 from requests import Response
 
@@ -171,6 +173,34 @@ class TestDiscover(unittest.TestCase):
             discover(client)
         self.assertIn("do not have read access to any of the supported streams", str(ctx.exception))
 
+    @patch("tap_eloqua.discover.check_stream_access")
+    @patch("tap_eloqua.discover.get_schemas")
+    def test_probes_run_concurrently_and_keep_schema_order(self, mock_get_schemas, mock_check):
+        """With max_workers > 1, probes overlap and the catalog order is unchanged."""
+        all_names = self._all_stream_names()
+        mock_get_schemas.return_value = self._mock_schemas(all_names)
+        in_flight = [0]
+        max_in_flight = [0]
+        lock = threading.Lock()
+
+        def check(client, probe_path, stream_name):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return stream_name != self._STATIC_STREAMS[0]
+
+        mock_check.side_effect = check
+
+        catalog = discover(MagicMock(), max_workers=4)
+
+        mock_get_schemas.assert_called_once_with(ANY, max_workers=4)
+        self.assertGreater(max_in_flight[0], 1)
+        self.assertEqual([stream.tap_stream_id for stream in catalog.streams],
+                         [name for name in all_names if name != self._STATIC_STREAMS[0]])
+
 
 if __name__ == "__main__":
     unittest.main()
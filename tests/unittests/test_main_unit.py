@@ -5,7 +5,7 @@ import runpy
 import tempfile
 import unittest
 from argparse import Namespace
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 from singer.catalog import Catalog
 
@@ -121,7 +121,7 @@ class TestMainUnit(unittest.TestCase):
 
         tap_main.main.__wrapped__()
 
-        mock_do_discover.assert_called_once_with(mock_client_context)
+        mock_do_discover.assert_called_once_with(mock_client_context, 1)
         mock_sync.assert_not_called()
 
     @patch("tap_eloqua.__init__.sync")
@@ -141,23 +141,142 @@ class TestMainUnit(unittest.TestCase):
                 "bulk_page_size": "123",
             },
             discover=False,
+            garbage_collect=False,
             catalog=catalog_obj,
             state={"bookmarks": {}},
         )
         mock_client_context = MagicMock()
         mock_client_class.return_value.__enter__.return_value = mock_client_context
 
-        tap_main.main.__wrapped__()
+        with patch("tap_eloqua.__init__.output") as mock_output:
+            tap_main.main.__wrapped__()
 
         mock_do_discover.assert_not_called()
+        mock_output.flush.assert_called_once_with()
         mock_sync.assert_called_once_with(
             mock_client_context,
             catalog_obj,
             {"bookmarks": {}},
             "2024-01-01T00:00:00Z",
             123,
+            max_concurrent_exports=1,
+            export_parallelism=1,
+            prefetch_pages=0,
+            adaptive_page_size=False,
+            export_memory_budget=268435456,
+            stream_data=False,
+            data_format="json",
+            checkpoint_every_pages=1,
+            checkpoint_every_seconds=0,
+            export_partitions=1,
+            activity_export_target_rows=4000000,
+            max_concurrent_activity_exports=1,
+            reuse_export_definitions=False,
+            cleanup_exports=False,
+            export_page_retries=3,
         )
 
+    @patch("tap_eloqua.__init__.sync")
+    @patch("tap_eloqua.__init__.garbage_collect")
+    @patch("tap_eloqua.__init__.parse_args")
+    @patch("tap_eloqua.__init__.EloquaClient")
+    def test_main_runs_garbage_collect_when_flag_set(self, mock_client_class, mock_parse_args, mock_garbage_collect, mock_sync):
+        mock_parse_args.return_value = Namespace(
+            config_path="config.json",
+            config={
+                "client_id": "id",
+                "client_secret": "secret",
+                "refresh_token": "rt",
+                "redirect_uri": "uri",
+                "start_date": "2024-01-01T00:00:00Z",
+                "garbage_collect_concurrency": "8",
+            },
+            discover=False,
+            garbage_collect=True,
+            catalog=MagicMock(),
+            state={
+                "export_definitions": {"accounts": {"key": "k", "uri": "/accounts/exports/1"}},
+                "bookmarks": {
+                    "contacts": {"sync_id": "5", "offset": 0, "datetime": "2024-01-01",
+                                 "definition_uri": "/contacts/exports/2"},
+                    "emails": "2024-01-01",
+                    "activities": {"sync_id": None, "offset": None, "datetime": "2024-01-01"},
+                    "accounts": {"datetime": "2024-01-01", "partitions": [
+                        {"sync_id": "6", "definition_uri": "/accounts/exports/3"},
+                        {"sync_id": None, "done": True},
+                    ]},
+                },
+            },
+        )
+        mock_client_context = MagicMock()
+        mock_client_class.return_value.__enter__.return_value = mock_client_context
+
+        tap_main.main.__wrapped__()
+
+        mock_garbage_collect.assert_called_once_with(mock_client_context,
+                                                     max_workers=8,
+                                                     keep_uris={"/accounts/exports/1",
+                                                                "/contacts/exports/2",
+                                                                "/accounts/exports/3"})
+        mock_sync.assert_not_called()
+
+    @patch("tap_eloqua.__init__.do_discover")
+    @patch("tap_eloqua.__init__.parse_args")
+    @patch("tap_eloqua.__init__.EloquaClient")
+    def test_main_passes_client_settings(self, mock_client_class, mock_parse_args, mock_do_discover):
+        mock_parse_args.return_value = Namespace(
+            config_path="config.json",
+            config={
+                "client_id": "id",
+                "client_secret": "secret",
+                "refresh_token": "rt",
+                "redirect_uri": "uri",
+                "start_date": "2024-01-01T00:00:00Z",
+                "token_renewal_margin": "300",
+                "identity_cache_path": "identity.json",
+                "max_requests_per_second": "5",
+                "max_concurrent_bulk_data_requests": "3",
+                "bulk_data_read_timeout_seconds": "60",
+            },
+            discover=True,
+            catalog=None,
+            state={},
+        )
+
+        tap_main.main.__wrapped__()
+
+        mock_client_class.assert_called_once_with(
+            "config.json", "id", "secret", "rt", "uri", None,
+            token_renewal_margin=300.0,
+            identity_cache_path="identity.json",
+            identity_cache_ttl=86400.0,
+            max_requests_per_second=5.0,
+            request_burst=None,
+            max_concurrent_requests={"auth": 0, "bulk_control": 0, "bulk_data": 3, "rest": 0},
+            retry_policy=ANY,
+            pool_size=10,
+            connect_timeout=10.0,
+            read_timeouts={"auth": 30.0, "bulk_control": 120.0, "bulk_data": 60.0, "rest": 120.0},
+            keepalive_idle=60,
+            stall_timeout=60.0)
+
+    def test_get_flag_accepts_booleans_and_strings(self):
+        config = {"a": True, "b": "true", "c": False, "d": "false", "e": "yes"}
+        self.assertEqual([tap_main.get_flag(config, key) for key in "abcdef"],
+                         [True, True, False, False, False, False])
+
+    def test_get_pool_size_matches_export_parallelism(self):
+        self.assertEqual(tap_main.get_pool_size({}), 10)
+        self.assertEqual(tap_main.get_pool_size({"max_concurrent_exports": "4",
+                                                 "max_concurrent_activity_exports": "2",
+                                                 "export_parallelism": "3"}), 20)
+        # Time windows share the max_concurrent_exports slots
+        self.assertEqual(tap_main.get_pool_size({"max_concurrent_exports": "4",
+                                                 "max_concurrent_activity_exports": "2",
+                                                 "export_parallelism": "3",
+                                                 "export_partitions": "8"}), 20)
+        self.assertEqual(tap_main.get_pool_size({"http_pool_size": "7"}), 7)
+
     def test_module_main_guard_executes(self):
         with patch("sys.argv", ["tap_eloqua", "--help"]):
             with self.assertRaises(SystemExit):
@@ -0,0 +1,85 @@
+import importlib
+import io
+import json
+import sys
+import unittest
+from unittest.mock import patch
+
+from tap_eloqua import output
+from tap_eloqua.output import MessageWriter
+
+
+class BinaryStdout(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.buffer = io.BytesIO()
+
+
+class TestMessageWriterUnit(unittest.TestCase):
+    def _lines(self, stdout):
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_buffers_records_until_state(self):
+        stdout = io.StringIO()
+        writer = MessageWriter(buffer_size=1024 * 1024, flush_interval=3600)
+        with patch("sys.stdout", stdout):
+            writer.write_schema("accounts", {"type": "object"}, ["Id"])
+            writer.write_record("accounts", {"Id": "1"})
+            self.assertEqual(stdout.getvalue(), "")
+
+            writer.write_state({"bookmarks": {"accounts": "x"}})
+
+        self.assertEqual([line["type"] for line in self._lines(stdout)], ["SCHEMA", "RECORD", "STATE"])
+        self.assertEqual(self._lines(stdout)[1], {"type": "RECORD", "stream": "accounts", "record": {"Id": "1"}})
+
+    def test_flushes_when_buffer_size_reached(self):
+        stdout = io.StringIO()
+        writer = MessageWriter(buffer_size=0, flush_interval=3600)
+        with patch("sys.stdout", stdout):
+            writer.write_record("accounts", {"Id": "1"})
+        self.assertEqual(len(self._lines(stdout)), 1)
+
+    def test_flushes_when_interval_elapsed(self):
+        stdout = io.StringIO()
+        writer = MessageWriter(buffer_size=1024 * 1024, flush_interval=0)
+        with patch("sys.stdout", stdout):
+            writer.write_record("accounts", {"Id": "1"})
+        self.assertEqual(len(self._lines(stdout)), 1)
+
+    def test_writes_utf8_bytes_to_binary_stdout(self):
+        stdout = BinaryStdout()
+        writer = MessageWriter(buffer_size=0)
+        with patch("sys.stdout", stdout):
+            writer.write_record("accounts", {"Name": "Zoë"})
+        record = json.loads(stdout.buffer.getvalue().decode("utf-8"))["record"]
+        self.assertEqual(record, {"Name": "Zoë"})
+
+    def test_matches_singer_format_without_orjson(self):
+        stdout = io.StringIO()
+        writer = MessageWriter(buffer_size=0)
+        with patch("sys.stdout", stdout), patch("tap_eloqua.output.orjson", None):
+            writer.write_record("accounts", {"Id": "1"})
+        self.assertEqual(stdout.getvalue(), '{"type": "RECORD", "stream": "accounts", "record": {"Id": "1"}}\n')
+
+    def test_falls_back_to_singer_format_when_orjson_is_not_installed(self):
+        try:
+            with patch.dict(sys.modules, {"orjson": None}):
+                importlib.reload(output)
+            self.assertIsNone(output.orjson)
+        finally:
+            importlib.reload(output)
+
+    def test_module_functions_use_configured_writer(self):
+        stdout = io.StringIO()
+        with patch("tap_eloqua.output.WRITER", MessageWriter()), patch("sys.stdout", stdout):
+            output.configure(buffer_size=1024 * 1024, flush_interval=3600)
+            output.write_schema("accounts", {"type": "object"}, ["Id"])
+            output.write_record("accounts", {"Id": "1"})
+            self.assertEqual(stdout.getvalue(), "")
+            output.flush()
+            output.write_state({})
+        self.assertEqual(len(self._lines(stdout)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
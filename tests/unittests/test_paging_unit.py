@@ -0,0 +1,42 @@
+import unittest
+
+from tap_eloqua.paging import PageSizer, MAX_PAGE_SIZE, MIN_PAGE_SIZE
+
+
+class TestPagingUnit(unittest.TestCase):
+    def test_page_sizer_starts_from_initial_size_within_limits(self):
+        self.assertEqual(PageSizer(5000).size, 5000)
+        self.assertEqual(PageSizer(100000).size, MAX_PAGE_SIZE)
+        self.assertEqual(PageSizer(1).size, MIN_PAGE_SIZE)
+
+    def test_page_sizer_shrinks_wide_rows_to_memory_budget(self):
+        sizer = PageSizer(5000, memory_budget=10 * 1000 * 1000, pages_in_flight=2)
+
+        sizer.observe(5000, 5000 * 2000, 1)
+
+        self.assertEqual(sizer.size, 2500)
+
+    def test_page_sizer_grows_narrow_rows_gradually_up_to_max(self):
+        sizer = PageSizer(5000, memory_budget=1000 * 1000 * 1000)
+        sizes = []
+        for _ in range(5):
+            sizer.observe(sizer.size, sizer.size * 100, 1)
+            sizes.append(sizer.size)
+
+        self.assertEqual(sizes, [10000, 20000, 40000, 50000, 50000])
+
+    def test_page_sizer_keeps_pages_near_target_latency(self):
+        sizer = PageSizer(5000, memory_budget=1000 * 1000 * 1000, target_page_seconds=10)
+
+        sizer.observe(5000, 5000 * 100, 20)
+
+        self.assertEqual(sizer.size, 2500)
+
+    def test_page_sizer_ignores_empty_pages(self):
+        sizer = PageSizer(5000)
+        sizer.observe(0, 10, 1)
+        self.assertEqual(sizer.size, 5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from tap_eloqua.pipeline import prefetch, run_concurrently
+
+
+class TestPipelineUnit(unittest.TestCase):
+    def test_prefetch_yields_items_in_order(self):
+        self.assertEqual(list(prefetch(iter(range(50)), 3)), list(range(50)))
+
+    def test_prefetch_runs_iterable_on_background_thread(self):
+        def source():
+            yield threading.current_thread()
+
+        producer_thread = next(prefetch(source(), 1))
+        self.assertIsNot(producer_thread, threading.current_thread())
+
+    def test_prefetch_reraises_after_preceding_items(self):
+        def source():
+            yield 1
+            yield 2
+            raise ValueError("boom")
+
+        seen = []
+        with self.assertRaises(ValueError):
+            for item in prefetch(source(), 1):
+                seen.append(item)
+        self.assertEqual(seen, [1, 2])
+
+    @patch("tap_eloqua.pipeline.PUT_TIMEOUT", 0.01)
+    def test_prefetch_waits_for_a_slow_consumer(self):
+        produced = []
+
+        def source():
+            for i in range(3):
+                produced.append(i)
+                yield i
+
+        seen = []
+        for item in prefetch(source(), 1):
+            seen.append(item)
+            time.sleep(0.05)
+            # The producer stays at most one item plus the one it holds ahead
+            self.assertLessEqual(len(produced) - len(seen), 2)
+
+        self.assertEqual(seen, [0, 1, 2])
+
+    def test_prefetch_closes_iterable_when_consumer_stops(self):
+        closed = threading.Event()
+
+        def source():
+            try:
+                for i in range(1000):
+                    yield i
+            finally:
+                closed.set()
+
+        items = prefetch(source(), 2)
+        self.assertEqual(next(items), 0)
+        items.close()
+
+        self.assertTrue(closed.is_set())
+
+    def test_run_concurrently_returns_results_in_item_order(self):
+        self.assertEqual(run_concurrently(lambda x: x * 2, [3, 1, 2], 3), [6, 2, 4])
+
+    def test_run_concurrently_cancels_pending_calls_on_error(self):
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def func(item):
+            calls.append(item)
+            if item == "fail":
+                started.wait()
+                raise ValueError("boom")
+            started.set()
+            release.wait(1)
+            return item
+
+        with self.assertRaises(ValueError):
+            run_concurrently(func, ["slow", "fail", "never"], 2)
+        release.set()
+
+        self.assertNotIn("never", calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from tap_eloqua.poller import ExportPoller
+
+
+def statuses_by_sync(responses):
+    """Returns a client.get side effect serving a status sequence per sync."""
+    lock = threading.Lock()
+    threads = set()
+
+    def get(path, endpoint):
+        sync_id = path.rsplit("/", 1)[1]
+        with lock:
+            threads.add(threading.current_thread())
+            response = responses[sync_id].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return {"status": response}
+
+    get.threads = threads
+    return get
+
+
+class TestExportPollerUnit(unittest.TestCase):
+    def test_polls_all_syncs_from_one_thread_until_success(self):
+        get = statuses_by_sync({
+            "1": ["pending", "active", "success"],
+            "2": ["pending", "success"],
+        })
+        client = MagicMock()
+        client.get.side_effect = get
+        next_interval = MagicMock(return_value=0)
+
+        with ExportPoller(client, next_interval, 60) as poller:
+            first = poller.register("accounts", "1")
+            second = poller.register("contacts", "2")
+            self.assertEqual(first.result(5), {"status": "success"})
+            self.assertEqual(second.result(5), {"status": "success"})
+
+        self.assertEqual(client.get.call_count, 5)
+        self.assertEqual(len(get.threads), 1)
+        self.assertEqual(next_interval.call_count, 3)
+
+    def test_waits_out_each_syncs_interval_before_polling_again(self):
+        client = MagicMock()
+        client.get.side_effect = statuses_by_sync({"1": ["pending", "success"]})
+
+        with ExportPoller(client, lambda interval: 0.1, 60) as poller:
+            start = time.monotonic()
+            self.assertEqual(poller.wait("accounts", "1"), {"status": "success"})
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(client.get.call_count, 2)
+
+    def test_failed_status_resolves_to_exception(self):
+        client = MagicMock()
+        client.get.return_value = {"status": "error"}
+
+        with ExportPoller(client, lambda interval: 0, 60) as poller:
+            with self.assertRaises(Exception) as error_context:
+                poller.wait("accounts", "1")
+        self.assertIn("exporting failed", str(error_context.exception))
+
+    def test_deadline_exceeded_resolves_to_exception(self):
+        client = MagicMock()
+        client.get.return_value = {"status": "pending"}
+
+        with ExportPoller(client, lambda interval: 0, -1) as poller:
+            with self.assertRaises(Exception) as error_context:
+                poller.wait("accounts", "1")
+        self.assertIn("export deadline exceeded", str(error_context.exception))
+
+    def test_poll_request_error_resolves_only_that_sync(self):
+        client = MagicMock()
+        client.get.side_effect = statuses_by_sync({
+            "1": [ValueError("boom")],
+            "2": ["success"],
+        })
+
+        with ExportPoller(client, lambda interval: 0, 60) as poller:
+            failed = poller.register("accounts", "1")
+            succeeded = poller.register("contacts", "2")
+            with self.assertRaises(ValueError):
+                failed.result(5)
+            self.assertEqual(succeeded.result(5), {"status": "success"})
+
+    def test_exit_fails_outstanding_syncs(self):
+        client = MagicMock()
+        client.get.return_value = {"status": "pending"}
+
+        with ExportPoller(client, lambda interval: 3600, 7200) as poller:
+            future = poller.register("accounts", "1")
+
+        with self.assertRaises(Exception) as error_context:
+            future.result(5)
+        self.assertIn("poller stopped", str(error_context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from tap_eloqua.ratelimit import (
+    RequestGovernor,
+    TokenBucket,
+    get_endpoint_class
+)
+
+
+class TestRateLimitUnit(unittest.TestCase):
+    def test_get_endpoint_class(self):
+        self.assertEqual(get_endpoint_class("https://login.eloqua.com/id"), "auth")
+        self.assertEqual(get_endpoint_class("https://p01.eloqua.com/api/bulk/2.0/syncs/42/data"), "bulk_data")
+        self.assertEqual(get_endpoint_class("https://p01.eloqua.com/api/bulk/2.0/syncs/42"), "bulk_control")
+        self.assertEqual(get_endpoint_class("https://p01.eloqua.com/api/bulk/2.0/contacts/exports"), "bulk_control")
+        self.assertEqual(get_endpoint_class("https://p01.eloqua.com/api/REST/2.0/assets/emails"), "rest")
+
+    def test_token_bucket_allows_a_burst_then_throttles_to_the_rate(self):
+        bucket = TokenBucket(50, burst=2)
+
+        start = time.monotonic()
+        bucket.acquire()
+        bucket.acquire()
+        burst_seconds = time.monotonic() - start
+        for _ in range(4):
+            bucket.acquire()
+        total_seconds = time.monotonic() - start
+
+        self.assertLess(burst_seconds, 0.02)
+        self.assertGreaterEqual(total_seconds, 0.07)
+
+    def test_governor_limits_requests_in_flight_per_endpoint_class(self):
+        governor = RequestGovernor(max_concurrent_requests={"bulk_data": 2, "rest": 0})
+        in_flight = [0]
+        max_in_flight = [0]
+        lock = threading.Lock()
+
+        def send(_):
+            release = governor.acquire("bulk_data")
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            release()
+            release()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(send, range(16)))
+
+        self.assertEqual(max_in_flight[0], 2)
+        # Unlimited classes do not block
+        releases = [governor.acquire("rest") for _ in range(10)]
+        for release in releases:
+            release()
+
+
+    def test_governor_frees_the_slot_when_throttling_is_interrupted(self):
+        for max_concurrent_requests in [{"bulk_data": 1}, {}]:
+            governor = RequestGovernor(1000, max_concurrent_requests=max_concurrent_requests)
+            with patch.object(TokenBucket, "acquire", side_effect=KeyboardInterrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    governor.acquire("bulk_data")
+
+            acquired = threading.Event()
+
+            def send():
+                governor.acquire("bulk_data")()
+                acquired.set()
+
+            threading.Thread(target=send, daemon=True).start()
+            self.assertTrue(acquired.wait(1))
+
+if __name__ == "__main__":
+    unittest.main()
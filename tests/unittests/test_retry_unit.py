@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import MagicMock, patch
+
+from requests.exceptions import ConnectionError, ConnectTimeout, HTTPError, ReadTimeout
+
+from tap_eloqua.retry import (
+    RetryPolicy,
+    Server429Error,
+    Server5xxError,
+    is_idempotent,
+    parse_retry_after
+)
+
+
+class TestRetryUnit(unittest.TestCase):
+    def test_parse_retry_after_accepts_seconds_and_http_dates(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(parse_retry_after(format_datetime(retry_at, usegmt=True)), 30, delta=2)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        # A -0000 offset parses to a naive datetime, taken as UTC
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 -0000"), 0.0)
+
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_call_retries_transient_errors_honoring_retry_after(self, mock_sleep):
+        func = MagicMock(side_effect=[Server429Error(retry_after=12),
+                                      Server5xxError(),
+                                      ReadTimeout(),
+                                      ConnectionError(),
+                                      "ok"])
+
+        with patch("tap_eloqua.retry.random.uniform", return_value=0.5) as mock_uniform:
+            self.assertEqual(RetryPolicy().call(func, "a", b=1), "ok")
+
+        func.assert_called_with("a", b=1)
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [12, 0.5, 0.5, 0.5])
+        # Full jitter between zero and a doubling cap
+        self.assertEqual([call[0] for call in mock_uniform.call_args_list], [(0, 4), (0, 8), (0, 16)])
+
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_call_retries_non_idempotent_calls_only_when_they_never_connected(self, mock_sleep):
+        func = MagicMock(side_effect=[ConnectTimeout(), ConnectionError(), "ok"])
+        self.assertEqual(RetryPolicy().call(func, idempotent=False), "ok")
+        self.assertEqual(func.call_count, 3)
+
+        func = MagicMock(side_effect=ReadTimeout())
+        with self.assertRaises(ReadTimeout):
+            RetryPolicy().call(func, idempotent=False)
+        self.assertEqual(func.call_count, 1)
+
+    def test_is_idempotent(self):
+        self.assertTrue(is_idempotent("get"))
+        self.assertTrue(is_idempotent("PUT"))
+        self.assertTrue(is_idempotent("DELETE"))
+        self.assertFalse(is_idempotent("POST"))
+
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_call_gives_up_after_max_tries_and_on_other_errors(self, mock_sleep):
+        func = MagicMock(side_effect=Server5xxError())
+        with self.assertRaises(Server5xxError):
+            RetryPolicy(max_tries=3).call(func)
+        self.assertEqual(func.call_count, 3)
+
+        func = MagicMock(side_effect=HTTPError())
+        with self.assertRaises(HTTPError):
+            RetryPolicy().call(func)
+        self.assertEqual(func.call_count, 1)
+
+    @patch("tap_eloqua.retry.time.sleep")
+    def test_call_enforces_request_and_run_budgets(self, mock_sleep):
+        func = MagicMock(side_effect=Server429Error(retry_after=400))
+        with self.assertRaises(Server429Error):
+            RetryPolicy(request_budget=300).call(func)
+        self.assertEqual(func.call_count, 1)
+
+        policy = RetryPolicy(max_tries=10, request_budget=100, run_budget=50)
+        func = MagicMock(side_effect=[Server429Error(retry_after=20), Server429Error(retry_after=20), "ok"])
+        self.assertEqual(policy.call(func), "ok")
+        func = MagicMock(side_effect=Server429Error(retry_after=20))
+        with self.assertRaises(Server429Error):
+            policy.call(func)
+        self.assertEqual(func.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
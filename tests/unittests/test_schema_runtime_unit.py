@@ -1,3 +1,4 @@
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -124,6 +125,35 @@ class TestSchemaRuntimeUnit(unittest.TestCase):
         self.assertIn("order_events", metadata)
         mock_get_static_schemas.assert_called_once_with()
 
+    @patch("tap_eloqua.schema.get_static_schemas")
+    def test_get_schemas_merges_concurrent_field_requests_in_order(self, mock_get_static_schemas):
+        system_fields = dict(schema_module.BULK_SYSTEM_FIELDS)
+
+        def get(path, params=None, endpoint=None):
+            if path == "/api/bulk/2.0/customObjects":
+                return {"items": [{"uri": "/customObjects/{}".format(i), "name": "Object {}".format(i)}
+                                  for i in range(20)]}
+            # Later requests finish first
+            if "customObjects/" in path:
+                time.sleep(0.001 * (20 - int(path.split("/")[5])))
+            return {"items": [{"internalName": "Field_{}".format(path.split("/")[-2]),
+                               "dataType": "text",
+                               "statement": "{{Field}}"}]}
+
+        client = MagicMock()
+        client.get.side_effect = get
+
+        schemas, metadata = schema_module.get_schemas(client, max_workers=8)
+
+        names = list(schemas)
+        self.assertEqual(names[:2], ["accounts", "contacts"])
+        self.assertEqual(names[-20:], ["object_{}".format(i) for i in range(20)])
+        self.assertEqual(list(metadata), names)
+        self.assertIn("Field_5", schemas["object_5"]["properties"])
+        self.assertIn("IsSubscribed", schemas["contacts"]["properties"])
+        self.assertNotIn("IsSubscribed", schemas["accounts"]["properties"])
+        self.assertEqual(schema_module.BULK_SYSTEM_FIELDS, system_fields)
+
 
 if __name__ == "__main__":
     unittest.main()
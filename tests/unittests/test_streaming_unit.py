@@ -0,0 +1,108 @@
+import json
+import unittest
+from unittest.mock import ANY, MagicMock
+
+from tap_eloqua.streaming import CsvItemStream, JsonItemStream
+
+
+class TestStreamingUnit(unittest.TestCase):
+    def _chunks(self, body, size):
+        raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+    def test_yields_items_across_any_chunk_boundary(self):
+        body = {
+            "count": 3,
+            "items": [{"Id": str(i), "Name": "é" * i, "Score": 1000 + i} for i in range(3)],
+            "hasMore": True,
+            "totalResults": 123456,
+        }
+        for size in [1, 2, 5, 4096]:
+            stream = JsonItemStream(self._chunks(body, size))
+            self.assertEqual(list(stream), body["items"])
+            self.assertTrue(stream["hasMore"])
+            self.assertEqual(stream.get("totalResults"), 123456)
+
+    def test_fields_before_items_are_available_and_empty_items(self):
+        stream = JsonItemStream([b'{"hasMore": false, "items": [ ] }'])
+        self.assertEqual(stream.load(), {"hasMore": False, "items": []})
+
+    def test_reports_counts_and_closes_response_when_finished(self):
+        close = MagicMock()
+        on_finish = MagicMock()
+        chunks = self._chunks({"items": [{"a": 1}, {"a": 2}], "hasMore": False}, 7)
+
+        stream = JsonItemStream(chunks, close=close, on_finish=on_finish)
+        list(stream.get("items"))
+
+        on_finish.assert_called_once_with(2, sum(len(chunk) for chunk in chunks), ANY)
+        close.assert_called_once_with()
+
+    def test_closes_response_when_consumer_stops_early(self):
+        close = MagicMock()
+        stream = JsonItemStream([b'{"items": [{"a": 1}, {"a": 2}]}'], close=close)
+
+        next(iter(stream))
+        stream.close()
+
+        close.assert_called_once_with()
+
+    def test_raises_on_truncated_body(self):
+        stream = JsonItemStream([b'{"items": [{"a": 1}, {"a"'])
+        with self.assertRaises(ValueError):
+            list(stream)
+
+    def test_empty_object_and_items_lookup(self):
+        stream = JsonItemStream([b'{}'])
+        self.assertEqual(list(stream["items"]), [])
+        self.assertIsNone(stream.get("hasMore"))
+
+    def test_raises_on_unexpected_character_and_missing_end(self):
+        for body in [b'{"items": [1} ', b'{"items": [1]']:
+            with self.assertRaises(ValueError):
+                JsonItemStream([body]).load()
+
+
+    def test_csv_rows_are_keyed_by_header_across_any_chunk_boundary(self):
+        raw = 'Id,Name,Note\r\n1,é,"multi\r\nline, with comma"\r\n2,,x\r\n'.encode("utf-8")
+        for size in [1, 2, 3, 4096]:
+            stream = CsvItemStream([raw[i:i + size] for i in range(0, len(raw), size)], lambda rows: rows >= 2)
+            self.assertEqual(list(stream), [
+                {"Id": "1", "Name": "é", "Note": "multi\r\nline, with comma"},
+                {"Id": "2", "Name": "", "Note": "x"},
+            ])
+            self.assertTrue(stream["hasMore"])
+
+    def test_csv_pages_share_mapped_columns(self):
+        columns = {}
+        first = CsvItemStream([b"Id,Name\n1,a\n"], lambda rows: True, columns=columns).load()
+        second = CsvItemStream([b"Id,Name\n2,b\n"], lambda rows: False, columns=columns).load()
+
+        self.assertEqual(len(columns), 1)
+        self.assertIs(list(first["items"][0])[0], list(second["items"][0])[0])
+        self.assertFalse(second["hasMore"])
+
+    def test_csv_empty_body_has_no_rows(self):
+        on_finish = MagicMock()
+        data = CsvItemStream([], lambda rows: rows > 0, on_finish=on_finish).load()
+        self.assertEqual(data, {"hasMore": False, "items": []})
+        on_finish.assert_called_once_with(0, 0, ANY)
+
+    def test_csv_skips_blank_lines_and_reads_last_row_without_newline(self):
+        stream = CsvItemStream([b"Id,Name\n1,a\n\n2,b"], lambda rows: False)
+        self.assertIs(stream["items"], stream.get("items"))
+        self.assertEqual(list(stream), [{"Id": "1", "Name": "a"}, {"Id": "2", "Name": "b"}])
+        self.assertFalse(stream.get("hasMore"))
+
+    def test_csv_close_releases_response_before_iteration(self):
+        close = MagicMock()
+        stream = CsvItemStream([b"Id\n1\n"], lambda rows: False, close=close)
+
+        stream.close()
+        stream.close()
+
+        close.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
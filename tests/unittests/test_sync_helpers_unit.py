@@ -4,11 +4,15 @@ from unittest.mock import patch
 import pendulum
 
 from tap_eloqua.sync import (
+    CheckpointPolicy,
     MIN_RETRY_INTERVAL,
     MAX_RETRY_INTERVAL,
     next_sleep_interval,
     get_bookmark,
     get_bulk_bookmark,
+    get_partitions_low_water_mark,
+    plan_activity_window,
+    plan_export_partitions,
 )
 
 
@@ -76,6 +80,65 @@ class TestSyncHelpersUnit(unittest.TestCase):
         self.assertRegex(result, r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
         self.assertEqual(result, "2024-08-15 12:30:45")
 
+    def test_checkpoint_policy_every_n_pages(self):
+        policy = CheckpointPolicy(every_pages=3)
+        self.assertEqual([policy.due() for _ in range(6)], [False, False, True, False, False, True])
+
+    @patch("tap_eloqua.sync.time.monotonic")
+    def test_checkpoint_policy_every_n_seconds(self, mock_monotonic):
+        mock_monotonic.side_effect = [0, 10, 31, 31, 40]
+        policy = CheckpointPolicy(every_pages=0, every_seconds=30)
+        self.assertEqual([policy.due() for _ in range(3)], [False, True, False])
+
+    def test_checkpoint_policy_default_checkpoints_every_page(self):
+        policy = CheckpointPolicy()
+        self.assertTrue(all(policy.due() for _ in range(3)))
+
+
+    @patch("tap_eloqua.sync.pendulum.now", return_value=pendulum.datetime(2024, 1, 10, tz="UTC"))
+    def test_plan_export_partitions_splits_range_and_leaves_last_window_open(self, _mock_now):
+        partitions = plan_export_partitions("2024-01-01 00:00:00", 3)
+        self.assertEqual([(p["start"], p["end"]) for p in partitions], [
+            ("2024-01-01 00:00:00", "2024-01-04 00:00:00"),
+            ("2024-01-04 00:00:00", "2024-01-07 00:00:00"),
+            ("2024-01-07 00:00:00", None),
+        ])
+        self.assertFalse(any(p["done"] for p in partitions))
+
+    @patch("tap_eloqua.sync.pendulum.now", return_value=pendulum.datetime(2024, 1, 2, 12, tz="UTC"))
+    def test_plan_export_partitions_keeps_windows_at_least_a_day(self, _mock_now):
+        self.assertEqual(len(plan_export_partitions("2024-01-01 00:00:00", 8)), 1)
+
+    def test_get_partitions_low_water_mark(self):
+        partitions = [
+            {"start": "2024-01-01 00:00:00", "datetime": "2024-01-02 00:00:00", "done": True},
+            {"start": "2024-01-03 00:00:00", "datetime": "2024-01-03 00:00:00", "done": False},
+            {"start": "2024-01-05 00:00:00", "datetime": "2024-01-06 00:00:00", "done": True},
+        ]
+        self.assertEqual(get_partitions_low_water_mark(partitions), "2024-01-03 00:00:00")
+        partitions[1]["done"] = True
+        self.assertEqual(get_partitions_low_water_mark(partitions), "2024-01-06 00:00:00")
+
+
+    def test_plan_activity_window_targets_rows_from_recorded_density(self):
+        state = {"activity_stats": {"activity_email_send": {"count": 1000, "seconds": 3600}}}
+        last_date = pendulum.datetime(2024, 1, 1, tz="UTC")
+        sync_start = pendulum.datetime(2024, 2, 1, tz="UTC")
+
+        end_date = plan_activity_window(state, "activity_email_send", last_date, sync_start, 4000)
+
+        self.assertEqual(end_date, pendulum.datetime(2024, 1, 1, 4, tz="UTC"))
+
+    def test_plan_activity_window_runs_to_sync_start_without_estimate(self):
+        last_date = pendulum.datetime(2024, 1, 1, tz="UTC")
+        sync_start = pendulum.datetime(2024, 2, 1, tz="UTC")
+        empty_stats = {"activity_stats": {"activity_email_send": {"count": 0, "seconds": 3600}}}
+        sparse_stats = {"activity_stats": {"activity_email_send": {"count": 1, "seconds": 3600}}}
+
+        self.assertEqual(plan_activity_window({}, "activity_email_send", last_date, sync_start, 4000), sync_start)
+        self.assertEqual(plan_activity_window(empty_stats, "activity_email_send", last_date, sync_start, 4000), sync_start)
+        self.assertEqual(plan_activity_window(sparse_stats, "activity_email_send", last_date, sync_start, 4000), sync_start)
+
 
 if __name__ == "__main__":
     unittest.main()
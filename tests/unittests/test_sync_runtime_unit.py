@@ -1,19 +1,31 @@
+import json
+import threading
+import time
 import unittest
 from itertools import count
 from unittest.mock import MagicMock, patch
 
 import pendulum
-from requests.exceptions import HTTPError
+from requests.exceptions import ChunkedEncodingError, ConnectionError, HTTPError
 from singer.catalog import Catalog
 
+from tap_eloqua.paging import PageSizer
+from tap_eloqua.streaming import CsvItemStream, JsonItemStream
 from tap_eloqua.sync import (
     ActivityExportTooLarge,
+    fetch_export_page,
+    get_export_pages,
+    get_record_transformer,
     persist_records,
     stream_export,
     sync,
     sync_activity_stream,
+    sync_activity_streams,
     sync_bulk_obj,
+    sync_bulk_streams,
+    sync_static_endpoint,
     transform_export_row,
+    write_bulk_bookmark,
 )
 
 
@@ -84,13 +96,25 @@ class TestSyncRuntimeUnit(unittest.TestCase):
         self.assertIsNone(transformed["A"])
         self.assertEqual(transformed["B"], "x")
 
-    @patch("tap_eloqua.sync.singer.write_record")
+    @patch("tap_eloqua.sync.output.write_record")
     def test_persist_records_sets_created_at_for_activity(self, mock_write_record):
         records = [{"ActivityDate": "2024-01-01T00:00:00Z", "Id": "1"}]
         persist_records(self._accounts_catalog(), "accounts", records, activity_type="EmailOpen")
         written = mock_write_record.call_args.args[1]
         self.assertEqual(written["CreatedAt"], "2024-01-01T00:00:00.000000Z")
 
+    def test_get_record_transformer_compiles_once_per_stream(self):
+        catalog = self._accounts_catalog()
+        with patch("tap_eloqua.sync.RECORD_TRANSFORMERS", {}), \
+             patch("tap_eloqua.sync.RecordTransformer") as mock_record_transformer:
+            first = get_record_transformer(catalog, "accounts")
+            second = get_record_transformer(catalog, "accounts")
+            self.assertEqual(mock_record_transformer.call_count, 1)
+            get_record_transformer(self._accounts_catalog(), "accounts")
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_record_transformer.call_count, 2)
+
     @patch("tap_eloqua.sync.persist_records")
     @patch("tap_eloqua.sync.write_bulk_bookmark")
     @patch("tap_eloqua.sync.write_schema")
@@ -135,6 +159,384 @@ class TestSyncRuntimeUnit(unittest.TestCase):
 
         self.assertEqual(out, "2024-01-02T00:00:00Z")
 
+    @patch("tap_eloqua.sync.persist_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_bookmarks_next_offset_after_each_page(self, _mock_write_schema, mock_write_bulk_bookmark, _mock_persist_records):
+        client = MagicMock()
+        client.get.side_effect = [
+            {"hasMore": True, "items": [{"UpdatedAt": "2024-01-01T00:00:00Z"}]},
+            {"hasMore": False, "items": [{"UpdatedAt": "2024-01-02T00:00:00Z"}]},
+        ]
+
+        stream_export(
+            client=client,
+            state={},
+            catalog=self._accounts_catalog(),
+            stream_name="accounts",
+            sync_id="10",
+            updated_at_field="UpdatedAt",
+            bulk_page_size=1,
+            bookmark_datetime="2024-01-01T00:00:00Z",
+            offset=5,
+        )
+
+        offsets = [call.args[3] for call in mock_write_bulk_bookmark.call_args_list]
+        self.assertEqual(offsets, [5, 6, None])
+
+    @patch("tap_eloqua.sync.write_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_retries_failed_page_from_its_offset(self, _mock_write_schema, mock_write_bulk_bookmark, mock_write_records):
+        def broken_page():
+            yield b'{"hasMore": false, "items": [{"UpdatedAt": "2024-01-02T00:00:00Z"},'
+            raise ChunkedEncodingError("connection reset")
+
+        written = []
+
+        def write_records(_stream_name, records):
+            written.append([])
+            for record in records:
+                written[-1].append(record["UpdatedAt"])
+
+        mock_write_records.side_effect = write_records
+        client = MagicMock()
+        client.stream.side_effect = [
+            JsonItemStream([b'{"hasMore": true, "items": [{"UpdatedAt": "2024-01-01T00:00:00Z"}]}']),
+            JsonItemStream(broken_page()),
+            JsonItemStream([b'{"hasMore": false, "items": [{"UpdatedAt": "2024-01-02T00:00:00Z"}]}']),
+        ]
+
+        out = stream_export(
+            client=client,
+            state={},
+            catalog=self._accounts_catalog(),
+            stream_name="accounts",
+            sync_id="10",
+            updated_at_field="UpdatedAt",
+            bulk_page_size=1,
+            bookmark_datetime="2024-01-01T00:00:00Z",
+            stream_data=True,
+        )
+
+        self.assertEqual(out, "2024-01-02T00:00:00Z")
+        page_offsets = [call[1]["params"]["offset"] for call in client.stream.call_args_list]
+        self.assertEqual(page_offsets, [0, 1, 1])
+        # Rows are written as they are parsed, so the failed page's first row
+        # is written again when the page is retried
+        self.assertEqual(written, [["2024-01-01T00:00:00.000000Z"],
+                                   ["2024-01-02T00:00:00.000000Z"],
+                                   ["2024-01-02T00:00:00.000000Z"]])
+        offsets = [call.args[3] for call in mock_write_bulk_bookmark.call_args_list]
+        self.assertEqual(offsets, [0, 1, None])
+
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_writes_streamed_rows_as_they_are_parsed(self, _mock_write_schema, _mock_write_bulk_bookmark, mock_write_record):
+        written_before_second_row = []
+
+        def page():
+            yield b'{"hasMore": false, "items": [{"Id": "1", "UpdatedAt": "2024-01-02T00:00:00Z"},'
+            written_before_second_row.append(mock_write_record.call_count)
+            yield b' {"Id": "2", "UpdatedAt": "2024-01-03T00:00:00Z"}]}'
+
+        client = MagicMock()
+        client.stream.return_value = JsonItemStream(page())
+
+        final = stream_export(client, {}, self._accounts_catalog(), "accounts", "10", "UpdatedAt", 2,
+                              "2024-01-01T00:00:00Z", stream_data=True)
+
+        self.assertEqual(written_before_second_row, [1])
+        self.assertEqual(mock_write_record.call_count, 2)
+        self.assertEqual(final, "2024-01-03T00:00:00Z")
+
+    @patch("tap_eloqua.sync.time.monotonic")
+    @patch("tap_eloqua.sync.PageSizer")
+    @patch("tap_eloqua.sync.output.write_record")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_sizes_streamed_pages_from_network_time_only(
+        self, _mock_write_schema, _mock_write_bulk_bookmark, mock_write_record, mock_page_sizer_class, mock_monotonic
+    ):
+        clock = [0.0]
+        mock_monotonic.side_effect = lambda: clock[0]
+        chunks = [b'{"hasMore": false, "items": [{"Id": "1", "UpdatedAt": "2024-01-02T00:00:00Z"},',
+                  b' {"Id": "2", "UpdatedAt": "2024-01-03T00:00:00Z"}]}']
+
+        def page():
+            for chunk in chunks:
+                clock[0] += 1
+                yield chunk
+
+        def stream(_path, on_finish=None, **kwargs):
+            # Waiting for the headers
+            clock[0] += 2
+            return JsonItemStream(page(), on_finish=on_finish)
+
+        # Writing rows is slow, but is not part of the page's download time
+        mock_write_record.side_effect = lambda *args: clock.__setitem__(0, clock[0] + 100)
+        client = MagicMock()
+        client.stream.side_effect = stream
+        page_sizer = mock_page_sizer_class.return_value
+        page_sizer.size = 2
+
+        stream_export(client, {}, self._accounts_catalog(), "accounts", "10", "UpdatedAt", 2,
+                      "2024-01-01T00:00:00Z", stream_data=True, adaptive_page_size=True,
+                      export_memory_budget=1000)
+
+        mock_page_sizer_class.assert_called_once_with(2, memory_budget=1000, pages_in_flight=2)
+        self.assertEqual(client.stream.call_args.kwargs["params"]["limit"], 2)
+        page_sizer.observe.assert_called_once_with(2, sum(len(chunk) for chunk in chunks), 4.0)
+
+    @patch("tap_eloqua.sync.log_page_size")
+    @patch("tap_eloqua.sync.write_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_sizes_loaded_pages_adaptively(
+        self, _mock_write_schema, mock_write_bulk_bookmark, _mock_write_records, mock_log_page_size
+    ):
+        limits = []
+
+        def get(_path, params, endpoint, hooks):
+            limits.append(params["limit"])
+            response = MagicMock()
+            response.content = b"x" * (params["limit"] * 100)
+            hooks["response"](response)
+            items = [{"Id": str(i), "UpdatedAt": "2024-01-02T00:00:00Z"} for i in range(params["limit"])]
+            return {"hasMore": len(limits) < 2, "items": items}
+
+        client = MagicMock()
+        client.get.side_effect = get
+
+        stream_export(client, {}, self._accounts_catalog(), "accounts", "10", "UpdatedAt", 100,
+                      "2024-01-01T00:00:00Z", prefetch_pages=1, adaptive_page_size=True)
+
+        self.assertEqual(limits, [100, 200])
+        self.assertEqual([call.args[1] for call in mock_log_page_size.call_args_list], [100, 200])
+        self.assertEqual([call.args[3] for call in mock_write_bulk_bookmark.call_args_list], [0, 100, None])
+
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_gives_up_after_export_page_retries(self, _mock_write_schema, _mock_write_bulk_bookmark):
+        client = MagicMock()
+        client.get.side_effect = ConnectionError("connection reset")
+
+        with self.assertRaises(ConnectionError):
+            stream_export(
+                client=client,
+                state={},
+                catalog=self._accounts_catalog(),
+                stream_name="accounts",
+                sync_id="10",
+                updated_at_field="UpdatedAt",
+                bulk_page_size=1,
+                bookmark_datetime="2024-01-01T00:00:00Z",
+                prefetch_pages=2,
+                export_page_retries=2,
+            )
+
+        self.assertEqual(client.get.call_count, 3)
+
+    @patch("tap_eloqua.sync.write_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_pipeline_matches_inline_output(self, _mock_write_schema, mock_write_bulk_bookmark, mock_write_records):
+        def run(prefetch_pages):
+            mock_write_bulk_bookmark.reset_mock()
+            mock_write_records.reset_mock()
+            client = MagicMock()
+            client.get.side_effect = [
+                {"hasMore": True, "items": [{"Id": str(i), "UpdatedAt": "2024-01-0{}T00:00:00Z".format(i + 1)}]}
+                for i in range(3)
+            ] + [{"hasMore": False, "items": []}]
+            out = stream_export(
+                client=client,
+                state={},
+                catalog=self._accounts_catalog(),
+                stream_name="accounts",
+                sync_id="10",
+                updated_at_field="UpdatedAt",
+                bulk_page_size=1,
+                bookmark_datetime="2024-01-01T00:00:00Z",
+                prefetch_pages=prefetch_pages,
+            )
+            return out, mock_write_bulk_bookmark.call_args_list, mock_write_records.call_args_list
+
+        self.assertEqual(run(0), run(2))
+
+    @patch("tap_eloqua.sync.write_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_checkpoints_every_n_pages(self, _mock_write_schema, mock_write_bulk_bookmark, _mock_write_records):
+        client = MagicMock()
+        client.get.side_effect = [{"hasMore": True, "items": []} for _ in range(4)] + [{"hasMore": False, "items": []}]
+
+        stream_export(
+            client=client,
+            state={},
+            catalog=self._accounts_catalog(),
+            stream_name="accounts",
+            sync_id="10",
+            updated_at_field="UpdatedAt",
+            bulk_page_size=1,
+            bookmark_datetime="2024-01-01T00:00:00Z",
+            checkpoint_every_pages=2,
+        )
+
+        offsets = [call.args[3] for call in mock_write_bulk_bookmark.call_args_list]
+        self.assertEqual(offsets, [0, 2, 4, None])
+
+    @patch("tap_eloqua.sync.write_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_streamed_pages_match_loaded_pages(self, _mock_write_schema, mock_write_bulk_bookmark, mock_write_records):
+        bodies = [
+            {"hasMore": True, "items": [{"Id": "1", "UpdatedAt": "2024-01-02T00:00:00Z", "CreatedAt": ""}]},
+            {"items": [{"Id": "2", "UpdatedAt": "2024-01-03T00:00:00Z", "CreatedAt": ""}], "hasMore": False},
+        ]
+
+        def run(prefetch_pages, **kwargs):
+            client = MagicMock()
+            client.get.side_effect = [dict(body) for body in bodies]
+            client.stream.side_effect = [
+                JsonItemStream([json.dumps(body).encode("utf-8")]) for body in bodies
+            ]
+            records = []
+            mock_write_bulk_bookmark.reset_mock()
+            mock_write_records.side_effect = lambda _stream_name, page: records.append(list(page))
+            final = stream_export(client, {}, self._accounts_catalog(), "accounts", "10", "UpdatedAt", 1,
+                                  "2024-01-01T00:00:00Z", prefetch_pages=prefetch_pages, **kwargs)
+            offsets = [call.args[3] for call in mock_write_bulk_bookmark.call_args_list]
+            return final, records, offsets, client
+
+        loaded = run(0)
+        streamed = run(0, stream_data=True)
+        streamed_prefetched = run(2, stream_data=True)
+
+        self.assertEqual(streamed[:3], loaded[:3])
+        self.assertEqual(streamed_prefetched[:3], loaded[:3])
+        self.assertEqual(streamed[3].stream.call_count, 2)
+        streamed[3].get.assert_not_called()
+
+    @patch("tap_eloqua.sync.write_records")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_stream_export_csv_pages_end_on_short_page(self, _mock_write_schema, mock_write_bulk_bookmark, mock_write_records):
+        client = MagicMock()
+        pages = [b"Id,UpdatedAt,CreatedAt\n1,2024-01-02T00:00:00Z,\n2,2024-01-03T00:00:00Z,\n",
+                 b"Id,UpdatedAt,CreatedAt\n3,2024-01-04T00:00:00Z,\n"]
+
+        def stream_csv(_path, has_more, columns=None, **kwargs):
+            return CsvItemStream([pages.pop(0)], has_more, columns=columns)
+
+        client.stream_csv.side_effect = stream_csv
+        records = []
+        mock_write_records.side_effect = lambda _stream_name, page: records.extend(page)
+
+        final = stream_export(client, {}, self._accounts_catalog(), "accounts", "10", "UpdatedAt", 2,
+                              "2024-01-01T00:00:00Z", data_format="csv")
+
+        self.assertEqual([record["Id"] for record in records], ["1", "2", "3"])
+        self.assertIsNone(records[0]["CreatedAt"])
+        self.assertEqual(final, "2024-01-04T00:00:00Z")
+        self.assertEqual([call.args[3] for call in mock_write_bulk_bookmark.call_args_list], [0, 2, None])
+        self.assertEqual(client.stream_csv.call_count, 2)
+
+    @patch("tap_eloqua.sync.persist_records")
+    @patch("tap_eloqua.sync.write_bookmark")
+    @patch("tap_eloqua.sync.write_schema")
+    def test_sync_static_endpoint_debounces_bookmarks_and_writes_last_one(self, _mock_write_schema, mock_write_bookmark, _mock_persist_records):
+        client = MagicMock()
+        client.get.side_effect = [
+            {"elements": [{"updatedAt": str(1704067200 + page)}] * 1000}
+            for page in range(3)
+        ] + [{"elements": [{"updatedAt": "1704067300"}]}]
+
+        sync_static_endpoint(client, self._accounts_catalog(), {}, "2024-01-01T00:00:00Z",
+                             "campaigns", "assets/campaigns", "updatedAt",
+                             checkpoint_every_pages=3)
+
+        bookmarks = [call.args[2] for call in mock_write_bookmark.call_args_list]
+        self.assertEqual(bookmarks, ["2024-01-01T00:00:02Z", "2024-01-01T00:01:40Z"])
+
+    def test_get_export_pages_parallel_yields_pages_in_offset_order(self):
+        def get(_path, params, endpoint):
+            offset = params["offset"]
+            return {"hasMore": offset < 20, "items": [{"offset": offset}]}
+
+        client = MagicMock()
+        client.get.side_effect = get
+
+        pages = list(get_export_pages(client, "accounts", "10", 10, 0, export_parallelism=4))
+
+        self.assertEqual([offset for offset, _, _ in pages], [0, 10, 20])
+        self.assertEqual([page["items"][0]["offset"] for _, _, page in pages], [0, 10, 20])
+
+    def test_get_export_pages_parallel_stops_requesting_at_total_count(self):
+        client = MagicMock()
+        client.get.side_effect = [
+            {"hasMore": True, "items": [{"Id": "1"}]},
+            {"hasMore": False, "items": [{"Id": "2"}]},
+        ]
+
+        pages = list(get_export_pages(client, "accounts", "10", 1, 0, export_parallelism=8, total_count=2))
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(client.get.call_count, 2)
+
+    def test_get_export_pages_parallel_continues_past_total_count_while_has_more(self):
+        client = MagicMock()
+        client.get.side_effect = [
+            {"hasMore": True, "items": [{"Id": "1"}]},
+            {"hasMore": False, "items": []},
+        ]
+
+        pages = list(get_export_pages(client, "accounts", "10", 1, 0, export_parallelism=4, total_count=1))
+
+        self.assertEqual([offset for offset, _, _ in pages], [0, 1])
+
+    @patch("tap_eloqua.sync.time.monotonic")
+    def test_fetch_export_page_times_the_whole_download(self, mock_monotonic):
+        mock_monotonic.side_effect = [100, 107.5]
+
+        def get(_path, params, endpoint, hooks):
+            response = MagicMock()
+            response.content = b"x" * 300
+            # The response's elapsed only covers the headers
+            response.elapsed.total_seconds.return_value = 0.5
+            hooks["response"](response)
+            return {"hasMore": False, "items": [{}] * 3}
+
+        client = MagicMock()
+        client.get.side_effect = get
+        page_sizer = MagicMock()
+
+        fetch_export_page(client, "accounts", "10", 0, 3, page_sizer=page_sizer)
+
+        page_sizer.observe.assert_called_once_with(3, 300, 7.5)
+
+    @patch("tap_eloqua.sync.log_page_size")
+    def test_get_export_pages_uses_page_sizer_limits(self, mock_log_page_size):
+        limits = []
+
+        def get(_path, params, endpoint, hooks):
+            limits.append(params["limit"])
+            response = MagicMock()
+            response.content = b"x" * (params["limit"] * 100)
+            hooks["response"](response)
+            return {"hasMore": len(limits) < 3, "items": [{}] * params["limit"]}
+
+        client = MagicMock()
+        client.get.side_effect = get
+
+        pages = list(get_export_pages(client, "accounts", "10", 5000, 0,
+                                      page_sizer=PageSizer(5000, memory_budget=10 ** 9)))
+
+        self.assertEqual(limits, [5000, 10000, 20000])
+        self.assertEqual([offset for offset, _, _ in pages], [0, 5000, 15000])
+        self.assertEqual([call.args[1] for call in mock_log_page_size.call_args_list], [5000, 10000, 20000])
+
     @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
     @patch("tap_eloqua.sync.write_bulk_bookmark")
     def test_sync_bulk_obj_uses_custom_object_url_when_root_has_id(self, _mock_write_bulk_bookmark, _mock_stream_export):
@@ -261,6 +663,23 @@ class TestSyncRuntimeUnit(unittest.TestCase):
         sync_bulk_obj(client, catalog, {}, "2024-01-01T00:00:00Z", "accounts", 500)
         mock_sleep.assert_called_once_with(2)
 
+    @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    @patch("tap_eloqua.sync.time.sleep")
+    def test_sync_bulk_obj_waits_on_shared_poller(self, mock_sleep, _mock_write_bulk_bookmark, _mock_stream_export):
+        catalog = self._accounts_catalog()
+        client = MagicMock()
+        poller = MagicMock()
+
+        client.post.side_effect = [{"uri": "/exports/1"}, {"uri": "/syncs/99"}]
+        client.get.return_value = {"items": []}
+
+        sync_bulk_obj(client, catalog, {}, "2024-01-01T00:00:00Z", "accounts", 500, poller=poller)
+
+        poller.wait.assert_called_once_with("accounts", "99")
+        self.assertEqual(client.get.call_count, 1)
+        mock_sleep.assert_not_called()
+
     @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
     @patch("tap_eloqua.sync.write_bulk_bookmark")
     @patch("tap_eloqua.sync.MAX_RETRY_ELAPSED_TIME", -1)
@@ -290,6 +709,44 @@ class TestSyncRuntimeUnit(unittest.TestCase):
         with self.assertRaises(ActivityExportTooLarge):
             sync_bulk_obj(client, catalog, {}, "2024-01-01T00:00:00Z", "accounts", 500, activity_type="EmailOpen")
 
+    @patch("tap_eloqua.sync.output.write_state")
+    @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    def test_sync_bulk_obj_records_activity_stats_for_too_large_export(self, _mock_write_bulk_bookmark, _mock_stream_export, _mock_write_state):
+        catalog = self._accounts_catalog()
+        client = MagicMock()
+        state = {}
+
+        client.post.side_effect = [{"uri": "/exports/1"}, {"uri": "/syncs/99"}]
+        client.get.side_effect = [
+            {"status": "success"},
+            {"items": [{"message": "Successfully exported members to csv file.", "count": 6000000}]},
+        ]
+
+        with self.assertRaises(ActivityExportTooLarge):
+            sync_bulk_obj(client, catalog, state, "2024-01-01T00:00:00Z", "accounts", 500,
+                          activity_type="EmailOpen", end_date=pendulum.datetime(2024, 1, 2, tz="UTC"))
+
+        self.assertEqual(state["activity_stats"]["accounts"], {"count": 6000000, "seconds": 86400})
+
+    @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    def test_sync_bulk_obj_passes_record_count_and_export_options(self, _mock_write_bulk_bookmark, mock_stream_export):
+        catalog = self._accounts_catalog()
+        client = MagicMock()
+
+        client.post.side_effect = [{"uri": "/exports/1"}, {"uri": "/syncs/99"}]
+        client.get.side_effect = [
+            {"status": "success"},
+            {"items": [{"message": "Successfully exported members to csv file.", "count": 42}]},
+        ]
+
+        sync_bulk_obj(client, catalog, {}, "2024-01-01T00:00:00Z", "accounts", 500, export_parallelism=3)
+
+        kwargs = mock_stream_export.call_args.kwargs
+        self.assertEqual(kwargs["total_count"], 42)
+        self.assertEqual(kwargs["export_parallelism"], 3)
+
     @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
     @patch("tap_eloqua.sync.write_bulk_bookmark")
     def test_sync_bulk_obj_includes_end_date_in_filter(self, _mock_write_bulk_bookmark, _mock_stream_export):
@@ -315,6 +772,111 @@ class TestSyncRuntimeUnit(unittest.TestCase):
         payload = client.post.call_args_list[0].kwargs["json"]
         self.assertIn("< '2024-01-02 00:00:00'", payload["filter"])
 
+    def _sync_with_reused_definition(self, state, client):
+        client.get.side_effect = [
+            {"status": "success"},
+            {"items": [{"message": "Successfully exported members to csv file.", "count": 1}]},
+        ]
+        with patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00"), \
+             patch("tap_eloqua.sync.write_bulk_bookmark"):
+            sync_bulk_obj(client, self._accounts_catalog(), state, "2024-01-01T00:00:00Z", "accounts", 500,
+                          reuse_export_definitions=True)
+
+    def test_sync_bulk_obj_reuses_cached_export_definition(self):
+        state = {}
+        client = MagicMock()
+        client.post.side_effect = [{"uri": "/accounts/exports/1"}, {"uri": "/syncs/98"}]
+        self._sync_with_reused_definition(state, client)
+
+        state["bookmarks"] = {"accounts": {"datetime": "2024-01-02T00:00:00Z"}}
+        client = MagicMock()
+        client.put.return_value = {"uri": "/accounts/exports/1"}
+        client.post.return_value = {"uri": "/syncs/99"}
+        self._sync_with_reused_definition(state, client)
+
+        self.assertEqual(client.put.call_args.args[0], "/api/bulk/2.0/accounts/exports/1")
+        self.assertIn("'2024-01-02 00:00:00'", client.put.call_args.kwargs["json"]["filter"])
+        client.post.assert_called_once_with("/api/bulk/2.0/syncs",
+                                            json={"syncedInstanceUri": "/accounts/exports/1"},
+                                            endpoint="export_create_sync")
+
+    @patch("tap_eloqua.sync.cleanup_export")
+    @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
+    @patch("tap_eloqua.sync.write_bulk_bookmark")
+    def test_sync_bulk_obj_cleans_up_drained_export(self, _mock_write_bulk_bookmark, _mock_stream_export, mock_cleanup_export):
+        client = MagicMock()
+        client.post.side_effect = [{"uri": "/accounts/exports/1"}, {"uri": "/syncs/99"}]
+        client.get.side_effect = [
+            {"status": "success"},
+            {"items": [{"message": "Successfully exported members to csv file.", "count": 1}]},
+        ]
+
+        sync_bulk_obj(client, self._accounts_catalog(), {}, "2024-01-01T00:00:00Z", "accounts", 500,
+                      cleanup_exports=True)
+
+        mock_cleanup_export.assert_called_once_with(client, "accounts", "99", "/accounts/exports/1")
+
+    @patch("tap_eloqua.sync.cleanup_export")
+    @patch("tap_eloqua.sync.stream_export", return_value="2024-01-01 00:00:00")
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_obj_cleans_up_resumed_export(self, _mock_write_state, _mock_stream_export, mock_cleanup_export):
+        for reuse_export_definitions, resumed_definition_uri in [(False, "/accounts/exports/1"), (True, None)]:
+            mock_cleanup_export.reset_mock()
+            state = {"bookmarks": {"accounts": {"sync_id": "98", "offset": 500, "datetime": "2024-01-01 00:00:00",
+                                                "definition_uri": "/accounts/exports/1"}}}
+            client = MagicMock()
+            client.put.side_effect = HTTPError(response=DummyResponse(404))
+            client.post.side_effect = [{"uri": "/accounts/exports/2"}, {"uri": "/syncs/99"}]
+            client.get.side_effect = [
+                {"status": "success"},
+                {"items": [{"message": "Successfully exported members to csv file.", "count": 1}]},
+            ]
+
+            sync_bulk_obj(client, self._accounts_catalog(), state, "2024-01-01T00:00:00Z", "accounts", 500,
+                          reuse_export_definitions=reuse_export_definitions, cleanup_exports=True)
+
+            self.assertEqual(mock_cleanup_export.call_args_list[0].args[2:], ("98", resumed_definition_uri))
+
+    def test_sync_bulk_obj_replaces_stale_export_definition(self):
+        state = {"export_definitions": {"accounts": {"key": "old", "uri": "/accounts/exports/1"}}}
+        client = MagicMock()
+        client.delete.side_effect = HTTPError(response=DummyResponse(404))
+        client.post.side_effect = [{"uri": "/accounts/exports/2"}, {"uri": "/syncs/99"}]
+
+        self._sync_with_reused_definition(state, client)
+
+        client.delete.assert_called_once_with("/api/bulk/2.0/accounts/exports/1", endpoint="export_delete_def")
+        client.put.assert_not_called()
+        self.assertEqual(state["export_definitions"]["accounts"]["uri"], "/accounts/exports/2")
+
+    def test_sync_bulk_obj_recreates_expired_export_definition(self):
+        state = {}
+        client = MagicMock()
+        client.post.side_effect = [{"uri": "/accounts/exports/1"}, {"uri": "/syncs/98"}]
+        self._sync_with_reused_definition(state, client)
+
+        client = MagicMock()
+        client.put.side_effect = HTTPError(response=DummyResponse(404))
+        client.post.side_effect = [{"uri": "/accounts/exports/2"}, {"uri": "/syncs/99"}]
+        self._sync_with_reused_definition(state, client)
+
+        client.delete.assert_not_called()
+        self.assertEqual(state["export_definitions"]["accounts"]["uri"], "/accounts/exports/2")
+
+    def test_sync_bulk_obj_raises_other_errors_updating_cached_definition(self):
+        state = {}
+        client = MagicMock()
+        client.post.side_effect = [{"uri": "/accounts/exports/1"}, {"uri": "/syncs/98"}]
+        self._sync_with_reused_definition(state, client)
+
+        client = MagicMock()
+        client.put.side_effect = HTTPError(response=DummyResponse(500))
+        with self.assertRaises(HTTPError):
+            self._sync_with_reused_definition(state, client)
+
+        client.post.assert_not_called()
+        self.assertEqual(state["export_definitions"]["accounts"]["uri"], "/accounts/exports/1")
+
     @patch("tap_eloqua.sync.sync_bulk_obj")
     @patch("tap_eloqua.sync.pendulum.now")
     @patch("tap_eloqua.sync.get_bulk_bookmark")
@@ -359,6 +921,56 @@ class TestSyncRuntimeUnit(unittest.TestCase):
         second_call_end_date = mock_sync_bulk_obj.call_args_list[1].kwargs["end_date"]
         self.assertEqual(second_call_end_date, pendulum.datetime(2024, 1, 1, 1, 0, 0, tz="UTC"))
 
+    @patch("tap_eloqua.sync.sync_bulk_obj")
+    @patch("tap_eloqua.sync.pendulum.now")
+    def test_sync_activity_stream_plans_windows_from_recorded_density(self, mock_now, mock_sync_bulk_obj):
+        mock_now.return_value = pendulum.datetime(2024, 1, 4, tz="UTC")
+        state = {
+            "bookmarks": {"activity_email_open": {"datetime": "2024-01-01T00:00:00Z"}},
+            "activity_stats": {"activity_email_open": {"count": 2000000, "seconds": 86400}},
+        }
+
+        def export_window(*args, **kwargs):
+            state["bookmarks"]["activity_email_open"] = {"datetime": kwargs["end_date"].to_iso8601_string()}
+
+        mock_sync_bulk_obj.side_effect = export_window
+
+        with patch("tap_eloqua.sync.update_current_stream"):
+            sync_activity_stream(
+                client=MagicMock(),
+                stream_name="activity_email_open",
+                state=state,
+                catalog=self._accounts_catalog(),
+                start_date="2024-01-01T00:00:00Z",
+                bulk_page_size=100,
+                activity_type="EmailOpen",
+                activity_export_target_rows=4000000,
+            )
+
+        end_dates = [call.kwargs["end_date"] for call in mock_sync_bulk_obj.call_args_list]
+        self.assertEqual(end_dates, [
+            pendulum.datetime(2024, 1, 3, tz="UTC"),
+            pendulum.datetime(2024, 1, 4, tz="UTC"),
+        ])
+
+    @patch("tap_eloqua.sync.ExportPoller")
+    @patch("tap_eloqua.sync.update_current_stream")
+    @patch("tap_eloqua.sync.sync_activity_stream")
+    def test_sync_activity_streams_runs_types_concurrently_on_shared_poller(self, mock_sync_activity_stream, mock_update_current, mock_poller):
+        activity_streams = [("activity_email_open", "EmailOpen"), ("activity_email_send", "EmailSend")]
+
+        sync_activity_streams(MagicMock(), self._accounts_catalog(), {}, "2024-01-01T00:00:00Z",
+                              activity_streams, 500, max_concurrent_activity_exports=2,
+                              activity_export_target_rows=1000)
+
+        poller = mock_poller.return_value.__enter__.return_value
+        calls = sorted(mock_sync_activity_stream.call_args_list, key=lambda call: call.args[1])
+        self.assertEqual([call.args[6] for call in calls], ["EmailOpen", "EmailSend"])
+        for call in calls:
+            self.assertIs(call.kwargs["poller"], poller)
+            self.assertEqual(call.kwargs["activity_export_target_rows"], 1000)
+        mock_update_current.assert_called_once_with({}, "activity_email_open")
+
     @patch("tap_eloqua.sync.sync_static_endpoint")
     @patch("tap_eloqua.sync.sync_bulk_obj")
     @patch("tap_eloqua.sync.sync_activity_stream")
@@ -401,5 +1013,288 @@ class TestSyncRuntimeUnit(unittest.TestCase):
         self.assertGreaterEqual(mock_sync_bulk_obj.call_count, 1)
 
 
+    @patch("tap_eloqua.sync.sync_static_endpoint")
+    @patch("tap_eloqua.sync.sync_bulk_obj")
+    @patch("tap_eloqua.sync.sync_activity_stream")
+    @patch("tap_eloqua.sync.get_custom_obj_streams", return_value=["my_custom", "other_custom"])
+    @patch("tap_eloqua.sync.update_current_stream")
+    @patch("tap_eloqua.sync.get_selected_streams",
+           return_value=["accounts", "contacts", "my_custom", "other_custom", "activity_email_open"])
+    def test_sync_runs_concurrent_batches_in_original_stream_order(
+        self,
+        _mock_get_selected,
+        mock_update_current,
+        _mock_get_custom,
+        mock_sync_activity_stream,
+        mock_sync_bulk_obj,
+        _mock_sync_static_endpoint,
+    ):
+        order = []
+        mock_sync_bulk_obj.side_effect = lambda *args, **kwargs: order.append(args[4])
+        mock_sync_activity_stream.side_effect = lambda *args, **kwargs: order.append(args[1])
+
+        sync(MagicMock(), self._accounts_catalog(), {}, "2024-01-01T00:00:00Z", 500, max_concurrent_exports=3)
+
+        self.assertEqual(sorted(order[:2]), ["accounts", "contacts"])
+        self.assertEqual(order[2], "activity_email_open")
+        self.assertEqual(sorted(order[3:]), ["my_custom", "other_custom"])
+        current_streams = [call.args[1] for call in mock_update_current.call_args_list]
+        self.assertEqual(current_streams, ["accounts", "activity_email_open", "my_custom", None])
+
+        # Resuming in the custom object batch leaves the streams before it alone
+        order.clear()
+        sync(MagicMock(), self._accounts_catalog(), {"current_stream": "my_custom"}, "2024-01-01T00:00:00Z", 500,
+             max_concurrent_exports=3)
+
+        self.assertEqual(sorted(order), ["my_custom", "other_custom"])
+
+    @patch("tap_eloqua.sync.sync_static_endpoint")
+    @patch("tap_eloqua.sync.sync_bulk_obj")
+    @patch("tap_eloqua.sync.sync_activity_stream")
+    @patch("tap_eloqua.sync.get_custom_obj_streams", return_value=["my_custom"])
+    @patch("tap_eloqua.sync.update_current_stream")
+    @patch("tap_eloqua.sync.get_selected_streams", return_value=["accounts", "my_custom", "activity_email_open", "visitors"])
+    def test_sync_resumes_from_current_stream_in_original_order(
+        self,
+        _mock_get_selected,
+        mock_update_current,
+        _mock_get_custom,
+        mock_sync_activity_stream,
+        mock_sync_bulk_obj,
+        mock_sync_static_endpoint,
+    ):
+        state = {"current_stream": "activity_email_open"}
+
+        sync(MagicMock(), self._accounts_catalog(), state, "2024-01-01T00:00:00Z", 500)
+
+        self.assertEqual([call.args[4] for call in mock_sync_bulk_obj.call_args_list], ["my_custom"])
+        self.assertEqual(mock_sync_activity_stream.call_count, 1)
+        self.assertEqual(mock_sync_static_endpoint.call_count, 1)
+        current_streams = [call.args[1] for call in mock_update_current.call_args_list]
+        self.assertEqual(current_streams, ["activity_email_open", "my_custom", "visitors", None])
+
+    @patch("tap_eloqua.sync.sync_bulk_obj")
+    @patch("tap_eloqua.sync.get_custom_obj_streams", return_value=[])
+    @patch("tap_eloqua.sync.update_current_stream")
+    @patch("tap_eloqua.sync.get_selected_streams", return_value=["accounts"])
+    def test_sync_prunes_export_definitions_of_unselected_streams(
+        self, _mock_get_selected, _mock_update_current, _mock_get_custom, _mock_sync_bulk_obj
+    ):
+        for cleanup_exports, deleted in [(False, []), (True, ["/api/bulk/2.0/contacts/exports/2"])]:
+            state = {"export_definitions": {
+                "accounts": {"key": "a", "uri": "/accounts/exports/1"},
+                "contacts": {"key": "c", "uri": "/contacts/exports/2"},
+            }}
+            client = MagicMock()
+
+            sync(client, self._accounts_catalog(), state, "2024-01-01T00:00:00Z", 500,
+                 cleanup_exports=cleanup_exports)
+
+            self.assertEqual(list(state["export_definitions"]), ["accounts"])
+            self.assertEqual([call.args[0] for call in client.delete.call_args_list], deleted)
+
+    def _finish_partition(self, state):
+        def finish(*args, **kwargs):
+            write_bulk_bookmark(state, args[3], None, None, args[7], partition=kwargs["partition"])
+            return args[7]
+        return finish
+
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_write_bulk_bookmark_keeps_definition_uri_until_export_is_drained(self, _mock_write_state):
+        state = {}
+
+        write_bulk_bookmark(state, "accounts", "5", 0, "2024-01-01 00:00:00", definition_uri="/accounts/exports/1")
+        write_bulk_bookmark(state, "accounts", "5", 1000, "2024-01-02 00:00:00")
+        self.assertEqual(state["bookmarks"]["accounts"], {
+            "sync_id": "5",
+            "offset": 1000,
+            "datetime": "2024-01-02 00:00:00",
+            "definition_uri": "/accounts/exports/1",
+        })
+
+        write_bulk_bookmark(state, "accounts", None, None, "2024-01-02 00:00:00")
+        self.assertNotIn("definition_uri", state["bookmarks"]["accounts"])
+
+        state["bookmarks"]["accounts"] = {"datetime": None, "partitions": [
+            {"start": "2024-01-01 00:00:00", "end": None, "sync_id": None,
+             "offset": None, "datetime": None, "done": False}]}
+        write_bulk_bookmark(state, "accounts", "6", 0, "2024-01-01 00:00:00",
+                            partition=0, definition_uri="/accounts/exports/2")
+        write_bulk_bookmark(state, "accounts", "6", 500, "2024-01-01 00:00:00", partition=0)
+        self.assertEqual(state["bookmarks"]["accounts"]["partitions"][0]["definition_uri"], "/accounts/exports/2")
+
+        write_bulk_bookmark(state, "accounts", None, None, "2024-01-01 00:00:00", partition=0)
+        self.assertNotIn("definition_uri", state["bookmarks"]["accounts"]["partitions"][0])
+
+    @patch("tap_eloqua.sync.pendulum.now", return_value=pendulum.datetime(2024, 1, 5, tz="UTC"))
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_obj_exports_time_windows_concurrently(self, _mock_write_state, _mock_now):
+        catalog = self._accounts_catalog()
+        state = {}
+        client = MagicMock()
+        sync_ids = count(1)
+        filters = []
+
+        def post(path, json=None, endpoint=None):
+            if endpoint == "export_create_def":
+                filters.append(json["filter"])
+                return {"uri": "/exports/1"}
+            return {"uri": "/syncs/{}".format(next(sync_ids))}
+
+        client.post.side_effect = post
+        client.get.return_value = {"items": []}
+        poller = MagicMock()
+
+        with patch("tap_eloqua.sync.stream_export", side_effect=self._finish_partition(state)) as mock_stream_export:
+            sync_bulk_obj(client, catalog, state, "2024-01-01T00:00:00Z", "accounts", 500,
+                          poller=poller, export_partitions=2)
+
+        self.assertEqual(sorted(filters), [
+            "'{{Account.UpdatedAt}}' >= '2024-01-01 00:00:00' AND '{{Account.UpdatedAt}}' < '2024-01-03 00:00:00'",
+            "'{{Account.UpdatedAt}}' >= '2024-01-03 00:00:00'",
+        ])
+        self.assertEqual(poller.wait.call_count, 2)
+        self.assertEqual(sorted(call.kwargs["partition"] for call in mock_stream_export.call_args_list), [0, 1])
+        self.assertEqual(state["bookmarks"]["accounts"],
+                         {"sync_id": None, "offset": None, "datetime": "2024-01-03 00:00:00"})
+
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_obj_resumes_unfinished_time_windows(self, _mock_write_state):
+        catalog = self._accounts_catalog()
+        state = {"bookmarks": {"accounts": {
+            "datetime": "2024-01-03 00:00:00",
+            "partitions": [
+                {"start": "2024-01-01 00:00:00", "end": "2024-01-03 00:00:00", "sync_id": None,
+                 "offset": None, "datetime": "2024-01-02 10:00:00", "done": True},
+                {"start": "2024-01-03 00:00:00", "end": None, "sync_id": "7",
+                 "offset": 1000, "datetime": "2024-01-03 00:00:00", "done": False},
+            ],
+        }}}
+        client = MagicMock()
+
+        with patch("tap_eloqua.sync.stream_export", side_effect=self._finish_partition(state)) as mock_stream_export:
+            sync_bulk_obj(client, catalog, state, "2024-01-01T00:00:00Z", "accounts", 500,
+                          poller=MagicMock())
+
+        client.post.assert_not_called()
+        mock_stream_export.assert_called_once()
+        self.assertEqual(mock_stream_export.call_args.args[4], "7")
+        self.assertEqual(mock_stream_export.call_args.kwargs["offset"], 1000)
+        self.assertEqual(state["bookmarks"]["accounts"]["datetime"], "2024-01-03 00:00:00")
+        self.assertNotIn("partitions", state["bookmarks"]["accounts"])
+
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_obj_recreates_expired_time_window(self, _mock_write_state):
+        catalog = self._accounts_catalog()
+        state = {"bookmarks": {"accounts": {
+            "datetime": "2024-01-01 00:00:00",
+            "partitions": [
+                {"start": "2024-01-01 00:00:00", "end": "2024-01-03 00:00:00", "sync_id": "7",
+                 "offset": 500, "datetime": "2024-01-01 00:00:00", "done": False},
+                {"start": "2024-01-03 00:00:00", "end": None, "sync_id": None,
+                 "offset": None, "datetime": "2024-01-04 00:00:00", "done": True},
+            ],
+        }}}
+        client = MagicMock()
+        client.post.side_effect = [{"uri": "/exports/1"}, {"uri": "/syncs/8"}]
+        client.get.return_value = {"items": []}
+        finish = self._finish_partition(state)
+
+        def stream_export_side_effect(*args, **kwargs):
+            if args[4] == "7":
+                raise HTTPError(response=DummyResponse(404))
+            return finish(*args, **kwargs)
+
+        with patch("tap_eloqua.sync.stream_export", side_effect=stream_export_side_effect):
+            with patch("tap_eloqua.sync.ExportPoller") as mock_poller:
+                sync_bulk_obj(client, catalog, state, "2024-01-01T00:00:00Z", "accounts", 500)
+
+        mock_poller.return_value.__enter__.return_value.wait.assert_called_once_with("accounts", "8")
+        self.assertIn("< '2024-01-03 00:00:00'", client.post.call_args_list[0].kwargs["json"]["filter"])
+        self.assertEqual(state["bookmarks"]["accounts"]["datetime"], "2024-01-04 00:00:00")
+
+
+    @patch("tap_eloqua.sync.cleanup_export")
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_obj_cleans_up_resumed_and_new_time_windows(self, _mock_write_state, mock_cleanup_export):
+        catalog = self._accounts_catalog()
+        state = {"bookmarks": {"accounts": {
+            "datetime": "2024-01-01 00:00:00",
+            "partitions": [
+                {"start": "2024-01-01 00:00:00", "end": "2024-01-03 00:00:00", "sync_id": "7",
+                 "offset": 500, "datetime": "2024-01-01 00:00:00", "done": False,
+                 "definition_uri": "/exports/7"},
+                {"start": "2024-01-03 00:00:00", "end": None, "sync_id": None,
+                 "offset": None, "datetime": None, "done": False},
+            ],
+        }}}
+        client = MagicMock()
+        client.post.side_effect = [{"uri": "/exports/8"}, {"uri": "/syncs/8"}]
+        client.get.return_value = {"items": []}
+
+        with patch("tap_eloqua.sync.stream_export", side_effect=self._finish_partition(state)):
+            sync_bulk_obj(client, catalog, state, "2024-01-01T00:00:00Z", "accounts", 500,
+                          poller=MagicMock(), cleanup_exports=True)
+
+        self.assertEqual(sorted(call.args[2:] for call in mock_cleanup_export.call_args_list),
+                         [("7", "/exports/7"), ("8", "/exports/8")])
+
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_obj_raises_time_window_errors_other_than_expiry(self, _mock_write_state):
+        catalog = self._accounts_catalog()
+        state = {"bookmarks": {"accounts": {
+            "datetime": "2024-01-01 00:00:00",
+            "partitions": [
+                {"start": "2024-01-01 00:00:00", "end": "2024-01-03 00:00:00", "sync_id": "7",
+                 "offset": 500, "datetime": "2024-01-01 00:00:00", "done": False},
+                {"start": "2024-01-03 00:00:00", "end": None, "sync_id": None,
+                 "offset": None, "datetime": "2024-01-04 00:00:00", "done": True},
+            ],
+        }}}
+        client = MagicMock()
+
+        with patch("tap_eloqua.sync.stream_export", side_effect=HTTPError(response=DummyResponse(500))):
+            with self.assertRaises(HTTPError):
+                sync_bulk_obj(client, catalog, state, "2024-01-01T00:00:00Z", "accounts", 500,
+                              poller=MagicMock())
+
+        client.post.assert_not_called()
+        self.assertEqual(state["bookmarks"]["accounts"]["partitions"][0]["sync_id"], "7")
+
+    @patch("tap_eloqua.sync.pendulum.now", return_value=pendulum.datetime(2024, 1, 9, tz="UTC"))
+    @patch("tap_eloqua.sync.output.write_state")
+    def test_sync_bulk_streams_counts_time_windows_against_max_concurrent_exports(self, _mock_write_state, _mock_now):
+        catalog = Catalog.from_dict({"streams": [
+            dict(self._accounts_catalog().to_dict()["streams"][0], tap_stream_id=stream_name, stream=stream_name)
+            for stream_name in ["accounts", "contacts"]
+        ]})
+        state = {}
+        client = MagicMock()
+        sync_ids = count(1)
+        client.post.side_effect = lambda path, json=None, endpoint=None: \
+            {"uri": "/syncs/{}".format(next(sync_ids))}
+        client.get.return_value = {"items": []}
+        lock = threading.Lock()
+        in_flight = [0]
+        max_in_flight = [0]
+        finish = self._finish_partition(state)
+
+        def stream_export_side_effect(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return finish(*args, **kwargs)
+
+        with patch("tap_eloqua.sync.stream_export", side_effect=stream_export_side_effect) as mock_stream_export:
+            with patch("tap_eloqua.sync.ExportPoller"):
+                sync_bulk_streams(client, catalog, state, "2024-01-01T00:00:00Z", ["accounts", "contacts"], 500,
+                                  max_concurrent_exports=3, export_partitions=4)
+
+        self.assertEqual(mock_stream_export.call_count, 8)
+        self.assertEqual(max_in_flight[0], 3)
+
 if __name__ == "__main__":
     unittest.main()
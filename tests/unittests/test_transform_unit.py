@@ -0,0 +1,154 @@
+import copy
+import json
+import unittest
+
+from singer import (
+    Transformer,
+    NO_INTEGER_DATETIME_PARSING,
+    UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING,
+    UNIX_SECONDS_INTEGER_DATETIME_PARSING
+)
+from singer.transform import SchemaMismatch
+
+from tap_eloqua.schema import get_abs_path
+from tap_eloqua.transform import RecordTransformer
+
+
+def singer_transform(record, schema, metadata, integer_datetime_fmt=UNIX_SECONDS_INTEGER_DATETIME_PARSING):
+    with Transformer(integer_datetime_fmt=integer_datetime_fmt) as transformer:
+        return transformer.transform(copy.deepcopy(record), copy.deepcopy(schema), metadata)
+
+
+class Unconvertible:
+    def __str__(self):
+        raise ValueError("no str")
+
+    def __bool__(self):
+        raise ValueError("no bool")
+
+
+class TestRecordTransformerUnit(unittest.TestCase):
+    SCHEMA = {
+        "type": "object",
+        "additionalProperties": False,
+        "properties": {
+            "Id": {"type": "string"},
+            "UpdatedAt": {"type": "string", "format": "date-time"},
+            "Score": {"type": ["null", "number"]},
+            "Count": {"type": ["integer", "null"]},
+            "Flag": {"type": ["null", "boolean"]},
+            "Name": {"type": ["null", "string"]},
+            "Raw": {},
+            "Hidden": {"type": ["null", "string"]},
+        },
+    }
+    METADATA = {
+        (): {"selected": True},
+        ("properties", "Id"): {"inclusion": "automatic", "selected": False},
+        ("properties", "Hidden"): {"inclusion": "available", "selected": False},
+    }
+
+    def assert_matches_singer(self, record, schema=None, metadata=None,
+                              integer_datetime_fmt=UNIX_SECONDS_INTEGER_DATETIME_PARSING):
+        schema = schema or self.SCHEMA
+        metadata = self.METADATA if metadata is None else metadata
+        transformer = RecordTransformer(copy.deepcopy(schema),
+                                        metadata,
+                                        integer_datetime_fmt=integer_datetime_fmt)
+        expected = singer_transform(record, schema, metadata, integer_datetime_fmt=integer_datetime_fmt)
+        actual = transformer.transform(copy.deepcopy(record))
+        self.assertEqual(actual, expected)
+        self.assertEqual(list(actual), list(expected))
+
+    def test_matches_singer_for_bulk_style_rows(self):
+        self.assert_matches_singer({
+            "Name": "Acme",
+            "Id": "1",
+            "UpdatedAt": "2024-01-02 03:04:05",
+            "Score": "1,234.5",
+            "Count": "7",
+            "Flag": "false",
+            "Raw": {"a": 1},
+            "Hidden": "secret",
+            "Unknown": "dropped",
+        })
+
+    def test_matches_singer_for_nulls_and_unix_timestamps(self):
+        self.assert_matches_singer({
+            "Id": "1",
+            "UpdatedAt": "1704067200",
+            "Score": None,
+            "Count": "",
+            "Flag": None,
+            "Name": None,
+        })
+
+    def test_matches_singer_without_metadata(self):
+        self.assert_matches_singer({"Id": "1", "Hidden": "kept"}, metadata={})
+
+    def test_matches_singer_for_static_stream_schemas(self):
+        with open(get_abs_path("schemas/campaigns.json")) as schema_file:
+            schema = json.load(schema_file)
+        record = {
+            "id": "10",
+            "name": "Campaign",
+            "updatedAt": "1704067200",
+            "elements": [{"type": "CampaignEmail", "id": "3"}],
+            "fieldValues": [{"id": "5", "value": "x"}],
+        }
+        self.assert_matches_singer(record, schema=schema, metadata={})
+
+    def test_raises_same_schema_mismatch_as_singer(self):
+        transformer = RecordTransformer(copy.deepcopy(self.SCHEMA), self.METADATA)
+        with self.assertRaises(SchemaMismatch) as error_context:
+            transformer.transform({"Id": "1", "Score": "not-a-number"})
+        self.assertIn("Score", str(error_context.exception))
+
+    def test_matches_singer_for_other_integer_datetime_formats(self):
+        schema = copy.deepcopy(self.SCHEMA)
+        schema["properties"]["CreatedAt"] = {"type": ["null", "string"], "format": "date-time"}
+        for integer_datetime_fmt, created_at in [(NO_INTEGER_DATETIME_PARSING, "2024-01-02 03:04:05"),
+                                                 (NO_INTEGER_DATETIME_PARSING, ""),
+                                                 (UNIX_MILLISECONDS_INTEGER_DATETIME_PARSING, "1704067200000")]:
+            self.assert_matches_singer({"Id": "1", "CreatedAt": created_at},
+                                       schema=schema,
+                                       integer_datetime_fmt=integer_datetime_fmt)
+
+    def test_matches_singer_for_any_of_fields(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "Value": {"anyOf": [{"type": "integer"}, {"type": "string"}]},
+            },
+        }
+        self.assert_matches_singer({"Value": "x"}, schema=schema, metadata={})
+
+    def test_raises_same_schema_mismatch_as_singer_for_unconvertible_values(self):
+        schema = copy.deepcopy(self.SCHEMA)
+        schema["properties"]["Obj"] = {"type": "object", "properties": {"a": {"type": "string"}}}
+        transformer = RecordTransformer(copy.deepcopy(schema),
+                                        self.METADATA,
+                                        integer_datetime_fmt=UNIX_SECONDS_INTEGER_DATETIME_PARSING)
+        for field_name, value in [("Name", Unconvertible()),
+                                  ("Flag", Unconvertible()),
+                                  ("UpdatedAt", "not a date"),
+                                  ("Obj", "not an object")]:
+            record = {"Id": "1", field_name: value}
+            with self.assertRaises(SchemaMismatch):
+                singer_transform(record, schema, self.METADATA)
+            with self.assertRaises(SchemaMismatch):
+                transformer.transform(record)
+
+    def test_falls_back_to_singer_for_nested_metadata(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "obj": {"type": "object", "properties": {"a": {"type": "string"}, "b": {"type": "string"}}},
+            },
+        }
+        metadata = {("properties", "obj", "properties", "b"): {"selected": False}}
+        self.assert_matches_singer({"obj": {"a": "1", "b": "2"}}, schema=schema, metadata=metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from tap_eloqua.client import EloquaClient
+from tap_eloqua.transport import (
+    PooledHTTPAdapter,
+    StallWatchdog,
+    StreamStalledError,
+    abort_response,
+    get_keepalive_socket_options
+)
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/stall"):
+            body = b'{"hasMore": false, "items": [{"Id": "1"}, {"Id": "2"}]}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:20])
+            self.wfile.flush()
+            time.sleep(3)
+            return
+        time.sleep(0.05)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTransportUnit(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _session(self, adapter):
+        session = requests.Session()
+        session.mount("http://", adapter)
+        return session
+
+    def test_keepalive_socket_options_enable_keepalive(self):
+        options = get_keepalive_socket_options(45)
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), options)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            self.assertIn((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 45), options)
+
+    def test_keepalive_socket_options_on_macos(self):
+        macos_socket = SimpleNamespace(SOL_SOCKET=socket.SOL_SOCKET,
+                                       SO_KEEPALIVE=socket.SO_KEEPALIVE,
+                                       IPPROTO_TCP=socket.IPPROTO_TCP,
+                                       TCP_KEEPALIVE=0x10)
+        with patch("tap_eloqua.transport.socket", macos_socket):
+            options = get_keepalive_socket_options(45)
+        self.assertEqual(options, [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                                   (socket.IPPROTO_TCP, 0x10, 45)])
+
+    def test_adapter_reuses_connections_and_records_stats(self):
+        adapter = PooledHTTPAdapter(pool_size=2)
+        with self._session(adapter) as session:
+            for _ in range(4):
+                self.assertEqual(session.get(self.url, timeout=5).json(), {"ok": True})
+
+        self.assertEqual(adapter.stats.checkouts, 4)
+        self.assertEqual(adapter.stats.new_connections, 1)
+        self.assertEqual(adapter.stats.reuse_rate, 0.75)
+
+    def test_adapter_waits_for_a_free_connection_when_pool_is_full(self):
+        adapter = PooledHTTPAdapter(pool_size=1)
+        with self._session(adapter) as session:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                list(executor.map(lambda _: session.get(self.url, timeout=5), range(3)))
+
+        self.assertEqual(adapter.stats.new_connections, 1)
+        self.assertGreater(adapter.stats.wait_seconds, 0.05)
+
+    def test_adapter_can_disable_keepalive(self):
+        adapter = PooledHTTPAdapter(keepalive_idle=0)
+        self.assertNotIn("socket_options", adapter.poolmanager.connection_pool_kw)
+        adapter = PooledHTTPAdapter(keepalive_idle=30)
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                      adapter.poolmanager.connection_pool_kw["socket_options"])
+
+    def test_stats_log_pool_metrics(self):
+        adapter = PooledHTTPAdapter()
+        adapter.stats.add_checkout(0.5)
+        adapter.stats.add_checkout(0.25)
+        adapter.stats.add_connection()
+        with patch("tap_eloqua.transport.metrics.log") as mock_log:
+            adapter.stats.log()
+
+        point = mock_log.call_args[0][1]
+        self.assertEqual(point.metric, "http_pool_checkouts")
+        self.assertEqual(point.value, 2)
+        self.assertEqual(point.tags, {"new_connections": 1, "reuse_rate": 0.5, "wait_seconds": 0.75})
+
+    def test_watchdog_aborts_only_streams_stuck_reading(self):
+        watchdog = StallWatchdog(stall_timeout=0.05)
+        stuck_abort = threading.Event()
+        idle_abort = threading.Event()
+        stuck = watchdog.watch(stuck_abort.set)
+        idle = watchdog.watch(idle_abort.set)
+        stuck.reading()
+        idle.reading()
+        idle.idle()
+
+        self.assertTrue(stuck_abort.wait(2))
+        watchdog.stop()
+
+        self.assertTrue(stuck.stalled)
+        self.assertFalse(idle.stalled)
+        self.assertFalse(idle_abort.is_set())
+
+    def test_watchdog_is_disabled_without_a_stall_timeout(self):
+        watchdog = StallWatchdog(stall_timeout=0)
+        watch = watchdog.watch(MagicMock())
+        watch.reading()
+        watchdog.stop()
+
+        self.assertIsNone(watchdog._StallWatchdog__thread)
+        self.assertFalse(watch.stalled)
+
+    def test_abort_response_closes_unconnected_responses_and_ignores_closed_sockets(self):
+        response = MagicMock()
+        response.raw.connection = None
+        abort_response(response)
+        response.close.assert_called_once_with()
+
+        response = MagicMock()
+        response.raw.connection.sock.shutdown.side_effect = OSError("not connected")
+        abort_response(response)
+        response.raw.connection.sock.shutdown.assert_called_once_with(socket.SHUT_RDWR)
+
+    def _stream(self, chunks, stall_timeout=0):
+        client = EloquaClient("config.json", "client-id", "client-secret", "refresh-token",
+                              "https://localhost/callback", None,
+                              stall_timeout=stall_timeout)
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        response = MagicMock()
+        response.status_code = 200
+        response.iter_content.return_value = chunks
+        session = MagicMock()
+        session.request.return_value = response
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            data = client.stream("/api/bulk/2.0/syncs/1/data", endpoint="export_data")
+        return client, response, data
+
+    def test_client_reraises_other_errors_reading_a_body(self):
+        def chunks():
+            yield b'{"items": ['
+            raise requests.exceptions.ChunkedEncodingError("connection broken")
+
+        _, response, data = self._stream(chunks())
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError) as error_context:
+            list(data)
+        data.close()
+
+        self.assertNotIsInstance(error_context.exception, StreamStalledError)
+        response.close.assert_called_once_with()
+
+    def test_client_closes_a_streamed_response_once(self):
+        client = EloquaClient("config.json", "client-id", "client-secret", "refresh-token",
+                              "https://localhost/callback", None)
+        client._EloquaClient__base_url = "https://api.eloqua.test"
+        response = MagicMock()
+        response.status_code = 200
+        session = MagicMock()
+        session.request.return_value = response
+        with patch.object(client, "_EloquaClient__session", session), \
+             patch.object(client, "get_access_token"):
+            close = client.request("GET", path="/api/bulk/2.0/syncs/1/data", endpoint="export_data",
+                                   stream_with=lambda chunks, close: close)
+        close()
+        close()
+
+        response.close.assert_called_once_with()
+
+    def test_client_raises_stream_stalled_error_for_an_aborted_body_that_ends_early(self):
+        def chunks():
+            yield b'{"items": ['
+            time.sleep(0.5)
+
+        client, response, data = self._stream(chunks(), stall_timeout=0.05)
+        with self.assertRaises(StreamStalledError):
+            list(data)
+        client.__exit__(None, None, None)
+
+        response.raw.connection.sock.shutdown.assert_called_once_with(socket.SHUT_RDWR)
+
+    def test_client_raises_stream_stalled_error_for_a_stalled_body(self):
+        client = EloquaClient("config.json", "client-id", "client-secret", "refresh-token",
+                              "https://localhost/callback", None,
+                              stall_timeout=0.2)
+        client._EloquaClient__base_url = self.url.rstrip("/")
+
+        start = time.monotonic()
+        with patch.object(client, "get_access_token"):
+            data = client.stream("/stall", endpoint="export_data")
+            with self.assertRaises(StreamStalledError):
+                list(data)
+            client.__exit__(None, None, None)
+
+        self.assertLess(time.monotonic() - start, 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()